@@ -0,0 +1,332 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import func, tuple_
+
+from extensions import db
+from models import Matiere, Achat
+from production import ajuster_stock
+from agregats import enregistrer_depenses
+from registre import enregistrer_mouvements, instant_achat
+from previsions import noter_achats
+from couts import enregistrer_achats as enregistrer_couts
+from unites import mg, centimes, grammes, euros
+
+_matiere = Matiere.__table__
+_achat = Achat.__table__
+
+# Nombre de lignes traitées par lot (une requête IN + un INSERT par lot)
+TAILLE_LOT = 1000
+
+# Nombre maximal d'erreurs détaillées dans la réponse
+MAX_ERREURS = 1000
+
+# Taille de page par défaut / maximale pour /achats
+LIMITE_DEFAUT = 100
+LIMITE_MAX = 500
+
+
+def lire_date(date_str):
+    """Date au format AAAA-MM-JJ, aujourd'hui si absente."""
+    if date_str:
+        return datetime.strptime(date_str.strip(), "%Y-%m-%d").date()
+    return datetime.utcnow().date()
+
+
+def lignes_csv(flux):
+    """
+    Lit un CSV (en-tête : nom, quantite, prix[, fournisseur, date, type, unite])
+    ligne à ligne. Le séparateur (',' ou ';') est déduit de l'en-tête.
+    Génère des couples (numéro de ligne dans le fichier, dict).
+    """
+    entete = flux.readline()
+    sep = ";" if entete.count(";") > entete.count(",") else ","
+    colonnes = [c.strip().lower() for c in next(csv.reader([entete], delimiter=sep))]
+    lecteur = csv.reader(flux, delimiter=sep)
+    for valeurs in lecteur:
+        if not any(v.strip() for v in valeurs):
+            continue
+        yield lecteur.line_num + 1, dict(zip(colonnes, valeurs))
+
+
+def lignes_jsonl(flux):
+    """Lit un flux JSONL : un objet par ligne → (numéro de ligne, dict)."""
+    for num, ligne in enumerate(flux, start=1):
+        ligne = ligne.strip()
+        if not ligne:
+            continue
+        try:
+            yield num, json.loads(ligne)
+        except ValueError as e:
+            yield num, ValueError(f"JSON invalide : {e}")
+
+
+def _valider(data):
+    """Normalise une ligne brute ; lève ValueError si elle est invalide."""
+    if isinstance(data, Exception):
+        raise data
+    if not isinstance(data, dict):
+        raise ValueError("Chaque ligne doit être un objet.")
+    nom = (data.get("nom") or "").strip().lower()
+    quantite = data.get("quantite")
+    prix = data.get("prix")
+    if not nom or quantite in (None, "") or prix in (None, ""):
+        raise ValueError("Champs requis : nom, quantite, prix")
+    try:
+        # 12.5, "12.5" ou "12,5" (export tableur français)
+        quantite = mg(quantite)
+        prix = centimes(prix)
+    except ValueError:
+        raise ValueError("'quantite' et 'prix' doivent être des nombres.")
+    try:
+        date = lire_date(data.get("date"))
+    except ValueError:
+        raise ValueError("Date invalide, format attendu : AAAA-MM-JJ.")
+    type_matiere = (data.get("type") or "").strip().lower() or None
+    return {
+        "nom": nom,
+        "quantite_mg": quantite,
+        "prix_centimes": prix,
+        "fournisseur": (data.get("fournisseur") or "").strip(),
+        "date": date,
+        "type": type_matiere,
+        "unite": (data.get("unite") or "g").strip()
+    }
+
+
+def importer_achats(lignes):
+    """
+    Importe un flux de lignes d'achat (numéro, dict) par lots de TAILLE_LOT :
+      - résolution des noms de matières par une requête IN par lot
+        (les noms déjà résolus sont gardés d'un lot à l'autre) ;
+      - création en masse des matières inconnues (si 'type' est fourni) ;
+      - INSERT des achats en executemany ;
+      - un UPDATE agrégé par matière pour le stock, un mouvement par achat
+        dans le journal, à la date de l'achat ;
+      - mise à jour des dépenses mensuelles (depense_mensuelle), du
+        résumé des prévisions (prevision_matiere) et des coûts moyens
+        (cout_matiere).
+    Les lignes invalides sont signalées sans interrompre l'import.
+    Ne fait PAS le commit : l'appelant garde la main sur la transaction.
+    """
+    ids = {}          # nom → matiere_id, cumulé sur tout l'import
+    creees = []
+    erreurs = []
+    nb_erreurs = 0
+    nb_lignes = 0
+    importees = 0
+
+    def erreur(num, message):
+        nonlocal nb_erreurs
+        nb_erreurs += 1
+        if len(erreurs) < MAX_ERREURS:
+            erreurs.append({"ligne": num, "message": message})
+
+    def traiter(lot):
+        nonlocal importees
+        # 1) Résolution des noms inconnus : une seule requête IN
+        inconnus = {l["nom"] for _, l in lot if l["nom"] not in ids}
+        if inconnus:
+            ids.update(
+                (nom, mat_id) for mat_id, nom in
+                db.session.query(Matiere.id, Matiere.nom).filter(Matiere.nom.in_(inconnus))
+            )
+
+        # 2) Création en masse des matières toujours inconnues
+        a_creer = {}
+        for num, l in lot:
+            if l["nom"] in ids or l["nom"] in a_creer:
+                continue
+            if l["type"] in ("base", "oxyde"):
+                a_creer[l["nom"]] = {"nom": l["nom"], "type": l["type"], "unite": l["unite"], "quantite_mg": 0}
+        if a_creer:
+            db.session.execute(_matiere.insert(), list(a_creer.values()))
+            ids.update(
+                (nom, mat_id) for mat_id, nom in
+                db.session.query(Matiere.id, Matiere.nom).filter(Matiere.nom.in_(a_creer))
+            )
+            creees.extend(a_creer)
+
+        # 3) Achats en executemany + cumul du stock par matière
+        achats = []
+        deltas = {}
+        for num, l in lot:
+            mat_id = ids.get(l["nom"])
+            if mat_id is None:
+                erreur(num, f"Matière '{l['nom']}' inconnue. Précisez 'type' = 'base' ou 'oxyde'.")
+                continue
+            achats.append({
+                "matiere_id": mat_id,
+                "quantite_mg": l["quantite_mg"],
+                "prix_centimes": l["prix_centimes"],
+                "fournisseur": l["fournisseur"],
+                "date": l["date"]
+            })
+            deltas[mat_id] = deltas.get(mat_id, 0) + l["quantite_mg"]
+        if achats:
+            db.session.execute(_achat.insert(), achats)
+            ajuster_stock(deltas)
+            enregistrer_depenses(achats)
+            noter_achats(achats)
+            enregistrer_couts(achats)
+            enregistrer_mouvements("achat", [
+                (a["matiere_id"], a["quantite_mg"], instant_achat(a["date"])) for a in achats
+            ], reference="import")
+            importees += len(achats)
+
+    lot = []
+    for num, brute in lignes:
+        nb_lignes += 1
+        try:
+            lot.append((num, _valider(brute)))
+        except ValueError as e:
+            erreur(num, str(e))
+        if len(lot) >= TAILLE_LOT:
+            traiter(lot)
+            lot = []
+    if lot:
+        traiter(lot)
+
+    erreurs.sort(key=lambda e: e["ligne"])
+    return {
+        "lignes": nb_lignes,
+        "importees": importees,
+        "matieres_creees": creees,
+        "nb_erreurs": nb_erreurs,
+        "erreurs": erreurs
+    }
+
+
+def flux_texte(stream):
+    """Enveloppe le flux binaire de la requête pour le lire ligne à ligne."""
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+# ─── Consultation paginée ────────────────────────────────────────────────────
+
+def encoder_curseur(date, achat_id):
+    """Curseur opaque (base64url) désignant la position (date, id)."""
+    brut = f"{date.isoformat()},{achat_id}".encode()
+    return base64.urlsafe_b64encode(brut).decode().rstrip("=")
+
+
+def decoder_curseur(curseur):
+    """Inverse de encoder_curseur ; lève ValueError si le curseur est invalide."""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4)).decode()
+        date_str, achat_id = brut.split(",")
+        return datetime.strptime(date_str, "%Y-%m-%d").date(), int(achat_id)
+    except Exception:
+        raise ValueError("Curseur invalide.")
+
+
+def lire_filtres(args):
+    """
+    Filtres communs à /achats et /achats/totaux, lus dans la query string :
+    debut, fin (AAAA-MM-JJ, inclus), fournisseur, matiere, type.
+    Lève ValueError si un filtre est invalide.
+    """
+    filtres = {}
+    for cle in ("debut", "fin"):
+        if args.get(cle):
+            try:
+                filtres[cle] = datetime.strptime(args[cle], "%Y-%m-%d").date()
+            except ValueError:
+                raise ValueError(f"'{cle}' invalide, format attendu : AAAA-MM-JJ.")
+    if args.get("fournisseur"):
+        filtres["fournisseur"] = args["fournisseur"].strip()
+    if args.get("matiere"):
+        filtres["matiere"] = args["matiere"].strip().lower()
+    if args.get("type"):
+        filtres["type"] = args["type"].strip().lower()
+        if filtres["type"] not in ("base", "oxyde"):
+            raise ValueError("Type invalide. Utilisez 'base' ou 'oxyde'.")
+    return filtres
+
+
+def _filtrer(query, filtres):
+    if "debut" in filtres:
+        query = query.filter(Achat.date >= filtres["debut"])
+    if "fin" in filtres:
+        query = query.filter(Achat.date <= filtres["fin"])
+    if "fournisseur" in filtres:
+        query = query.filter(Achat.fournisseur == filtres["fournisseur"])
+    if "matiere" in filtres:
+        query = query.filter(Matiere.nom == filtres["matiere"])
+    if "type" in filtres:
+        query = query.filter(Matiere.type == filtres["type"])
+    return query
+
+
+def page_achats(filtres, limite=LIMITE_DEFAUT, curseur=None):
+    """
+    Une page d'achats, du plus récent au plus ancien, ordonnée par (date, id).
+    Pagination par clé (keyset) : la page suivante repart strictement après
+    le dernier (date, id) renvoyé, sans OFFSET ni comptage.
+    Retourne (achats, curseur_suivant) ; curseur_suivant vaut None en fin de liste.
+    """
+    query = _filtrer(
+        db.session.query(
+            Achat.id,
+            Achat.quantite_mg,
+            Achat.prix_centimes,
+            Achat.fournisseur,
+            Achat.date,
+            Matiere.nom,
+            Matiere.type
+        ).join(Matiere, Achat.matiere_id == Matiere.id),
+        filtres
+    )
+    if curseur:
+        query = query.filter(tuple_(Achat.date, Achat.id) < tuple_(*decoder_curseur(curseur)))
+
+    # une ligne de plus pour savoir s'il reste une page
+    rows = query.order_by(Achat.date.desc(), Achat.id.desc()).limit(limite + 1).all()
+
+    suivant = None
+    if len(rows) > limite:
+        rows = rows[:limite]
+        suivant = encoder_curseur(rows[-1].date, rows[-1].id)
+
+    achats = [
+        {
+            "id": achat_id,
+            "nom": nom_mat,
+            "type": m_type,
+            "quantite": grammes(quantite),
+            "prix": euros(prix),
+            "fournisseur": fournisseur,
+            "date": date.isoformat()
+        }
+        for achat_id, quantite, prix, fournisseur, date, nom_mat, m_type in rows
+    ]
+    return achats, suivant
+
+
+def totaux_achats(filtres=None):
+    """
+    Totaux de dépenses calculés en SQL (GROUP BY type, matière), en
+    centimes : les sommes sont exactes, converties en euros à la fin.
+    Retourne { "bases": {"prix_par_matiere", "total_prix"}, "oxydes": {...} }.
+    """
+    rows = _filtrer(
+        db.session.query(Matiere.type, Matiere.nom, func.sum(Achat.prix_centimes))
+        .join(Matiere, Achat.matiere_id == Matiere.id),
+        filtres or {}
+    ).group_by(Matiere.type, Matiere.nom).all()
+
+    result = {
+        "bases": {"prix_par_matiere": {}, "total_prix": 0},
+        "oxydes": {"prix_par_matiere": {}, "total_prix": 0}
+    }
+    for m_type, nom_mat, total in rows:
+        cat = "bases" if m_type == "base" else "oxydes"
+        result[cat]["prix_par_matiere"][nom_mat] = euros(total)
+        result[cat]["total_prix"] += total or 0
+
+    result["bases"]["total_prix"] = euros(result["bases"]["total_prix"])
+    result["oxydes"]["total_prix"] = euros(result["oxydes"]["total_prix"])
+    return result
@@ -0,0 +1,186 @@
+from datetime import datetime
+
+from sqlalchemy import func
+
+from extensions import db
+from models import Matiere, Achat, DepenseMensuelle, ConsommationMensuelle
+from unites import grammes, euros
+
+_depense = DepenseMensuelle.__table__
+_consommation = ConsommationMensuelle.__table__
+
+# champs des rapports : nom dans la réponse → (colonne, conversion)
+CHAMPS_DEPENSES = {
+    "quantite": ("quantite_mg", grammes),
+    "prix": ("prix_centimes", euros),
+    "nb_achats": ("nb_achats", None),
+}
+CHAMPS_CONSOMMATION = {
+    "quantite": ("quantite_mg", grammes),
+    "nb_productions": ("nb_productions", None),
+}
+
+
+def mois_de(date):
+    """Premier jour du mois de `date` (clé des agrégats)."""
+    return date.replace(day=1)
+
+
+def cumuler(table, rows, cumuls):
+    """
+    INSERT ... ON CONFLICT (clé primaire) DO UPDATE SET c = c + excluded.c
+    pour chaque colonne de `cumuls`, exécuté en lot (agrégats mensuels,
+    cumuls des coûts).
+    """
+    if not rows:
+        return
+    dialecte = db.session.get_bind().dialect.name
+    if dialecte == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialecte == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # repli générique : UPDATE puis INSERT si la ligne n'existe pas
+        cles = [c for c in table.primary_key.columns]
+        for row in rows:
+            where = [c == row[c.name] for c in cles]
+            res = db.session.execute(
+                table.update().where(*where).values(
+                    {c: table.c[c] + row[c] for c in cumuls}
+                )
+            )
+            if res.rowcount == 0:
+                db.session.execute(table.insert().values(row))
+        return
+
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key.columns],
+        set_={c: table.c[c] + stmt.excluded[c] for c in cumuls}
+    )
+    db.session.execute(stmt, rows)
+
+
+def enregistrer_depenses(achats):
+    """
+    Répercute des achats sur depense_mensuelle, dans la transaction en cours.
+    `achats` : itérable de dicts { matiere_id, date, quantite_mg, prix_centimes }.
+    Les achats d'une même matière et d'un même mois sont d'abord cumulés.
+    """
+    cumul = {}
+    for a in achats:
+        cle = (a["matiere_id"], mois_de(a["date"]))
+        q, p, n = cumul.get(cle, (0, 0, 0))
+        cumul[cle] = (q + a["quantite_mg"], p + a["prix_centimes"], n + 1)
+
+    cumuler(_depense, [
+        {"matiere_id": mat_id, "mois": mois, "quantite_mg": q, "prix_centimes": p, "nb_achats": n}
+        for (mat_id, mois), (q, p, n) in cumul.items()
+    ], ("quantite_mg", "prix_centimes", "nb_achats"))
+
+
+def enregistrer_consommations(consommations, date=None):
+    """
+    Répercute une production sur consommation_mensuelle.
+    `consommations` : { matiere_id: mg consommés }.
+    """
+    mois = mois_de(date or datetime.utcnow().date())
+    cumuler(_consommation, [
+        {"matiere_id": mat_id, "mois": mois, "quantite_mg": q, "nb_productions": 1}
+        for mat_id, q in consommations.items()
+    ], ("quantite_mg", "nb_productions"))
+
+
+def reconstruire_depenses():
+    """
+    Recalcule depense_mensuelle depuis la table achat (reprise de l'existant
+    ou contrôle). Le GROUP BY se fait par jour en SQL, le regroupement par
+    mois en Python pour rester portable entre SQLite et PostgreSQL.
+    """
+    db.session.execute(_depense.delete())
+    rows = (
+        db.session.query(
+            Achat.matiere_id,
+            Achat.date,
+            func.sum(Achat.quantite_mg),
+            func.sum(Achat.prix_centimes),
+            func.count(Achat.id)
+        )
+        .filter(Achat.date.isnot(None))
+        .group_by(Achat.matiere_id, Achat.date)
+    )
+    cumul = {}
+    for mat_id, date, q, p, n in rows:
+        cle = (mat_id, mois_de(date))
+        cq, cp, cn = cumul.get(cle, (0, 0, 0))
+        cumul[cle] = (cq + (q or 0), cp + (p or 0), cn + n)
+    if cumul:
+        db.session.execute(_depense.insert(), [
+            {"matiere_id": mat_id, "mois": mois, "quantite_mg": q, "prix_centimes": p, "nb_achats": n}
+            for (mat_id, mois), (q, p, n) in cumul.items()
+        ])
+    return len(cumul)
+
+
+def lire_mois(valeur, cle):
+    """Borne de rapport au format AAAA-MM → date du 1er du mois."""
+    try:
+        return datetime.strptime(valeur, "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"'{cle}' invalide, format attendu : AAAA-MM.")
+
+
+def rapport(modele, champs, args):
+    """
+    Lit un agrégat mensuel (DepenseMensuelle ou ConsommationMensuelle) :
+    une ligne par (matière, mois), sans parcourir l'historique brut.
+    Filtres : debut, fin (AAAA-MM, inclus), type, matiere.
+    `champs` : { nom dans la réponse: (colonne, conversion) }, conversion
+    appliquée aux cumuls entiers (ex. ("quantite_mg", grammes)) ou None.
+    Retourne :
+      { "matieres": { nom: { "type", "par_mois": { "AAAA-MM": {champs} },
+                             "total": {champs} } },
+        "par_type": { "base"|"oxyde": { "AAAA-MM": {champs} } } }
+    """
+    colonnes = [getattr(modele, colonne) for colonne, _ in champs.values()]
+    query = (
+        db.session.query(Matiere.nom, Matiere.type, modele.mois, *colonnes)
+        .join(Matiere, modele.matiere_id == Matiere.id)
+    )
+    if args.get("debut"):
+        query = query.filter(modele.mois >= lire_mois(args["debut"], "debut"))
+    if args.get("fin"):
+        query = query.filter(modele.mois <= lire_mois(args["fin"], "fin"))
+    if args.get("type"):
+        query = query.filter(Matiere.type == args["type"].strip().lower())
+    if args.get("matiere"):
+        query = query.filter(Matiere.nom == args["matiere"].strip().lower())
+
+    matieres = {}
+    par_type = {}
+    for nom, m_type, mois, *valeurs in query.order_by(Matiere.nom, modele.mois):
+        cle_mois = mois.strftime("%Y-%m")
+        entry = matieres.setdefault(nom, {
+            "type": m_type,
+            "par_mois": {},
+            "total": {c: 0 for c in champs}
+        })
+        typ = par_type.setdefault(m_type, {}).setdefault(cle_mois, {c: 0 for c in champs})
+        entry["par_mois"][cle_mois] = {}
+        for c, v in zip(champs, valeurs):
+            entry["par_mois"][cle_mois][c] = v
+            entry["total"][c] += v
+            typ[c] += v
+
+    # cumuls exacts (entiers), convertis une seule fois pour la réponse
+    def convertir(vals):
+        return {c: champs[c][1](v) if champs[c][1] else v for c, v in vals.items()}
+
+    for entry in matieres.values():
+        entry["total"] = convertir(entry["total"])
+        entry["par_mois"] = {m: convertir(vals) for m, vals in entry["par_mois"].items()}
+    for mois_dict in par_type.values():
+        for cle_mois, vals in mois_dict.items():
+            mois_dict[cle_mois] = convertir(vals)
+
+    return {"matieres": matieres, "par_type": par_type}
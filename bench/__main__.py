@@ -0,0 +1,117 @@
+"""
+Banc de performance : peuple une base jetable puis mesure chaque route.
+
+    python -m bench                             # échelle 'petit', SQLite temporaire
+    python -m bench --echelle grand             # 10k matières, 5k recettes, 1M achats
+    python -m bench --base postgresql://...     # base PostgreSQL jetable (vidée !)
+    python -m bench --url http://127.0.0.1:8000 # charge HTTP contre gunicorn
+    python -m bench --enregistrer               # (ré)écrit la référence
+
+La référence bench/references/<echelle>.json est comparée à chaque
+exécution ; le code de sortie vaut 1 en cas de régression.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from app import create_app
+from bench.donnees import ECHELLES, peupler
+from bench.mesure import client_test, charge_http, serveur_local, comparer
+from bench.scenarios import scenarios
+
+REFERENCES = os.path.join(os.path.dirname(__file__), "references")
+
+
+def _args(argv):
+    p = argparse.ArgumentParser(prog="python -m bench", description=__doc__,
+                                formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--echelle", choices=sorted(ECHELLES), default="petit")
+    p.add_argument("--matieres", type=int, help="remplace le nombre de matières de l'échelle")
+    p.add_argument("--recettes", type=int)
+    p.add_argument("--achats", type=int)
+    p.add_argument("--base", help="URL SQLAlchemy (défaut : SQLite temporaire) ; la base est VIDÉE")
+    p.add_argument("--sans-peupler", action="store_true", help="réutilise les données déjà en base")
+    p.add_argument("--iterations", type=int, default=30, help="requêtes par scénario (client de test)")
+    p.add_argument("--cache", action="store_true", help="garde le cache de réponses entre requêtes")
+    p.add_argument("--clients", type=int, default=8, help="connexions parallèles (charge HTTP)")
+    p.add_argument("--duree", type=float, default=10.0, help="durée de la charge HTTP, s")
+    p.add_argument("--url", help="serveur à charger (défaut : serveur local dans ce process)")
+    p.add_argument("--sans-http", action="store_true", help="client de test seulement")
+    p.add_argument("--reference", help="fichier de référence (défaut : references/<echelle>.json)")
+    p.add_argument("--tolerance", type=float, default=0.5, help="hausse de p95 tolérée (0.5 = +50 %%)")
+    p.add_argument("--enregistrer", action="store_true", help="écrit les mesures comme nouvelle référence")
+    p.add_argument("--sortie", help="écrit aussi les mesures brutes dans ce fichier JSON")
+    return p.parse_args(argv)
+
+
+def _tableau(titre, resultats):
+    print(f"\n{titre}")
+    print(f"  {'scénario':<28}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'SQL':>7}{'5xx':>5}")
+    for nom, r in resultats.items():
+        print(f"  {nom:<28}{r['n']:>6}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['debit_rps']:>9}{r['sql_moyen']:>7}{r['erreurs']:>5}")
+
+
+def main(argv=None):
+    args = _args(argv)
+    nb_mat, nb_rec, nb_ach = ECHELLES[args.echelle]
+    nb_mat = args.matieres or nb_mat
+    nb_rec = args.recettes or nb_rec
+    nb_ach = args.achats if args.achats is not None else nb_ach
+
+    base = args.base or "sqlite:///" + os.path.join(tempfile.gettempdir(), f"glaze_bench_{args.echelle}.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": base})
+
+    with app.app_context():
+        if not args.sans_peupler:
+            debut = time.perf_counter()
+            peupler(nb_mat, nb_rec, nb_ach)
+            print(f"Base peuplée ({nb_mat} matières, {nb_rec} recettes, {nb_ach} achats) "
+                  f"en {time.perf_counter() - debut:.1f} s : {base}")
+
+    liste = scenarios(nb_mat, nb_rec)
+    mesures = {"client_test": client_test(app, liste, args.iterations, cache=args.cache)}
+    _tableau(f"Client de test ({args.iterations} requêtes par scénario, cache {'actif' if args.cache else 'vidé'})",
+             mesures["client_test"])
+
+    if not args.sans_http:
+        url, arreter = (args.url, None) if args.url else serveur_local(app)
+        try:
+            mesures["http"] = charge_http(url, liste, args.clients, args.duree)
+        finally:
+            if arreter:
+                arreter()
+        _tableau(f"Charge HTTP ({args.clients} clients, {args.duree:g} s, {url})", mesures["http"])
+
+    if args.sortie:
+        with open(args.sortie, "w") as f:
+            json.dump(mesures, f, indent=2, ensure_ascii=False)
+
+    chemin = args.reference or os.path.join(REFERENCES, f"{args.echelle}.json")
+    if args.enregistrer:
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with open(chemin, "w") as f:
+            json.dump(mesures, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nRéférence écrite : {chemin}")
+        return 0
+    if not os.path.exists(chemin):
+        print(f"\nPas de référence ({chemin}) : lancer avec --enregistrer.")
+        return 0
+
+    with open(chemin) as f:
+        regressions = comparer(mesures, json.load(f), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) par rapport à {chemin} :")
+        for r in regressions:
+            print("  - " + r)
+        return 1
+    print(f"\nAucune régression par rapport à {chemin}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
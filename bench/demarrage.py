@@ -0,0 +1,175 @@
+"""
+Temps de démarrage à froid, mesuré dans des process neufs :
+
+    python -m bench.demarrage                     # 10 démarrages, SQLite temporaire
+    python -m bench.demarrage --repetitions 30 --base postgresql://...
+    python -m bench.demarrage --detail            # modules les plus lents à importer
+    python -m bench.demarrage --gunicorn 4        # gunicorn, avec et sans préchargement
+
+Phases mesurées dans chaque process :
+  - import     : `import app` (modules Python, aucune connexion)
+  - fabrique   : create_app()
+  - 1re requête: GET `--route` (défaut /recettes) : connexion à la base,
+                 premières requêtes, construction des caches
+Avec --gunicorn N : délai entre le lancement de gunicorn (N workers) et la
+première réponse de /sante, puis la réponse de chacun des N workers, avec
+et sans préchargement (GUNICORN_PRELOAD).
+La base doit avoir un schéma ; il est créé si besoin (la base n'est pas vidée).
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SONDE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1]})
+t2 = time.perf_counter()
+rv = application.test_client().get(sys.argv[2])
+rv.get_data()
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "fabrique": t2 - t1, "premiere_requete": t3 - t2,
+                  "total": t3 - t0, "code": rv.status_code}))
+"""
+
+PHASES = ("import", "fabrique", "premiere_requete", "total")
+
+
+def _args(argv):
+    p = argparse.ArgumentParser(prog="python -m bench.demarrage", description=__doc__,
+                                formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--repetitions", type=int, default=10)
+    p.add_argument("--base", help="URL SQLAlchemy (défaut : SQLite temporaire)")
+    p.add_argument("--route", default="/recettes", help="route de la première requête")
+    p.add_argument("--detail", action="store_true", help="python -X importtime : modules les plus lents")
+    p.add_argument("--gunicorn", type=int, metavar="N", help="mesure aussi le démarrage de gunicorn avec N workers")
+    p.add_argument("--sortie", help="écrit aussi les mesures dans ce fichier JSON")
+    return p.parse_args(argv)
+
+
+def _preparer(base):
+    """Crée le schéma si la base est vide (dans ce process, pas dans les sondes)."""
+    from app import create_app
+    from migrations import appliquer_migrations
+    with create_app({"SQLALCHEMY_DATABASE_URI": base}).app_context():
+        appliquer_migrations()
+
+
+def mesurer(base, route, repetitions):
+    """{phase: [secondes, ...]} sur `repetitions` process neufs."""
+    mesures = {phase: [] for phase in PHASES}
+    for _ in range(repetitions):
+        sortie = subprocess.run(
+            [sys.executable, "-c", _SONDE, base, route],
+            cwd=RACINE, capture_output=True, text=True, check=True,
+            env={**os.environ, "LOG_LEVEL": "WARNING"}
+        ).stdout
+        resultat = json.loads(sortie.strip().splitlines()[-1])
+        if resultat["code"] >= 500:
+            raise SystemExit(f"{route} : erreur {resultat['code']}")
+        for phase in PHASES:
+            mesures[phase].append(resultat[phase])
+    return mesures
+
+
+def detail_imports(n=15):
+    """Modules au temps d'import propre le plus long : (propre, cumulé, nom), en ms."""
+    trace = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=RACINE, capture_output=True, text=True, check=True
+    ).stderr
+    modules = []
+    for ligne in trace.splitlines():
+        if not ligne.startswith("import time:") or "self [us]" in ligne:
+            continue
+        propre, cumule, nom = ligne[len("import time:"):].split("|")
+        modules.append((int(propre) / 1000, int(cumule) / 1000, nom.strip()))
+    return sorted(modules, reverse=True)[:n]
+
+
+def _port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def demarrage_gunicorn(base, workers, prechargement, delai_max=60.0):
+    """
+    (première réponse, tous les workers) en secondes, depuis le lancement de
+    gunicorn jusqu'aux réponses de /sante (les pids distinguent les workers).
+    """
+    port = _port_libre()
+    env = {**os.environ, "DATABASE_URL": base, "PORT": str(port), "WEB_CONCURRENCY": str(workers),
+           "GUNICORN_PRELOAD": "1" if prechargement else "0", "LOG_LEVEL": "WARNING"}
+    debut = time.perf_counter()
+    serveur = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app", "--access-logfile", "/dev/null"],
+        cwd=RACINE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    premiere, pids = None, set()
+    try:
+        while len(pids) < workers and time.perf_counter() - debut < delai_max:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/sante", timeout=1) as rv:
+                    pids.add(json.load(rv)["pid"])
+                premiere = premiere or time.perf_counter() - debut
+            except OSError:
+                time.sleep(0.01)
+        return premiere, time.perf_counter() - debut if len(pids) >= workers else None
+    finally:
+        serveur.terminate()
+        serveur.wait()
+
+
+def main(argv=None):
+    from bench.mesure import centile
+
+    args = _args(argv)
+    base = args.base or "sqlite:///" + os.path.join(tempfile.gettempdir(), "glaze_bench_demarrage.db")
+    _preparer(base)
+
+    mesures = mesurer(base, args.route, args.repetitions)
+    print(f"Démarrage à froid ({args.repetitions} process, 1re requête GET {args.route}) :")
+    print(f"  {'phase':<18}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    resume = {}
+    for phase, valeurs in mesures.items():
+        ms = sorted(v * 1000 for v in valeurs)
+        resume[phase] = {"p50_ms": round(centile(ms, 50), 1), "p95_ms": round(centile(ms, 95), 1),
+                         "max_ms": round(ms[-1], 1)}
+        print(f"  {phase:<18}{resume[phase]['p50_ms']:>10}{resume[phase]['p95_ms']:>10}{resume[phase]['max_ms']:>10}")
+
+    if args.detail:
+        print("\nImports les plus lents (temps propre / cumulé, ms) :")
+        for propre, cumule, nom in detail_imports():
+            print(f"  {propre:>8.1f} {cumule:>8.1f}  {nom}")
+
+    if args.gunicorn:
+        print(f"\nGunicorn, {args.gunicorn} workers (ms) :")
+        print(f"  {'préchargement':<18}{'1re réponse':>12}{'tous':>10}")
+        for prechargement in (False, True):
+            premiere, tous = demarrage_gunicorn(base, args.gunicorn, prechargement)
+            resume[f"gunicorn_prechargement_{int(prechargement)}"] = {
+                "premiere_ms": round(premiere * 1000, 1) if premiere else None,
+                "tous_ms": round(tous * 1000, 1) if tous else None
+            }
+            print(f"  {'oui' if prechargement else 'non':<18}"
+                  f"{round(premiere * 1000) if premiere else '-':>12}{round(tous * 1000) if tous else '-':>10}")
+
+    if args.sortie:
+        with open(args.sortie, "w") as f:
+            json.dump(resume, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Jeu de données synthétique, reproductible (graine fixe), inséré en lots
+par executemany. Noms : mat-00001..., recette-00001...
+"""
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam
+
+from extensions import db
+from models import Matiere, Achat, Recette, Composition
+from migrations import appliquer_migrations
+from agregats import reconstruire_depenses
+from registre import ouvrir_journal
+from previsions import reconstruire_previsions
+from couts import reconstruire_couts
+from cache import vider_cache
+from unites import CENTIMES_PAR_EURO, mg, ppm
+
+# (matières, recettes, achats)
+ECHELLES = {
+    "petit": (200, 100, 20_000),
+    "moyen": (2_000, 1_000, 200_000),
+    "grand": (10_000, 5_000, 1_000_000),
+}
+
+TAILLE_LOT = 10_000
+FOURNISSEURS = ("Ceradel", "Solargil", "WBB", "Imerys", "Sibelco")
+
+
+def _par_lots(table, lignes):
+    for i in range(0, len(lignes), TAILLE_LOT):
+        db.session.execute(table.insert(), lignes[i:i + TAILLE_LOT])
+
+
+def _repartir(rng, total, n):
+    """n entiers ≥ 1 de somme `total`."""
+    coupes = sorted(rng.sample(range(1, total), n - 1))
+    return [b - a for a, b in zip([0] + coupes, coupes + [total])]
+
+
+def peupler(nb_matieres, nb_recettes, nb_achats, graine=42):
+    """
+    Vide la base, recrée le schéma puis insère matières, recettes (bases
+    totalisant 100 %), achats sur deux ans ; le stock de chaque matière
+    est la somme de ses achats. Agrégats, journal et prévisions
+    sont reconstruits.
+    """
+    rng = random.Random(graine)
+    db.drop_all()
+    db.session.commit()
+    appliquer_migrations()
+
+    # ─── 1) Matières : 80 % de bases ─────────────────────────────────────────
+    nb_bases = max(5, int(nb_matieres * 0.8))
+    _par_lots(Matiere.__table__, [
+        {"nom": f"mat-{i:05d}", "type": "base" if i <= nb_bases else "oxyde",
+         "unite": "g", "quantite_mg": 0}
+        for i in range(1, nb_matieres + 1)
+    ])
+    ids = dict(db.session.query(Matiere.nom, Matiere.id))
+    bases = [ids[f"mat-{i:05d}"] for i in range(1, nb_bases + 1)]
+    oxydes = [ids[f"mat-{i:05d}"] for i in range(nb_bases + 1, nb_matieres + 1)]
+
+    # ─── 2) Recettes et compositions ─────────────────────────────────────────
+    _par_lots(Recette.__table__, [
+        {"nom": f"recette-{i:05d}", "description_url": None, "production_doc_url": None}
+        for i in range(1, nb_recettes + 1)
+    ])
+    compositions = []
+    for nom, rec_id in db.session.query(Recette.nom, Recette.id).order_by(Recette.id):
+        choix = rng.sample(bases, rng.randint(3, 5))
+        for mat_id, pct in zip(choix, _repartir(rng, 100, len(choix))):
+            compositions.append({"recette_id": rec_id, "matiere_id": mat_id, "type": "base", "pourcentage_ppm": ppm(pct)})
+        for mat_id in rng.sample(oxydes, min(len(oxydes), rng.randint(0, 3))):
+            compositions.append({"recette_id": rec_id, "matiere_id": mat_id, "type": "oxyde", "pourcentage_ppm": ppm(rng.randint(1, 10))})
+    _par_lots(Composition.__table__, compositions)
+
+    # ─── 3) Achats et stock ──────────────────────────────────────────────────
+    tous = bases + oxydes
+    stock = dict.fromkeys(tous, 0)
+    debut = date.today() - timedelta(days=730)
+    lot = []
+    for _ in range(nb_achats):
+        mat_id = rng.choice(tous)
+        quantite = rng.randint(1, 50) * 100
+        stock[mat_id] += mg(quantite)
+        lot.append({
+            "matiere_id": mat_id,
+            "quantite_mg": mg(quantite),
+            "prix_centimes": round(quantite * rng.uniform(0.002, 0.05) * CENTIMES_PAR_EURO),
+            "fournisseur": rng.choice(FOURNISSEURS),
+            "date": debut + timedelta(days=rng.randint(0, 730))
+        })
+        if len(lot) >= TAILLE_LOT:
+            db.session.execute(Achat.__table__.insert(), lot)
+            lot = []
+    if lot:
+        db.session.execute(Achat.__table__.insert(), lot)
+
+    db.session.execute(
+        Matiere.__table__.update()
+        .where(Matiere.__table__.c.id == bindparam("b_id"))
+        .values(quantite_mg=bindparam("b_quantite")),
+        [{"b_id": mat_id, "b_quantite": q} for mat_id, q in stock.items()]
+    )
+
+    # ─── 4) Agrégats, journal, prévisions et coûts ───────────────────────────
+    reconstruire_depenses()
+    ouvrir_journal()
+    reconstruire_previsions()
+    reconstruire_couts()
+    db.session.commit()
+    vider_cache()
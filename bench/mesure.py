@@ -0,0 +1,154 @@
+"""
+Exécution des scénarios et statistiques :
+  - client de test Flask : chaque scénario à la suite, `iterations` fois ;
+  - charge HTTP : `clients` threads pendant `duree` secondes, scénarios
+    tirés selon leur poids, contre un serveur local ou une URL donnée.
+Le nombre de requêtes SQL est lu dans l'en-tête Server-Timing (metriques.py).
+"""
+import http.client
+import json
+import logging
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+from cache import vider_cache
+
+_SQL = re.compile(r'db;dur=[\d.]+;desc="(\d+) req"')
+
+
+def centile(valeurs, p):
+    """Centile par rang le plus proche (valeurs triées)."""
+    if not valeurs:
+        return 0.0
+    rang = max(0, min(len(valeurs) - 1, int(round(p / 100 * len(valeurs) + 0.5)) - 1))
+    return valeurs[rang]
+
+
+def _nb_sql(entete):
+    m = _SQL.search(entete or "")
+    return int(m.group(1)) if m else 0
+
+
+def resumer(echantillons, duree):
+    """echantillons : [(latence_s, nb_sql, code)] → statistiques en ms."""
+    lat = sorted(l * 1000 for l, _, _ in echantillons)
+    n = len(lat)
+    return {
+        "n": n,
+        "p50_ms": round(centile(lat, 50), 2),
+        "p95_ms": round(centile(lat, 95), 2),
+        "p99_ms": round(centile(lat, 99), 2),
+        "debit_rps": round(n / duree, 1) if duree else 0.0,
+        "sql_moyen": round(sum(s for _, s, _ in echantillons) / n, 2) if n else 0.0,
+        "erreurs": sum(1 for _, _, c in echantillons if c >= 500),
+    }
+
+
+def client_test(app, scenarios, iterations, graine=1, cache=False):
+    """
+    Chaque scénario `iterations` fois via le client de test.
+    Sans `cache`, le cache de réponses est vidé avant chaque requête : on
+    mesure le calcul, pas la relecture d'une réponse déjà sérialisée.
+    """
+    rng = random.Random(graine)
+    client = app.test_client()
+    resultats = {}
+    for nom, methode, url, corps, _ in scenarios:
+        echantillons = []
+        debut_total = time.perf_counter()
+        for _ in range(iterations):
+            if not cache:
+                vider_cache()
+            kwargs = {"json": corps(rng)} if corps else {}
+            debut = time.perf_counter()
+            rv = client.open(url, method=methode, **kwargs)
+            rv.get_data()   # consomme aussi les réponses en flux
+            echantillons.append((time.perf_counter() - debut, _nb_sql(rv.headers.get("Server-Timing")), rv.status_code))
+        resultats[nom] = resumer(echantillons, time.perf_counter() - debut_total)
+    return resultats
+
+
+def charge_http(url_base, scenarios, clients, duree, graine=1):
+    """
+    Mélange pondéré des scénarios, `clients` connexions persistantes en
+    parallèle pendant `duree` secondes. Retourne les statistiques par
+    scénario et pour l'ensemble ("total").
+    """
+    cible = urlsplit(url_base)
+    poids = [s[4] for s in scenarios]
+    echantillons = {s[0]: [] for s in scenarios}
+    verrou = threading.Lock()
+    fin = time.perf_counter() + duree
+
+    def client(num):
+        rng = random.Random(graine * 1000 + num)
+        conn = http.client.HTTPConnection(cible.hostname, cible.port or 80, timeout=60)
+        locaux = []
+        while time.perf_counter() < fin:
+            nom, methode, url, corps, _ = rng.choices(scenarios, weights=poids)[0]
+            body = json.dumps(corps(rng)) if corps else None
+            entetes = {"Content-Type": "application/json"} if body else {}
+            debut = time.perf_counter()
+            try:
+                conn.request(methode, cible.path.rstrip("/") + url, body=body, headers=entetes)
+                rv = conn.getresponse()
+                rv.read()
+                code, sql = rv.status, _nb_sql(rv.getheader("Server-Timing"))
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(cible.hostname, cible.port or 80, timeout=60)
+                code, sql = 599, 0
+            locaux.append((nom, (time.perf_counter() - debut, sql, code)))
+        conn.close()
+        with verrou:
+            for nom, e in locaux:
+                echantillons[nom].append(e)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    debut = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ecoule = time.perf_counter() - debut
+
+    resultats = {nom: resumer(e, ecoule) for nom, e in echantillons.items() if e}
+    resultats["total"] = resumer([x for e in echantillons.values() for x in e], ecoule)
+    return resultats
+
+
+def serveur_local(app):
+    """Serveur WSGI multi-thread sur un port libre ; retourne (url, arrêt)."""
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)   # pas une ligne par requête
+    serveur = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{serveur.server_port}", serveur.shutdown
+
+
+def comparer(mesures, reference, tolerance):
+    """
+    Régressions par rapport à une référence de même forme :
+      - nombre moyen de requêtes SQL en hausse (déterministe, tolérance 0,5) ;
+      - p95 au-delà de reference × (1 + tolerance), avec 2 ms de marge
+        pour les routes très rapides ; sous charge HTTP, seul le p95 global
+        ("total") est comparé, celui de chaque scénario étant trop bruité.
+    Retourne une liste de messages (vide = pas de régression).
+    """
+    regressions = []
+    for mode, par_scenario in reference.items():
+        for nom, ref in par_scenario.items():
+            m = mesures.get(mode, {}).get(nom)
+            if m is None:
+                continue
+            if m["sql_moyen"] > ref["sql_moyen"] + 0.5:
+                regressions.append(f"{mode}/{nom} : {m['sql_moyen']} requêtes SQL (référence {ref['sql_moyen']})")
+            limite = ref["p95_ms"] * (1 + tolerance) + 2
+            if (mode != "http" or nom == "total") and m["p95_ms"] > limite:
+                regressions.append(f"{mode}/{nom} : p95 {m['p95_ms']} ms (référence {ref['p95_ms']} ms, limite {round(limite, 2)})")
+            if m["erreurs"] > ref.get("erreurs", 0):
+                regressions.append(f"{mode}/{nom} : {m['erreurs']} erreur(s) 5xx")
+    return regressions
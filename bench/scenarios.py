@@ -0,0 +1,37 @@
+"""
+Scénarios mesurés : une entrée par route, avec un corps tiré au hasard
+dans le jeu de données de bench/donnees.py.
+Chaque scénario : (nom, méthode, url, fabrique du corps JSON ou None, poids
+dans le mélange de charge HTTP).
+"""
+
+
+def _recette(rng, nb_recettes):
+    return f"recette-{rng.randint(1, nb_recettes):05d}"
+
+
+def scenarios(nb_matieres, nb_recettes):
+    def recettes(k):
+        return lambda rng: [f"recette-{i:05d}" for i in rng.sample(range(1, nb_recettes + 1), k)]
+
+    return [
+        ("recettes", "GET", "/recettes", None, 5),
+        ("stock", "GET", "/stock", None, 10),
+        ("historique_achats", "GET", "/historique_achats", None, 1),
+        ("achats_page", "GET", "/achats?limite=100", None, 5),
+        ("reappro", "GET", "/reappro", None, 2),
+        ("faisabilite", "GET", "/faisabilite?masse=1000&tri=couleur&limite=50", None, 3),
+        ("simuler_production", "POST", "/simuler_production",
+         lambda rng: {"recette": _recette(rng, nb_recettes), "masse": 1000}, 20),
+        ("simuler_production_groupe", "POST", "/simuler_production_groupe",
+         lambda rng: {"recettes": recettes(3)(rng)}, 10),
+        ("compromis_recettes", "POST", "/compromis_recettes",
+         lambda rng: {"recettes": recettes(3)(rng), "mode": "frontiere"}, 5),
+        ("planifier_production", "POST", "/planifier_production",
+         lambda rng: {"recettes": recettes(5)(rng)}, 3),
+        ("produire", "POST", "/produire",
+         lambda rng: {"recette": _recette(rng, nb_recettes), "masse": 10, "override": True}, 5),
+        ("achat", "POST", "/achat",
+         lambda rng: {"nom": f"mat-{rng.randint(1, nb_matieres):05d}", "quantite": 500,
+                      "prix": 12.5, "fournisseur": "bench"}, 5),
+    ]
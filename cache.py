@@ -0,0 +1,106 @@
+import hashlib
+import threading
+from functools import wraps
+
+from flask import current_app, make_response, request
+from sqlalchemy import update
+
+from extensions import db
+from models import Compteur
+
+# Compteur incrémenté par toutes les routes d'écriture
+VERSION_DONNEES = "donnees"
+
+# Nombre maximal de réponses gardées en mémoire (par process)
+TAILLE_MAX = 128
+
+_cache = {}
+_verrou = threading.Lock()
+
+
+def lire_version(nom=VERSION_DONNEES):
+    """Valeur courante du compteur `nom` (0 s'il n'existe pas encore)."""
+    valeur = db.session.query(Compteur.valeur).filter_by(nom=nom).scalar()
+    return valeur or 0
+
+
+def invalider(nom=VERSION_DONNEES):
+    """
+    Incrémente le compteur `nom` dans la transaction en cours.
+    À appeler avant le commit de chaque écriture : les autres workers
+    verront la nouvelle version en même temps que les nouvelles données.
+    """
+    res = db.session.execute(
+        update(Compteur)
+        .where(Compteur.nom == nom)
+        .values(valeur=Compteur.valeur + 1)
+    )
+    if res.rowcount == 0:
+        db.session.add(Compteur(nom=nom, valeur=1))
+
+
+def vider_cache():
+    with _verrou:
+        _cache.clear()
+
+
+def _etag(version, cle):
+    empreinte = hashlib.sha1(b"?".join(cle)).hexdigest()[:16]
+    return f"v{version}-{empreinte}"
+
+
+def en_cache(vue):
+    """
+    Décorateur pour les routes de lecture :
+      - la réponse JSON est gardée en mémoire tant que la version des
+        données ne change pas (pas de re-sérialisation) ;
+      - un ETag fort est envoyé, et `If-None-Match` reçoit un 304.
+    Seules les réponses 200 sont mises en cache ; les réponses envoyées en
+    flux (voir flux_json.py) reçoivent l'ETag mais ne sont pas gardées.
+    """
+    @wraps(vue)
+    def wrapper(*args, **kwargs):
+        version = lire_version()
+        # Accept fait partie de la clé : JSON et NDJSON n'ont pas le même corps
+        cle = (request.path.encode(), request.query_string,
+               request.headers.get("Accept", "").encode())
+        etag = _etag(version, cle)
+
+        # 1) Le client a déjà cette version → 304 sans corps
+        if request.if_none_match.contains_weak(etag):
+            rv = make_response("", 304)
+            rv.set_etag(etag)
+            rv.headers["Cache-Control"] = "no-cache"
+            rv.vary.add("Accept")
+            return rv
+
+        # 2) Réponse déjà sérialisée pour cette version ?
+        with _verrou:
+            entree = _cache.get(cle)
+        if entree and entree[0] == version:
+            corps, mimetype = entree[1], entree[2]
+        else:
+            rv = make_response(vue(*args, **kwargs))
+            if rv.status_code != 200:
+                return rv
+            if rv.is_streamed:
+                rv.set_etag(etag)
+                rv.headers["Cache-Control"] = "no-cache"
+                rv.vary.add("Accept")
+                return rv
+            corps, mimetype = rv.get_data(), rv.mimetype
+            with _verrou:
+                _cache.pop(cle, None)
+                if len(_cache) >= TAILLE_MAX:
+                    # éviction de l'entrée la plus ancienne
+                    _cache.pop(next(iter(_cache)))
+                _cache[cle] = (version, corps, mimetype)
+
+        # 3) Réponse avec ETag ; no-cache force la revalidation à chaque fois
+        rv = current_app.response_class(corps, status=200, mimetype=mimetype)
+        rv.set_etag(etag)
+        rv.headers["Cache-Control"] = "no-cache"
+        rv.vary.add("Accept")
+        return rv
+
+    return wrapper
@@ -0,0 +1,62 @@
+from extensions import db
+from models import Recette, Composition, Matiere
+from unites import pourcent
+
+
+def requete_catalogue():
+    """
+    Requête unique (LEFT JOIN recette → composition → matiere) qui ramène
+    tout le catalogue en un seul aller-retour, quel que soit le nombre de
+    recettes. Les lignes sont triées par recette puis par composition pour
+    pouvoir être regroupées au fil de l'eau.
+    """
+    return (
+        db.session.query(
+            Recette.id,
+            Recette.nom,
+            Recette.description_url,
+            Recette.production_doc_url,
+            Composition.type,
+            Composition.pourcentage_ppm,
+            Matiere.nom
+        )
+        .outerjoin(Composition, Composition.recette_id == Recette.id)
+        .outerjoin(Matiere, Composition.matiere_id == Matiere.id)
+        .order_by(Recette.nom, Recette.id, Composition.id)
+    )
+
+
+def iterer_catalogue(rows):
+    """
+    Regroupe les lignes de requete_catalogue() en recettes au format de
+    l'API : { nom, base, oxydes, description_url, production_doc_url }.
+    Générateur : une recette est émise dès que toutes ses lignes sont lues.
+    """
+    courante = None
+    courante_id = None
+    for rec_id, nom, desc_url, doc_url, comp_type, pct, mat_nom in rows:
+        if rec_id != courante_id:
+            if courante is not None:
+                yield courante
+            courante_id = rec_id
+            courante = {
+                "nom": nom,
+                "base": {},
+                "oxydes": {},
+                "description_url": desc_url,
+                "production_doc_url": doc_url
+            }
+        # recette sans composition → LEFT JOIN renvoie des NULL
+        if mat_nom is None:
+            continue
+        if comp_type == "base":
+            courante["base"][mat_nom] = pourcent(pct)
+        else:
+            courante["oxydes"][mat_nom] = pourcent(pct)
+    if courante is not None:
+        yield courante
+
+
+def charger_catalogue():
+    """Catalogue complet des recettes, construit à partir d'une seule requête."""
+    return list(iterer_catalogue(requete_catalogue()))
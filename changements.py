@@ -0,0 +1,264 @@
+"""
+Flux des changements (stock, achats, matières, recettes), diffusé en
+Server-Sent Events par GET /changements.
+
+- Les routes d'écriture appellent publier(evenement) dans leur
+  transaction ; rien n'est diffusé avant le commit, et rien du tout en
+  cas de rollback.
+- Événements compacts (champ "type" = nom de l'événement SSE) :
+    stock          { matieres: [ {nom, type, quantite, delta} ] }
+    achat          { nom, type_matiere, quantite, prix, fournisseur, date }
+    matiere        { action: "ajout" | "suppression", nom, type_matiere, unite }
+    recette        { action: "ajout", recette: {format de /recettes} }
+                   | { action: "suppression", nom }
+    resynchroniser { cible: "stock" | "recettes" | "tout" } : le client
+                   recharge l'état complet (import en masse, retard, reprise
+                   impossible).
+- Backend (FLUX_BACKEND) :
+    memoire   diffusion aux abonnés du process après le commit (un seul
+              worker, développement) ;
+    postgres  NOTIFY dans la transaction (PostgreSQL ne le délivre qu'au
+              commit) ; chaque worker écoute (LISTEN) sur une connexion
+              dédiée, ouverte au premier abonné, et diffuse à ses abonnés.
+  Par défaut : postgres si la base est PostgreSQL, memoire sinon.
+- Chaque abonné a une file bornée (TAILLE_FILE). Un abonné trop lent ne
+  ralentit ni les écritures ni les autres : sa file est vidée et il reçoit
+  un seul "resynchroniser". Les derniers événements (HISTORIQUE) sont gardés
+  pour reprendre une connexion coupée (Last-Event-ID) sur le même worker.
+- Chaque connexion SSE occupe un thread gunicorn : FLUX_ABONNES_MAX par
+  process (défaut : la moitié de GUNICORN_THREADS), au-delà 503 ; une
+  connexion est fermée après DUREE_MAX_S, le navigateur se reconnecte seul.
+"""
+import collections
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+import uuid
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+
+from extensions import db
+
+log = logging.getLogger("glaze_api.changements")
+
+CANAL = "glaze_changements"
+TAILLE_FILE = 256           # événements en attente par abonné
+HISTORIQUE = 512            # événements gardés pour Last-Event-ID
+PING_S = 15.0               # commentaire SSE pour garder la connexion ouverte
+DUREE_MAX_S = 300.0
+TAILLE_NOTIFY_MAX = 7900    # limite de charge utile de NOTIFY : 8000 octets
+
+_jeton = uuid.uuid4().hex[:8]   # identifie le process dans les ids d'événement
+_verrou = threading.Lock()
+_abonnes = set()
+_historique = collections.deque(maxlen=HISTORIQUE)   # (seq, evenement)
+_seq = 0
+_backend = None
+
+
+class FluxSature(Exception):
+    """Trop de connexions au flux dans ce process."""
+
+
+# ─── Diffusion locale ────────────────────────────────────────────────────────
+
+class Abonne:
+    def __init__(self):
+        self.file = queue.Queue(maxsize=TAILLE_FILE)
+        self.en_retard = False
+
+    def pousser(self, evt_id, evenement):
+        try:
+            self.file.put_nowait((evt_id, evenement))
+        except queue.Full:
+            self.en_retard = True
+
+
+def _diffuser(evenements):
+    """Numérote les événements et les pousse dans la file de chaque abonné."""
+    global _seq
+    numerotes = []
+    with _verrou:
+        for evenement in evenements:
+            _seq += 1
+            _historique.append((_seq, evenement))
+            numerotes.append((f"{_jeton}-{_seq}", evenement))
+        abonnes = list(_abonnes)
+    for abonne in abonnes:
+        for evt_id, evenement in numerotes:
+            abonne.pousser(evt_id, evenement)
+
+
+def _abonnes_max():
+    # par défaut la moitié des threads du worker (GUNICORN_THREADS, 4) :
+    # les autres restent libres pour les requêtes ordinaires
+    defaut = max(1, int(os.environ.get("GUNICORN_THREADS", 4)) // 2)
+    return int(current_app.config.get("FLUX_ABONNES_MAX", os.environ.get("FLUX_ABONNES_MAX", defaut)))
+
+
+def nb_abonnes():
+    return len(_abonnes)
+
+
+def abonner(dernier_id=None):
+    """
+    Nouvel abonné. Avec `dernier_id` (en-tête Last-Event-ID), les événements
+    manqués sont rejoués s'ils sont encore dans l'historique de ce process,
+    sinon l'abonné commence par un "resynchroniser".
+    """
+    _obtenir_backend().demarrer()
+    abonne = Abonne()
+    with _verrou:
+        if len(_abonnes) >= _abonnes_max():
+            raise FluxSature()
+        if dernier_id:
+            jeton, _, seq = dernier_id.partition("-")
+            seq = int(seq) if seq.isdigit() else -1
+            if jeton == _jeton and (not _historique or _historique[0][0] <= seq + 1):
+                for n, evenement in _historique:
+                    if n > seq:
+                        abonne.pousser(f"{_jeton}-{n}", evenement)
+            else:
+                abonne.pousser(None, {"type": "resynchroniser", "cible": "tout"})
+        _abonnes.add(abonne)
+    return abonne
+
+
+def desabonner(abonne):
+    with _verrou:
+        _abonnes.discard(abonne)
+
+
+def _ligne_sse(evt_id, evenement):
+    entete = f"id: {evt_id}\n" if evt_id else ""
+    return f"{entete}event: {evenement['type']}\ndata: {json.dumps(evenement, ensure_ascii=False)}\n\n"
+
+
+def flux_sse(abonne, duree_max=DUREE_MAX_S):
+    """Corps de la réponse text/event-stream d'un abonné (générateur)."""
+    try:
+        yield "retry: 3000\n\n"
+        fin = time.monotonic() + duree_max
+        while time.monotonic() < fin:
+            if abonne.en_retard:
+                # file débordée : on repart de l'état complet
+                while not abonne.file.empty():
+                    abonne.file.get_nowait()
+                abonne.en_retard = False
+                yield _ligne_sse(None, {"type": "resynchroniser", "cible": "tout"})
+            try:
+                evt_id, evenement = abonne.file.get(timeout=min(PING_S, max(0.0, fin - time.monotonic())))
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            yield _ligne_sse(evt_id, evenement)
+    finally:
+        desabonner(abonne)
+
+
+# ─── Backends ────────────────────────────────────────────────────────────────
+
+class BackendMemoire:
+    """Un seul process : diffusion locale après le commit."""
+    transactionnel = False
+
+    def demarrer(self):
+        pass
+
+    def publier(self, evenements):
+        _diffuser(evenements)
+
+
+class BackendPostgres:
+    """
+    NOTIFY dans la transaction d'écriture ; un thread par process écoute
+    le canal (LISTEN) sur une connexion hors pool et diffuse localement.
+    """
+    transactionnel = True
+
+    def __init__(self, moteur):
+        self.moteur = moteur
+        self.thread = None
+
+    def notifier(self, session, evenements):
+        for evenement in evenements:
+            charge = json.dumps(evenement, ensure_ascii=False, separators=(",", ":"))
+            if len(charge.encode()) > TAILLE_NOTIFY_MAX:
+                charge = json.dumps({"type": "resynchroniser", "cible": "tout"})
+            session.execute(text("SELECT pg_notify(:canal, :charge)"), {"canal": CANAL, "charge": charge})
+
+    def demarrer(self):
+        with _verrou:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._ecouter, name="glaze-listen", daemon=True)
+                self.thread.start()
+
+    def _ecouter(self):
+        while True:
+            try:
+                connexion = self.moteur.raw_connection()
+                connexion.detach()   # hors pool : gardée tant que le process vit
+                brute = connexion.driver_connection
+                brute.autocommit = True
+                with brute.cursor() as curseur:
+                    curseur.execute(f"LISTEN {CANAL}")
+                log.info("écoute du canal %s", CANAL)
+                while True:
+                    if select.select([brute], [], [], 5.0)[0]:
+                        brute.poll()
+                        recus = [json.loads(n.payload) for n in brute.notifies]
+                        brute.notifies.clear()
+                        if recus:
+                            _diffuser(recus)
+            except Exception:
+                log.exception("écoute du canal %s interrompue, reprise dans 1 s", CANAL)
+                # des événements ont pu être perdus pendant la coupure
+                _diffuser([{"type": "resynchroniser", "cible": "tout"}])
+                time.sleep(1.0)
+
+
+def _obtenir_backend():
+    global _backend
+    if _backend is None:
+        nom = current_app.config.get("FLUX_BACKEND", os.environ.get("FLUX_BACKEND"))
+        if not nom:
+            nom = "postgres" if db.engine.dialect.name == "postgresql" else "memoire"
+        if nom not in ("memoire", "postgres"):
+            raise ValueError(f"FLUX_BACKEND inconnu : {nom!r} (memoire | postgres)")
+        _backend = BackendPostgres(db.engine) if nom == "postgres" else BackendMemoire()
+    return _backend
+
+
+# ─── Publication (dans la transaction des routes d'écriture) ─────────────────
+
+def publier(evenement):
+    """Ajoute `evenement` à la transaction en cours ; diffusé au commit."""
+    db.session.info.setdefault("changements", []).append(evenement)
+
+
+@event.listens_for(db.session, "before_commit")
+def _avant_commit(session):
+    evenements = session.info.get("changements")
+    if not evenements or not has_app_context():
+        return
+    backend = _obtenir_backend()
+    if backend.transactionnel:
+        backend.notifier(session, evenements)
+        session.info.pop("changements")
+
+
+@event.listens_for(db.session, "after_commit")
+def _apres_commit(session):
+    evenements = session.info.pop("changements", None)
+    if evenements and _backend is not None:
+        _backend.publier(evenements)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _apres_rollback(session):
+    session.info.pop("changements", None)
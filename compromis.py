@@ -0,0 +1,111 @@
+"""
+Frontière de faisabilité « recette A contre le reste » sur le stock actuel.
+
+Pour une masse x de la recette A (axe), la masse maximale y du groupe
+(les autres recettes, mélangées dans des proportions fixes) vaut
+    y(x) = min_m  (stock_m - a_m · x) / g_m         (matières avec g_m > 0)
+où a_m et g_m sont les besoins de la matière m par gramme de A et par
+gramme de groupe. C'est l'enveloppe inférieure de droites : une fonction
+concave affine par morceaux, calculée ici en un seul passage.
+"""
+
+EPS = 1e-12
+
+
+class FrontiereImpossible(ValueError):
+    """Frontière non définie (production non bornée sur un axe)."""
+
+
+def droites(besoins_axe, besoins_groupe, stock):
+    """
+    Droites y = ordonnee - pente · x, une par matière consommée par le groupe,
+    et abscisse maximale de l'axe (x_max) imposée par toutes les matières.
+    Retourne (droites, x_max, matiere_x_max) ; droites = [(m, ordonnee, pente)].
+    """
+    lignes = []
+    x_max, m_x_max = None, None
+    for m, (a, g, s) in enumerate(zip(besoins_axe, besoins_groupe, stock)):
+        s = max(s, 0.0)
+        if a > EPS and (x_max is None or s / a < x_max):
+            x_max, m_x_max = s / a, m
+        if g > EPS:
+            lignes.append((m, s / g, a / g))
+    if x_max is None:
+        raise FrontiereImpossible("La recette en abscisse ne consomme aucune matière.")
+    if not lignes:
+        raise FrontiereImpossible("Les recettes en ordonnée ne consomment aucune matière.")
+    return lignes, x_max, m_x_max
+
+
+def _active(lignes, x):
+    """Droite la plus basse en x (à égalité : celle qui descend le plus vite)."""
+    return min(lignes, key=lambda l: (l[1] - l[2] * x, -l[2]))
+
+
+def frontiere_exacte(besoins_axe, besoins_groupe, stock):
+    """
+    Points de rupture exacts de l'enveloppe, de x = 0 à x_max.
+    Retourne une liste de segments { x0, y0, x1, y1, limitante (indice) }.
+    Coût : O(matières × segments).
+    """
+    lignes, x_max, m_x_max = droites(besoins_axe, besoins_groupe, stock)
+    segments = []
+    x = 0.0
+    courante = _active(lignes, x)
+    while x < x_max - EPS:
+        m, b, k = courante
+        # prochaine droite qui passe sous la courante (pente plus forte) ;
+        # plusieurs droites coupant au même point : la plus pentue, qui reste
+        # en dessous des autres après le croisement
+        suivante, x_suiv = None, x_max
+        for l in lignes:
+            if l[2] > k + EPS:
+                xi = (l[1] - b) / (l[2] - k)
+                if xi <= x + EPS:
+                    continue
+                if abs(xi - x_suiv) <= EPS * max(1.0, abs(xi)):
+                    if suivante is not None and l[2] > suivante[2]:
+                        suivante = l
+                elif xi < x_suiv:
+                    suivante, x_suiv = l, xi
+        segments.append({
+            "x0": x, "y0": b - k * x,
+            "x1": x_suiv, "y1": b - k * x_suiv,
+            "limitante": m
+        })
+        if suivante is None:
+            break
+        x, courante = x_suiv, suivante
+
+    # chute verticale en x_max si l'axe est limité par une matière que le
+    # groupe ne consomme pas (ou pas assez)
+    y_fin = segments[-1]["y1"] if segments else _active(lignes, 0.0)[1]
+    if y_fin > 1e-9:
+        segments.append({"x0": x_max, "y0": y_fin, "x1": x_max, "y1": 0.0, "limitante": m_x_max})
+    return segments
+
+
+def frontiere_echantillonnee(besoins_axe, besoins_groupe, stock, nb_points):
+    """
+    `nb_points` points régulièrement espacés de x = 0 à x_max.
+    Retourne [ { x, y, limitante (indice) } ].
+    """
+    lignes, x_max, _ = droites(besoins_axe, besoins_groupe, stock)
+    points = []
+    for i in range(nb_points):
+        x = x_max * i / (nb_points - 1)
+        m, b, k = _active(lignes, x)
+        points.append({"x": x, "y": max(0.0, b - k * x), "limitante": m})
+    return points
+
+
+def besoins_melange(besoins, colonnes, parts):
+    """
+    Besoin de chaque matière par gramme d'un mélange des recettes
+    `colonnes` (indices) dans les proportions `parts` (somme quelconque).
+    """
+    total = float(sum(parts))
+    return [
+        sum(ligne[j] * p for j, p in zip(colonnes, parts)) / total
+        for ligne in besoins
+    ]
@@ -0,0 +1,44 @@
+import os
+
+
+def _bool(valeur, defaut):
+    if valeur is None:
+        return defaut
+    return valeur.strip().lower() in ("1", "true", "oui", "yes", "on")
+
+
+def url_base(environ=os.environ):
+    """
+    URL de la base depuis DATABASE_URL. Les hébergeurs fournissent parfois
+    encore le schéma 'postgres://', refusé par SQLAlchemy ≥ 1.4.
+    """
+    url = environ.get("DATABASE_URL")
+    if url and url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def options_moteur(url, environ=os.environ):
+    """
+    Options du pool de connexions SQLAlchemy, réglables par variables
+    d'environnement :
+      DB_POOL_SIZE      connexions gardées ouvertes par worker  (défaut 5)
+      DB_MAX_OVERFLOW   connexions supplémentaires temporaires  (défaut 10)
+      DB_POOL_TIMEOUT   attente max d'une connexion libre, s    (défaut 30)
+      DB_POOL_RECYCLE   durée de vie max d'une connexion, s     (défaut 1800)
+      DB_POOL_PRE_PING  vérifie la connexion avant usage        (défaut vrai)
+    Chaque worker a son propre pool : prévoir
+      workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) ≤ max_connections de PostgreSQL.
+    """
+    options = {
+        "pool_pre_ping": _bool(environ.get("DB_POOL_PRE_PING"), True),
+        "pool_recycle": int(environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+    # SQLite (développement) : pas de taille de pool à régler
+    if url and not url.startswith("sqlite"):
+        options.update({
+            "pool_size": int(environ.get("DB_POOL_SIZE", 5)),
+            "max_overflow": int(environ.get("DB_MAX_OVERFLOW", 10)),
+            "pool_timeout": int(environ.get("DB_POOL_TIMEOUT", 30)),
+        })
+    return options
@@ -0,0 +1,157 @@
+"""
+Coût de revient : coût moyen pondéré des achats par matière et coût des
+recettes.
+
+- Par matière : table cout_matiere, cumul des quantités (mg) et des
+  montants (centimes) achetés, mis à jour par un upsert à chaque achat ;
+  coût moyen = montant / quantité, sans relire l'historique.
+- Gardé en mémoire (TableCouts) et rechargé quand le compteur "couts"
+  change, comme les seuils : chaque achat l'incrémente.
+- Par recette : somme des pourcentages × coût moyen de chaque matière, en
+  un passage sur l'index des compositions (couts_recettes).
+
+Une matière jamais achetée n'a pas de coût : elle est signalée dans
+`matieres_sans_prix` et compte pour 0 dans les totaux.
+"""
+import threading
+
+from flask import g, has_request_context
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Achat, CoutMatiere
+from cache import invalider, lire_version
+from agregats import cumuler
+from unites import MG_PAR_KG, PPM_TOTAL, euros
+
+VERSION_COUTS = "couts"
+
+_cout = CoutMatiere.__table__
+
+_table = None
+_verrou = threading.Lock()
+
+
+class TableCouts:
+    """Cumuls d'achats par matière, à une version donnée."""
+
+    def __init__(self, version, par_matiere):
+        self.version = version
+        self.par_matiere = par_matiere  # matiere_id → (quantite_mg, prix_centimes)
+
+    def par_mg(self, matiere_id):
+        """Coût moyen pondéré en centimes par mg (flottant), None sans achat."""
+        q, p = self.par_matiere.get(matiere_id, (0, 0))
+        return p / q if q > 0 else None
+
+    def cout(self, matiere_id, masse_mg):
+        """Coût de `masse_mg` de la matière en centimes (non arrondi), None sans achat."""
+        unitaire = self.par_mg(matiere_id)
+        return None if unitaire is None else unitaire * masse_mg
+
+
+def _charger(version):
+    return TableCouts(version, {
+        mat_id: (q, p)
+        for mat_id, q, p in db.session.execute(
+            select(_cout.c.matiere_id, _cout.c.quantite_mg, _cout.c.prix_centimes)
+        )
+    })
+
+
+def table(version=None):
+    """
+    Coûts à jour. Comme seuils.table() : la version est prise dans flask.g
+    si index_compositions.charger vient de la lire avec le stock.
+    """
+    global _table
+    if version is None and has_request_context():
+        version = g.pop("version_couts", None)
+    if version is None:
+        version = lire_version(VERSION_COUTS)
+    courante = _table
+    if courante is not None and courante.version == version:
+        return courante
+    nouvelle = _charger(version)
+    with _verrou:
+        _table = nouvelle
+    return nouvelle
+
+
+def en_memoire():
+    """Vrai si les coûts ont déjà été chargés dans ce process."""
+    return _table is not None
+
+
+# ─── Écritures ───────────────────────────────────────────────────────────────
+
+def enregistrer_achats(achats):
+    """
+    Répercute des achats sur cout_matiere, dans la transaction en cours.
+    `achats` : itérable de dicts { matiere_id, quantite_mg, prix_centimes }.
+    """
+    cumul = {}
+    for a in achats:
+        q, p = cumul.get(a["matiere_id"], (0, 0))
+        cumul[a["matiere_id"]] = (q + a["quantite_mg"], p + a["prix_centimes"])
+    if not cumul:
+        return
+    cumuler(_cout, [
+        {"matiere_id": mat_id, "quantite_mg": q, "prix_centimes": p}
+        for mat_id, (q, p) in cumul.items()
+    ], ("quantite_mg", "prix_centimes"))
+    invalider(VERSION_COUTS)
+
+
+def reconstruire_couts():
+    """
+    Recalcule cout_matiere depuis la table achat (un GROUP BY). Retourne
+    le nombre de matières.
+    """
+    db.session.execute(_cout.delete())
+    rows = [
+        {"matiere_id": mat_id, "quantite_mg": q or 0, "prix_centimes": p or 0}
+        for mat_id, q, p in db.session.query(
+            Achat.matiere_id, func.sum(Achat.quantite_mg), func.sum(Achat.prix_centimes)
+        ).group_by(Achat.matiere_id)
+    ]
+    if rows:
+        db.session.execute(_cout.insert(), rows)
+    invalider(VERSION_COUTS)
+    return len(rows)
+
+
+# ─── Coût des recettes ───────────────────────────────────────────────────────
+
+def couts_recettes(index, couts, masse_mg=None):
+    """
+    Coût de chaque recette de l'index (index_compositions.IndexCompositions)
+    en un passage sur ses compositions, sans requête :
+      - cout_kg : coût d'un kg de la recette (euros) ;
+      - matieres_sans_prix : matières sans achat (comptées 0) ;
+      - avec `masse_mg` : cout_lot, coût d'une production de cette masse.
+    Le coût au mg de chaque matière (colonne) est calculé une seule fois ;
+    les totaux sont arrondis au centime une seule fois.
+    """
+    prix = [None if mat_id is None else couts.par_mg(mat_id) for mat_id in index.id_matieres]
+
+    colonnes, pourcentages, debut = index.colonnes, index.pourcentages, index.debut
+    resultats = []
+    for nom, r in index.lignes.items():
+        total, sans_prix = 0.0, []
+        for k in range(debut[r], debut[r + 1]):
+            col = colonnes[k]
+            if prix[col] is None:
+                sans_prix.append(index.noms_matieres[col])
+            else:
+                total += pourcentages[k] * prix[col]
+        # total : centimes par mg de recette × PPM_TOTAL
+        ligne = {
+            "recette": nom,
+            "cout_kg": euros(round(total * MG_PAR_KG / PPM_TOTAL)),
+            "matieres_sans_prix": sans_prix
+        }
+        if masse_mg is not None:
+            ligne["cout_lot"] = euros(round(total * masse_mg / PPM_TOTAL))
+        resultats.append(ligne)
+    return resultats
@@ -0,0 +1,82 @@
+"""
+Réponses JSON envoyées au fil de l'eau, sans construire la liste complète
+en mémoire :
+  - NDJSON (un objet par ligne) si le client l'accepte en priorité
+    (Accept: application/x-ndjson) ;
+  - tableau / objet JSON incrémental avec ?stream=1.
+Les lignes sont lues par paquets (yield_per) et encodées avec orjson
+s'il est installé.
+"""
+import json
+
+from flask import current_app, request, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # encodeur standard, plus lent
+    orjson = None
+
+NDJSON = "application/x-ndjson"
+
+# Lignes lues par aller-retour côté base en mode flux
+TAILLE_PAQUET = 500
+
+
+def encoder(obj):
+    """Sérialise `obj` en JSON compact (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def mode_flux():
+    """'ndjson', 'json' ou None (réponse classique) selon Accept et ?stream."""
+    accept = request.accept_mimetypes
+    # NDJSON seulement s'il est préféré explicitement (*/* ne suffit pas)
+    if accept[NDJSON] > accept["application/json"]:
+        return "ndjson"
+    if request.args.get("stream") in ("1", "true", "oui"):
+        return "json"
+    return None
+
+
+def _tableau(elements):
+    yield b"["
+    premier = True
+    for el in elements:
+        if not premier:
+            yield b","
+        premier = False
+        yield encoder(el)
+    yield b"]"
+
+
+def _sections(sections):
+    yield b"{"
+    for i, (cle, elements) in enumerate(sections):
+        if i:
+            yield b","
+        yield encoder(cle) + b":"
+        yield from _tableau(elements)
+    yield b"}"
+
+
+def reponse_flux(mode, elements=None, sections=None):
+    """
+    Réponse en flux.
+    - `elements` : itérable d'objets → tableau JSON ou NDJSON ;
+    - `sections` : liste de (clé, itérable) → objet { clé: [...] } en JSON,
+                   toutes les lignes à la suite en NDJSON.
+    Le contexte de requête (et la session SQLAlchemy) reste ouvert jusqu'à
+    la fin de l'envoi.
+    """
+    if mode == "ndjson":
+        if sections is not None:
+            elements = (el for _, it in sections for el in it)
+        corps = (encoder(el) + b"\n" for el in elements)
+        mimetype = NDJSON
+    elif sections is not None:
+        corps, mimetype = _sections(sections), "application/json"
+    else:
+        corps, mimetype = _tableau(elements), "application/json"
+    return current_app.response_class(stream_with_context(corps), mimetype=mimetype)
@@ -10,6 +10,36 @@ function showMessage(el, msg, isError = false) {
   setTimeout(() => el.textContent = '', 3000);
 }
 
+// 409 de l'idempotence : même clé, première requête pas encore terminée
+async function enCours(res) {
+  if (res.status !== 409) return false;
+  const corps = await res.clone().json().catch(() => ({}));
+  return corps.en_cours === true;
+}
+
+/**
+ * fetch pour les écritures (POST / PUT / DELETE) : une clé Idempotency-Key
+ * est tirée une fois, puis la requête est renvoyée avec la même clé en cas
+ * d'erreur réseau, de réponse 5xx ou de 409 « encore en cours » (la première
+ * requête n'est pas finie, corps { en_cours: true }). Les autres 409 sont
+ * des refus à montrer tels quels. Le serveur n'exécute l'écriture qu'une
+ * fois et renvoie la même réponse aux répétitions.
+ */
+async function fetchEcriture(url, options = {}, essais = 3) {
+  const cle = crypto.randomUUID();
+  const headers = { ...(options.headers || {}), 'Idempotency-Key': cle };
+  for (let i = 1; ; i++) {
+    try {
+      const res = await fetch(url, { ...options, headers });
+      if (i < essais && (res.status >= 500 || await enCours(res))) throw new Error(`HTTP ${res.status}`);
+      return res;
+    } catch (err) {
+      if (i >= essais) throw err;
+      await new Promise(r => setTimeout(r, 500 * i));
+    }
+  }
+}
+
 // ─── 2.1 Simulation multi-recettes & compromis (index.html) ────────────────────
 
 /**
@@ -24,7 +54,7 @@ async function loadRecettesCheckboxList() {
     if (!container) return;
     container.innerHTML = data
       .map(r => `
-        <label class="checkbox-inline">
+        <label class="checkbox-inline" data-nom="${r.nom}">
           <input type="checkbox" value="${r.nom}"> ${r.nom}
         </label>
       `).join('');
@@ -102,7 +132,7 @@ async function handleCompromiseIndex() {
     const res = await fetch(`${apiBase}/compromis_recettes`, {
       method:  'POST',
       headers: {'Content-Type':'application/json'},
-      body:    JSON.stringify({ recetteA: recA, recetteB: recB })
+      body:    JSON.stringify({ recetteA: recA, recetteB: recB, mode: 'frontiere' })
     });
 
     // 2) Traitement de la réponse
@@ -147,6 +177,18 @@ async function handleCompromiseIndex() {
     const maxX = xs.length ? Math.min(...xs) : undefined;
     const maxY = ys.length ? Math.min(...ys) : undefined;
 
+    // 6b) Frontière calculée par l'API (enveloppe des contraintes)
+    if (data.frontiere && data.frontiere.segments) {
+      const segs = data.frontiere.segments;
+      datasets.unshift({
+        label: 'Frontière',
+        data: [{ x: segs[0].x0, y: segs[0].y0 }, ...segs.map(s => ({ x: s.x1, y: s.y1 }))],
+        fill: true,
+        borderWidth: 3,
+        tension: 0
+      });
+    }
+
     // 7) (Re)créer le graphique
     if (window.compromiseChart) {
       window.compromiseChart.destroy();
@@ -205,6 +247,29 @@ async function loadRecettes() {
   }
 }
 
+/**
+ * Remplit la liste des recettes avec, pour la masse saisie, la couleur et la
+ * masse maximale produisible de chacune : une seule requête (/faisabilite)
+ * pour tout le catalogue, recettes produisibles en tête.
+ */
+async function loadRecettesSelect() {
+  const recetteSelect = document.getElementById('recette-select');
+  const masse = parseFloat(document.getElementById('masse-input').value) || 1000;
+  try {
+    const res = await fetch(`${apiBase}/faisabilite?masse=${masse}&tri=couleur`);
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const { recettes } = await res.json();
+    const choix = recetteSelect.value;
+    recetteSelect.innerHTML = recettes.map(r => `
+      <option value="${r.recette}" class="status-${r.couleur}">
+        ${r.recette} — max ${r.production_maximale_possible} g
+      </option>`).join('');
+    if (recettes.some(r => r.recette === choix)) recetteSelect.value = choix;
+  } catch (err) {
+    console.error('Erreur loadRecettesSelect:', err);
+  }
+}
+
 
 async function handleSimulate() {
   console.log('▶︎ handleSimulate() appelé');
@@ -231,6 +296,7 @@ async function handleSimulate() {
     if (!res.ok) {
       // en cas d’erreur serveur, on vide la table et on cache le bouton
       document.querySelector('#simulation-result tbody').innerHTML = '';
+      document.getElementById('simulation-cout').textContent = '';
       produceBtn.style.display = 'none';
       showMessage(msgEl, data.message || 'Erreur de simulation', true);
       return;
@@ -245,10 +311,12 @@ async function handleSimulate() {
         <tr>
           <td>${d.matiere}</td>
           <td>${d.quantite_necessaire.toFixed(2)}</td>
+          <td>${d.cout == null ? '—' : d.cout.toFixed(2)}</td>
           <td class="${cssClass}"><strong>${cleanStatut}</strong></td>
         </tr>
       `;
     }).join('');
+    document.getElementById('simulation-cout').textContent = texteCout(data);
 
     // 3) Détection unique des cas “noir” / “rouge‐orange” / “vert”
     const couleurs = (data.details || []).map(d => d.couleur.toLowerCase());
@@ -291,6 +359,17 @@ async function handleSimulate() {
     showMessage(msgEl, 'Échec simulation', true);
   }
 }
+// Coût d'une simulation / production (coût moyen pondéré des achats)
+function texteCout(res) {
+  if (res.cout_total == null) return '';
+  let texte = `Coût : ${res.cout_total.toFixed(2)} €`;
+  if (res.cout_kg != null) texte += ` (${res.cout_kg.toFixed(2)} €/kg)`;
+  if (res.matieres_sans_prix && res.matieres_sans_prix.length) {
+    texte += ` — sans prix d'achat : ${res.matieres_sans_prix.join(', ')}`;
+  }
+  return texte;
+}
+
 async function handleProduce() {
   const recetteSelect = document.getElementById('recette-select');
   const masseInput    = document.getElementById('masse-input');
@@ -301,7 +380,7 @@ async function handleProduce() {
     const masse   = parseFloat(masseInput.value);
     const override = produceBtn.dataset.override === 'true';
     console.log('Override envoyé ?', override);
-    const res     = await fetch(`${apiBase}/produire`, {
+    const res     = await fetchEcriture(`${apiBase}/produire`, {
       method: 'POST',
       headers: {'Content-Type':'application/json'},
       body: JSON.stringify({ recette, masse, override })
@@ -316,6 +395,7 @@ async function handleProduce() {
       <td>${s.nouveau_stock.toFixed(2)}</td>
     </tr>
   `).join('');
+  document.getElementById('production-cout').textContent = texteCout(json);
 }
   } catch (err) {
     showMessage(msgEl, 'Échec production', true);
@@ -335,23 +415,38 @@ async function loadStock() {
     // Remplir
     bases.forEach(item => {
       document.querySelector('#table-stock-bases tbody')
-        .insertAdjacentHTML('beforeend', `
-          <tr><td>${item.nom}</td>
-              <td>${item.quantite} ${item.unite}</td>
-          </tr>`);
+        .insertAdjacentHTML('beforeend', ligneStock(item));
     });
     oxydes.forEach(item => {
       document.querySelector('#table-stock-oxydes tbody')
-        .insertAdjacentHTML('beforeend', `
-          <tr><td>${item.nom}</td>
-              <td>${item.quantite} ${item.unite}</td>
-          </tr>`);
+        .insertAdjacentHTML('beforeend', ligneStock(item));
     });
   } catch (err) {
     console.error('Erreur loadStock:', err);
   }
 }
 
+/** Ligne du tableau de stock ; data-nom / data-unite servent au flux des changements. */
+function ligneStock(item) {
+  return `
+    <tr data-nom="${item.nom}" data-unite="${item.unite}">
+      <td>${item.nom}</td>
+      <td>${item.quantite} ${item.unite}</td>
+    </tr>`;
+}
+
+function ligneAchat(achat) {
+  return `
+      <tr>
+        <td>${achat.date}</td>
+        <td>${achat.nom}</td>
+        <td>${achat.quantite}</td>
+        <td>${achat.prix}</td>
+        <td>${achat.fournisseur}</td>
+      </tr>
+    `;
+}
+
 async function loadHistorique() {
   try {
     const res = await fetch(`${apiBase}/historique_achats`);
@@ -364,15 +459,7 @@ async function loadHistorique() {
 
   // Le JSON renvoie bien data[cat].achats, un tableau d’achats :contentReference[oaicite:0]{index=0}
   data[cat].achats.forEach(achat => {
-    tbody.insertAdjacentHTML('beforeend', `
-      <tr>
-        <td>${achat.date}</td>
-        <td>${achat.nom}</td>
-        <td>${achat.quantite}</td>
-        <td>${achat.prix}</td>
-        <td>${achat.fournisseur}</td>
-      </tr>
-    `);
+    tbody.insertAdjacentHTML('beforeend', ligneAchat(achat));
   });
 });
   } catch (err) {
@@ -387,14 +474,15 @@ async function handleAddMatiere(e) {
   const unite = document.getElementById('matiere-unite').value.trim();
   const msgEl = document.getElementById('msg-matiere');
   try {
-    const res = await fetch(`${apiBase}/ajouter_matiere`, {
+    const res = await fetchEcriture(`${apiBase}/ajouter_matiere`, {
       method: 'POST',
       headers: {'Content-Type':'application/json'},
       body: JSON.stringify({nom, type, unite})
     });
     const json = await res.json();
     showMessage(msgEl, json.message, !res.ok);
-    if (res.ok) loadStock();
+    // avec le flux des changements, la nouvelle ligne arrive par l'événement 'matiere'
+    if (res.ok && !fluxActif) loadStock();
   } catch (err) {
     showMessage(msgEl, 'Erreur réseau', true);
     console.error(err);
@@ -413,14 +501,14 @@ async function handleAddAchat(e) {
   try {
     const payload = {nom, quantite, prix, fournisseur, date};
     if (typeInput) payload.type = typeInput;
-    const res = await fetch(`${apiBase}/achat`, {
+    const res = await fetchEcriture(`${apiBase}/achat`, {
       method: 'POST',
       headers: {'Content-Type':'application/json'},
       body: JSON.stringify(payload)
     });
     const json = await res.json();
     showMessage(msgEl, json.message, !res.ok);
-    if (res.ok) {
+    if (res.ok && !fluxActif) {
       loadStock();
       loadHistorique();
     }
@@ -467,29 +555,31 @@ async function loadRecettesList() {
       return;
     }
     const tbody = document.querySelector('#table-recettes tbody');
-    tbody.innerHTML = data.map(r => {
-      // Transformer { nom: pourcentage } → "nom: pourcentage%"
-      const basesText  = Object.entries(r.base  || {})
-                             .map(([k,v]) => `${k}: ${v}%`)
-                             .join(', ') || '–';
-      const oxydesText = Object.entries(r.oxydes || {})
-                             .map(([k,v]) => `${k}: ${v}%`)
-                             .join(', ') || '–';
-
-      return `
-        <tr>
-          <td>${r.nom}</td>
-          <td>${basesText}</td>        <!-- utilisation de r.base -->
-          <td>${oxydesText}</td>
-          <td>${r.description_url ? `<a href="${r.description_url}" target="_blank">Voir</a>` : '–'}</td>
-          <td>${r.production_doc_url ? `<a href="${r.production_doc_url}" target="_blank">Voir</a>` : '–'}</td>
-        </tr>`;
-    }).join('');
+    tbody.innerHTML = data.map(ligneRecette).join('');
   } catch (err) {
     console.error('Échec loadRecettesList :', err);
   }
 }
 
+function ligneRecette(r) {
+  // Transformer { nom: pourcentage } → "nom: pourcentage%"
+  const basesText  = Object.entries(r.base  || {})
+                         .map(([k,v]) => `${k}: ${v}%`)
+                         .join(', ') || '–';
+  const oxydesText = Object.entries(r.oxydes || {})
+                         .map(([k,v]) => `${k}: ${v}%`)
+                         .join(', ') || '–';
+
+  return `
+    <tr data-nom="${r.nom}">
+      <td>${r.nom}</td>
+      <td>${basesText}</td>        <!-- utilisation de r.base -->
+      <td>${oxydesText}</td>
+      <td>${r.description_url ? `<a href="${r.description_url}" target="_blank">Voir</a>` : '–'}</td>
+      <td>${r.production_doc_url ? `<a href="${r.production_doc_url}" target="_blank">Voir</a>` : '–'}</td>
+    </tr>`;
+}
+
 /**
  * Traite l'envoi du formulaire de création de recette
  */
@@ -541,7 +631,7 @@ async function handleAddRecette(e) {
       production_doc_url: prodDocInput.value.trim()
     };
 
-    const res  = await fetch(`${apiBase}/ajouter_recette`, {
+    const res  = await fetchEcriture(`${apiBase}/ajouter_recette`, {
       method:  'POST',
       headers: {'Content-Type':'application/json'},
       body:    JSON.stringify(payload)
@@ -551,7 +641,7 @@ async function handleAddRecette(e) {
 
     if (res.ok) {
       e.target.reset();
-      loadRecettesList();
+      if (!fluxActif) loadRecettesList();
     }
   } catch (err) {
     console.error('Erreur réseau handleAddRecette :', err);
@@ -568,12 +658,16 @@ async function loadAdminRecettes() {
   const res = await fetch(`${apiBase}/recettes`);
   const data = await res.json();
   const tbody = document.querySelector('#table-admin-recettes tbody');
-  tbody.innerHTML = data.map(r => `
-    <tr>
+  tbody.innerHTML = data.map(ligneAdminRecette).join('');
+}
+
+function ligneAdminRecette(r) {
+  return `
+    <tr data-nom="${r.nom}">
       <td>${r.nom}</td>
       <td><button class="btn-delete-recette" data-nom="${r.nom}">Supprimer</button></td>
     </tr>
-  `).join('');
+  `;
 }
 
 /**
@@ -587,13 +681,17 @@ async function loadAdminMatieres() {
     ...oxydes.map(m => ({...m, type:'oxyde'}))
   ];
   const tbody = document.querySelector('#table-admin-matieres tbody');
-  tbody.innerHTML = all.map(m => `
-    <tr>
+  tbody.innerHTML = all.map(ligneAdminMatiere).join('');
+}
+
+function ligneAdminMatiere(m) {
+  return `
+    <tr data-nom="${m.nom}">
       <td>${m.nom}</td>
       <td>${m.type}</td>
       <td><button class="btn-delete-matiere" data-nom="${m.nom}">Supprimer</button></td>
     </tr>
-  `).join('');
+  `;
 }
 
 /**
@@ -604,10 +702,10 @@ async function handleDeleteRecette(e) {
   const nom = e.target.dataset.nom;
   const msg = document.getElementById('msg-admin-recette');
   try {
-    const res = await fetch(`${apiBase}/recettes/${encodeURIComponent(nom)}`, { method:'DELETE' });
+    const res = await fetchEcriture(`${apiBase}/recettes/${encodeURIComponent(nom)}`, { method:'DELETE' });
     const data = await res.json();
     showMessage(msg, data.message, !res.ok);
-    if (res.ok) loadAdminRecettes();
+    if (res.ok && !fluxActif) loadAdminRecettes();
   } catch (err) {
     showMessage(msg, 'Erreur réseau', true);
   }
@@ -622,16 +720,125 @@ async function handleDeleteMatiere(e) {
   const nom = e.target.dataset.nom;
   const msg = document.getElementById('msg-admin-matiere');
   try {
-    const res = await fetch(`${apiBase}/matieres/${encodeURIComponent(nom)}`, { method:'DELETE' });
+    const res = await fetchEcriture(`${apiBase}/matieres/${encodeURIComponent(nom)}`, { method:'DELETE' });
     const data = await res.json();
     showMessage(msg, data.message, !res.ok);
-    if (res.ok) loadAdminMatieres();
+    if (res.ok && !fluxActif) loadAdminMatieres();
   } catch (err) {
     showMessage(msg, 'Erreur réseau', true);
   }
 }
 
-// ─── 6. DOMContentLoaded ───────────────────────────────────────────────────────
+// ─── 6. Flux des changements (GET /changements, Server-Sent Events) ────────────
+// Les écritures (achats, productions, ajouts, suppressions) de tous les
+// postes arrivent en petits événements appliqués aux tableaux affichés,
+// sans tout recharger. Tant que le flux est ouvert, les formulaires ne
+// rechargent plus leurs tableaux eux-mêmes.
+let fluxActif = false;
+
+function lignePar(tbody, nom) {
+  return tbody ? [...tbody.rows].find(tr => tr.dataset.nom === nom) : undefined;
+}
+
+function tbodyStock(type) {
+  return document.querySelector(`#table-stock-${type === 'base' ? 'bases' : 'oxydes'} tbody`);
+}
+
+function appliquerStock({ matieres }) {
+  matieres.forEach(m => {
+    const tr = lignePar(tbodyStock(m.type), m.nom);
+    if (tr) tr.cells[1].textContent = `${m.quantite} ${tr.dataset.unite}`;
+  });
+  // page Production : masses maximales recalculées (une requête)
+  if (document.getElementById('recette-select')) loadRecettesSelect();
+}
+
+function appliquerAchat(achat) {
+  const tbody = document.querySelector(`#table-histo-${achat.type_matiere === 'base' ? 'bases' : 'oxydes'} tbody`);
+  if (tbody) tbody.insertAdjacentHTML('afterbegin', ligneAchat(achat));
+}
+
+function appliquerMatiere(evt) {
+  const stock = tbodyStock(evt.type_matiere);
+  const admin = document.querySelector('#table-admin-matieres tbody');
+  if (evt.action === 'suppression') {
+    lignePar(stock, evt.nom)?.remove();
+    lignePar(admin, evt.nom)?.remove();
+    return;
+  }
+  if (stock && !lignePar(stock, evt.nom)) {
+    stock.insertAdjacentHTML('beforeend', ligneStock(evt));
+  }
+  if (admin && !lignePar(admin, evt.nom)) {
+    admin.insertAdjacentHTML('beforeend', ligneAdminMatiere({ nom: evt.nom, type: evt.type_matiere }));
+  }
+}
+
+function appliquerRecette(evt) {
+  const nom    = evt.action === 'suppression' ? evt.nom : evt.recette.nom;
+  const liste  = document.getElementById('list-recettes-index');
+  const select = document.getElementById('recette-select');
+  const table  = document.querySelector('#table-recettes tbody');
+  const admin  = document.querySelector('#table-admin-recettes tbody');
+  if (evt.action === 'suppression') {
+    liste?.querySelector(`label[data-nom="${CSS.escape(nom)}"]`)?.remove();
+    [...(select?.options || [])].find(o => o.value === nom)?.remove();
+    lignePar(table, nom)?.remove();
+    lignePar(admin, nom)?.remove();
+    return;
+  }
+  if (liste && !liste.querySelector(`label[data-nom="${CSS.escape(nom)}"]`)) {
+    liste.insertAdjacentHTML('beforeend', `
+        <label class="checkbox-inline" data-nom="${nom}">
+          <input type="checkbox" value="${nom}"> ${nom}
+        </label>`);
+  }
+  // la liste de production affiche la faisabilité : relue pour la nouvelle recette
+  if (select && ![...select.options].some(o => o.value === nom)) loadRecettesSelect();
+  if (table && !lignePar(table, nom)) table.insertAdjacentHTML('beforeend', ligneRecette(evt.recette));
+  if (admin && !lignePar(admin, nom)) admin.insertAdjacentHTML('beforeend', ligneAdminRecette(evt.recette));
+}
+
+/** Recharge ce qui est affiché : 'stock', 'recettes' ou 'tout'. */
+function resynchroniser({ cible }) {
+  if (cible !== 'recettes') {
+    if (document.getElementById('table-stock-bases')) { loadStock(); loadHistorique(); }
+    if (document.getElementById('table-admin-matieres')) loadAdminMatieres();
+  }
+  if (cible !== 'stock') {
+    if (document.getElementById('list-recettes-index')) loadRecettesCheckboxList();
+    if (document.getElementById('recette-select')) loadRecettesSelect();
+    if (document.getElementById('table-recettes')) loadRecettesList();
+    if (document.getElementById('table-admin-recettes')) loadAdminRecettes();
+  }
+}
+
+function ecouterChangements() {
+  if (!window.EventSource) return;
+  const source = new EventSource(`${apiBase}/changements`);
+  const traitements = {
+    stock: appliquerStock,
+    achat: appliquerAchat,
+    matiere: appliquerMatiere,
+    recette: appliquerRecette,
+    resynchroniser
+  };
+  Object.entries(traitements).forEach(([type, traiter]) => {
+    source.addEventListener(type, e => traiter(JSON.parse(e.data)));
+  });
+  source.addEventListener('open', () => {
+    // après une reconnexion, les événements manqués sont rejoués
+    // (Last-Event-ID) ou remplacés par un 'resynchroniser'
+    fluxActif = true;
+  });
+  source.addEventListener('error', () => {
+    // coupure : EventSource se reconnecte seul. Refus (503, trop de
+    // connexions) : il abandonne. Dans les deux cas, rechargements classiques.
+    fluxActif = false;
+  });
+}
+
+// ─── 7. DOMContentLoaded ───────────────────────────────────────────────────────
 document.addEventListener('DOMContentLoaded', () => {
 
   // ==== Bloc INDEX (simulation groupée & compromis) ====
@@ -650,15 +857,8 @@ document.addEventListener('DOMContentLoaded', () => {
   const simulateBtn   = document.getElementById('simulate-btn');
   if (recetteSelect && simulateBtn) {
     console.log('▶︎ Init simulation simple');
-    recetteSelect.innerHTML = '';
-    loadRecettes()
-      .then(recettes => {
-        recettes.forEach(r => {
-          recetteSelect.insertAdjacentHTML('beforeend',
-            `<option value="${r.nom}">${r.nom}</option>`);
-        });
-      })
-      .catch(err => console.error('Erreur loadRecettes:', err));
+    loadRecettesSelect();
+    document.getElementById('masse-input').addEventListener('change', loadRecettesSelect);
     simulateBtn.addEventListener('click', handleSimulate);
   }
 
@@ -698,4 +898,7 @@ document.addEventListener('DOMContentLoaded', () => {
             .addEventListener('click', handleDeleteMatiere);
   }
 
+  // ==== Flux des changements (toutes les pages) ====
+  ecouterChangements();
+
 });
@@ -0,0 +1,41 @@
+# Configuration gunicorn (lue par `gunicorn -c gunicorn.conf.py wsgi:app`).
+# Modèle : plusieurs process (workers) × plusieurs threads par process.
+# Voir README.md, section « Déploiement ».
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# WEB_CONCURRENCY : nombre de process (convention Heroku / Railway)
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count() * 2 + 1)))
+
+# Threads par process : les requêtes attendent surtout PostgreSQL
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Redémarrage périodique des workers (fuites mémoire éventuelles)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+
+# Préchargement : l'application est importée une fois dans le master, les
+# workers (et leurs remplaçants après max_requests) démarrent par fork sans
+# réimporter Flask / SQLAlchemy. Aucune connexion n'est ouverte avant la
+# première requête (voir app.py) : chaque worker crée donc son propre pool
+# après le fork. GUNICORN_PRELOAD=0 revient à un import par worker.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").strip().lower() not in ("0", "false", "non", "no", "off")
+
+
+def post_fork(server, worker):
+    """Filet de sécurité : oublie toute connexion qui aurait été ouverte dans le master."""
+    if not preload_app:
+        return
+    from extensions import db
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,180 @@
+"""
+En-tête Idempotency-Key sur les routes d'écriture.
+
+Un client qui répète une requête (nouvel essai après un délai dépassé)
+avec la même clé reçoit la réponse de la première exécution, sans que
+l'écriture soit refaite :
+
+- 1re requête : INSERT de la clé (statut 'en_cours') dans sa propre
+  transaction, exécution de la route, puis enregistrement du code et du
+  corps de la réponse. La clé primaire rend la réservation atomique :
+  c'est la seule recherche indexée ajoutée au chemin normal.
+- Répétition : la clé existe déjà ; si la réponse est enregistrée elle
+  est renvoyée (en-tête Idempotent-Replayed), si la première requête est
+  encore en cours on attend sa fin (ATTENTE_MAX_S, puis 409 avec
+  Retry-After et "en_cours": true, seul 409 à réessayer tel quel).
+- Même clé, requête différente (route ou corps) : 422.
+- Erreur 5xx ou exception : la clé est libérée, un nouvel essai ré-exécute.
+
+Les clés expirent après DUREE_VIE (`flask purger-cles` supprime les
+expirées ; une clé expirée est de toute façon remplacée à la réutilisation).
+Sans en-tête, la route s'exécute comme avant.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import CleIdempotence
+
+ENTETE = "Idempotency-Key"
+DUREE_VIE = timedelta(hours=24)
+ATTENTE_MAX_S = 10.0        # attente d'une requête identique en cours
+INTERVALLE_S = 0.05
+TAILLE_CLE = 255
+
+EN_COURS = "en_cours"
+TERMINE = "termine"
+
+_cles = CleIdempotence.__table__
+
+
+def _empreinte():
+    """
+    sha256 de la méthode, du chemin, des paramètres et du corps JSON.
+    Les corps envoyés en flux (imports) ne sont pas lus ici : seuls leur
+    type et leur longueur entrent dans l'empreinte.
+    """
+    h = hashlib.sha256()
+    for partie in (request.method.encode(), request.path.encode(), request.query_string):
+        h.update(partie + b"\0")
+    if request.is_json:
+        h.update(request.get_data(cache=True))
+    else:
+        h.update(f"{request.mimetype}\0{request.content_length}".encode())
+    return h.hexdigest()
+
+
+def _lire(cle):
+    return db.session.execute(select(_cles).where(_cles.c.cle == cle)).first()
+
+
+def _reserver(cle, route, empreinte):
+    """
+    Réserve la clé (transaction courte, commitée). Retourne None si la clé
+    est à nous, sinon la ligne existante (non expirée).
+    """
+    for _ in range(3):
+        maintenant = datetime.utcnow()
+        try:
+            db.session.execute(insert(_cles).values(
+                cle=cle, route=route, empreinte=empreinte, statut=EN_COURS,
+                expire_le=maintenant + DUREE_VIE
+            ))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            # sous PostgreSQL, l'INSERT a attendu la fin de la transaction
+            # concurrente qui réservait la même clé
+            db.session.rollback()
+        ligne = _lire(cle)
+        if ligne is None:
+            continue    # libérée entre-temps
+        if ligne.expire_le > maintenant:
+            return ligne
+        db.session.execute(delete(_cles).where(_cles.c.cle == cle, _cles.c.expire_le <= maintenant))
+        db.session.commit()
+    raise RuntimeError(f"Clé d'idempotence {cle!r} : réservation impossible.")
+
+
+def _liberer(cle):
+    db.session.rollback()
+    db.session.execute(delete(_cles).where(_cles.c.cle == cle, _cles.c.statut == EN_COURS))
+    db.session.commit()
+
+
+def _enregistrer(cle, rv):
+    # ce que la route n'a pas commité est abandonné, comme en fin de requête
+    db.session.rollback()
+    db.session.execute(
+        update(_cles).where(_cles.c.cle == cle)
+        .values(statut=TERMINE, code=rv.status_code, corps=rv.get_data(), mimetype=rv.mimetype)
+    )
+    db.session.commit()
+
+
+def _attendre(cle, ligne):
+    """Attend la fin d'une requête en cours avec la même clé ; None si elle a été libérée."""
+    fin = time.monotonic() + ATTENTE_MAX_S
+    while ligne is not None and ligne.statut == EN_COURS:
+        if time.monotonic() >= fin:
+            break
+        time.sleep(INTERVALLE_S)
+        db.session.rollback()   # nouvelle lecture : voir le commit de l'autre requête
+        ligne = _lire(cle)
+    return ligne
+
+
+def _rejouer(ligne):
+    rv = current_app.response_class(ligne.corps, status=ligne.code, mimetype=ligne.mimetype)
+    rv.headers["Idempotent-Replayed"] = "true"
+    return rv
+
+
+def idempotent(vue):
+    """
+    Décorateur des routes d'écriture (à placer sous @api.route).
+    Voir le docstring du module.
+    """
+    @wraps(vue)
+    def wrapper(*args, **kwargs):
+        cle = request.headers.get(ENTETE)
+        if cle is None:
+            return vue(*args, **kwargs)
+        cle = cle.strip()
+        if not cle or len(cle) > TAILLE_CLE:
+            return jsonify({"message": f"En-tête {ENTETE} invalide (1 à {TAILLE_CLE} caractères)."}), 400
+
+        route = f"{request.method} {request.path}"
+        empreinte = _empreinte()
+
+        # 1) Réservation, ou requête déjà vue
+        ligne = _reserver(cle, route, empreinte)
+        while ligne is not None:
+            if ligne.route != route or ligne.empreinte != empreinte:
+                return jsonify({"message": f"{ENTETE} déjà utilisée pour une autre requête."}), 422
+            ligne = _attendre(cle, ligne)
+            if ligne is not None and ligne.statut == TERMINE:
+                return _rejouer(ligne)
+            if ligne is not None:
+                rv = jsonify({"message": "Une requête avec la même clé est encore en cours.", "en_cours": True})
+                rv.status_code = 409
+                rv.headers["Retry-After"] = "1"
+                return rv
+            # la première requête a échoué et libéré la clé : on reprend
+            ligne = _reserver(cle, route, empreinte)
+
+        # 2) Exécution, puis réponse enregistrée (ou clé libérée si erreur)
+        try:
+            rv = make_response(vue(*args, **kwargs))
+        except Exception:
+            _liberer(cle)
+            raise
+        if rv.status_code >= 500:
+            _liberer(cle)
+        else:
+            _enregistrer(cle, rv)
+        return rv
+
+    return wrapper
+
+
+def purger_cles():
+    """Supprime les clés expirées ; retourne leur nombre."""
+    res = db.session.execute(delete(_cles).where(_cles.c.expire_le <= datetime.utcnow()))
+    return res.rowcount
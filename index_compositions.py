@@ -0,0 +1,294 @@
+"""
+Index en mémoire des compositions : matrice creuse recette × matière
+(format CSR) et correspondances nom ↔ id, partagée par les routes de
+simulation et de planification.
+
+- Construit au premier usage, en une requête.
+- Version : compteur "compositions" (table compteur), incrémenté par
+  chaque écriture qui touche aux recettes. Une fois commitée, l'écriture
+  est appliquée à l'index du process qui l'a faite (mise à jour
+  incrémentale sur une copie, qui remplace l'index du module : un
+  lecteur garde jusqu'au bout l'index qu'il a obtenu, jamais modifié
+  après coup) ; les autres workers voient la nouvelle version et
+  reconstruisent leur index au prochain usage.
+- Le stock n'est pas dans l'index : il est relu à chaque appel, avec la
+  version, en une seule requête (charger()). Les versions des seuils et
+  des coûts sont lues au passage et laissées dans flask.g pour
+  seuils.table() et couts.table().
+- Pourcentages en ppm et stock en mg, entiers (voir unites.py).
+"""
+import threading
+
+from flask import g, has_request_context
+from sqlalchemy import event, literal, select, union_all
+
+from extensions import db
+from models import Recette, Composition, Matiere, Compteur
+from cache import invalider, lire_version
+from seuils import VERSION_SEUILS
+from couts import VERSION_COUTS
+from unites import PPM_TOTAL, grammes
+
+VERSION_COMPOSITIONS = "compositions"
+
+# compteurs relus avec le stock : id négatif → nom du compteur
+_COMPTEURS = {-1: VERSION_COMPOSITIONS, -2: VERSION_SEUILS, -3: VERSION_COUTS}
+
+_index = None
+_verrou = threading.Lock()
+
+
+class IndexCompositions:
+    """
+    Lignes = recettes, colonnes = matières. Les compositions de la ligne r
+    sont colonnes[debut[r]:debut[r + 1]] / pourcentages[debut[r]:debut[r + 1]]
+    (ppm).
+    Une matière présente plusieurs fois dans une recette n'occupe qu'une
+    case : première position, dernier pourcentage (comme la simulation).
+    Les lignes des recettes supprimées restent jusqu'à la reconstruction.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        # lignes
+        self.lignes = {}          # nom de recette → ligne
+        self.id_recettes = []
+        self.noms_recettes = []
+        self.debut = [0]
+        self.colonnes = []
+        self.pourcentages = []
+        # colonnes
+        self.par_id = {}          # matiere_id → colonne
+        self.par_nom = {}         # nom de matière → colonne
+        self.id_matieres = []     # None : matière absente de la table matiere
+        self.noms_matieres = []
+        self.types = []
+
+    # ─── Construction / mises à jour ─────────────────────────────────────────
+
+    def _colonne(self, mat_id, nom, type_matiere):
+        col = self.par_id.get(mat_id)
+        if col is None:
+            col = len(self.id_matieres)
+            existe = nom is not None
+            self.par_id[mat_id] = col
+            self.id_matieres.append(mat_id if existe else None)
+            self.noms_matieres.append(nom if existe else f"#{mat_id}")
+            self.types.append(type_matiere)
+            if existe:
+                self.par_nom[nom] = col
+        return col
+
+    def ajouter_recette(self, rec_id, nom, compositions):
+        """`compositions` : [(matiere_id, nom_matiere, type_matiere, ppm)] dans l'ordre."""
+        cases = {}
+        for mat_id, nom_mat, type_mat, pct in compositions:
+            cases[self._colonne(mat_id, nom_mat, type_mat)] = pct
+        self.colonnes.extend(cases)
+        self.pourcentages.extend(cases.values())
+        self.debut.append(len(self.colonnes))
+        self.id_recettes.append(rec_id)
+        self.noms_recettes.append(nom)
+        self.lignes[nom] = len(self.noms_recettes) - 1
+
+    def supprimer_recette(self, nom):
+        self.lignes.pop(nom, None)
+
+    def supprimer_matiere(self, mat_id):
+        col = self.par_id.get(mat_id)
+        if col is not None:
+            self.par_nom.pop(self.noms_matieres[col], None)
+
+    def copie(self):
+        """Copie indépendante (listes et dictionnaires recopiés) à mettre à jour."""
+        autre = IndexCompositions.__new__(IndexCompositions)
+        for nom, valeur in vars(self).items():
+            setattr(autre, nom, valeur.copy() if isinstance(valeur, (list, dict)) else valeur)
+        return autre
+
+    # ─── Lecture ─────────────────────────────────────────────────────────────
+
+    def compositions(self, nom):
+        """[(colonne, ppm)] de la recette `nom` (KeyError si absente)."""
+        r = self.lignes[nom]
+        return zip(self.colonnes[self.debut[r]:self.debut[r + 1]],
+                   self.pourcentages[self.debut[r]:self.debut[r + 1]])
+
+    def absentes(self, noms):
+        return [n for n in noms if n not in self.lignes]
+
+    def ids_matieres(self, noms):
+        """Ids des matières (existantes) utilisées par les recettes `noms` connues."""
+        return {
+            self.id_matieres[col]
+            for nom in noms if nom in self.lignes
+            for col, _ in self.compositions(nom)
+            if self.id_matieres[col] is not None
+        }
+
+    def recettes(self, noms, stock):
+        """
+        Recettes `noms` au format attendu par simulation.simuler() :
+        { nom: { id, nom, compositions: [ {matiere, matiere_id, type_matiere,
+        ppm, stock_mg} ] } } ; `stock` : { matiere_id: quantite_mg }.
+        Les recettes inconnues sont absentes du résultat.
+        """
+        resultat = {}
+        for nom in noms:
+            if nom not in self.lignes:
+                continue
+            resultat[nom] = {
+                "id": self.id_recettes[self.lignes[nom]],
+                "nom": nom,
+                "compositions": [
+                    {
+                        "matiere": self.noms_matieres[col],
+                        "matiere_id": self.id_matieres[col],
+                        "type_matiere": self.types[col],
+                        "ppm": pct,
+                        "stock_mg": stock.get(self.id_matieres[col])
+                    }
+                    for col, pct in self.compositions(nom)
+                ]
+            }
+        return resultat
+
+    def matrice(self, noms, stock):
+        """
+        Matrice matière × recette des recettes `noms` (toutes connues).
+        Retourne (noms_matieres, besoins, stock) où besoins[m][r] est la
+        masse de la matière m consommée par gramme de la recette r et
+        stock[m] le stock en grammes (flottants, pour les solveurs).
+        """
+        index_m = {}
+        besoins = []
+        stock_vec = []
+        for j, nom in enumerate(noms):
+            for col, pct in self.compositions(nom):
+                if col not in index_m:
+                    index_m[col] = len(besoins)
+                    besoins.append([0.0] * len(noms))
+                    stock_vec.append(grammes(stock.get(self.id_matieres[col])))
+                besoins[index_m[col]][j] = pct / PPM_TOTAL
+        return [self.noms_matieres[col] for col in index_m], besoins, stock_vec
+
+
+def construire():
+    """Reconstruit l'index du process depuis la base (une requête + la version)."""
+    global _index
+    version = lire_version(VERSION_COMPOSITIONS)   # lue AVANT les données
+    rows = (
+        db.session.query(
+            Recette.id,
+            Recette.nom,
+            Composition.matiere_id,
+            Matiere.nom,
+            Matiere.type,
+            Composition.pourcentage_ppm
+        )
+        .outerjoin(Composition, Composition.recette_id == Recette.id)
+        .outerjoin(Matiere, Composition.matiere_id == Matiere.id)
+        .order_by(Recette.id, Composition.id)
+    )
+    index = IndexCompositions(version)
+    courante, nom_courant, comps = None, None, []
+    for rec_id, rec_nom, mat_id, mat_nom, mat_type, pct in rows:
+        if rec_id != courante:
+            if courante is not None:
+                index.ajouter_recette(courante, nom_courant, comps)
+            courante, nom_courant, comps = rec_id, rec_nom, []
+        if pct is not None:
+            comps.append((mat_id, mat_nom, mat_type, pct))
+    if courante is not None:
+        index.ajouter_recette(courante, nom_courant, comps)
+
+    with _verrou:
+        _index = index
+    return index
+
+
+def en_memoire():
+    """Vrai si l'index de ce process est construit (sans vérifier sa version)."""
+    return _index is not None
+
+
+def _stock_et_versions(ids):
+    """Stock des matières `ids` (None : toutes) et versions des compteurs, en une requête."""
+    matieres = select(Matiere.id, Matiere.quantite_mg)
+    if ids is not None:
+        matieres = matieres.where(Matiere.id.in_(list(ids)))
+    requete = union_all(
+        matieres,
+        *(
+            select(literal(cle), Compteur.valeur).where(Compteur.nom == nom)
+            for cle, nom in _COMPTEURS.items()
+        )
+    )
+    stock, versions = {}, dict.fromkeys(_COMPTEURS.values(), 0)
+    for mat_id, valeur in db.session.execute(requete):
+        if mat_id in _COMPTEURS:
+            versions[_COMPTEURS[mat_id]] = valeur
+        else:
+            stock[mat_id] = valeur
+    return stock, versions
+
+
+def charger(noms):
+    """
+    Index à jour et stock des matières des recettes `noms` (None : stock de
+    toutes les matières, pour parcourir tout le catalogue).
+    Cas courant : une seule requête (stock + version). Si la version a
+    changé depuis la construction, l'index est reconstruit et le stock relu.
+    Retourne (index, { matiere_id: quantite_mg }).
+    """
+    index = _index or construire()
+    stock, versions = _stock_et_versions(None if noms is None else index.ids_matieres(noms))
+    if versions[VERSION_COMPOSITIONS] != index.version:
+        index = construire()
+        if noms is not None:   # sinon le stock lu couvre déjà toutes les matières
+            stock, versions = _stock_et_versions(index.ids_matieres(noms))
+    if has_request_context():
+        g.version_seuils = versions[VERSION_SEUILS]
+        g.version_couts = versions[VERSION_COUTS]
+    return index, stock
+
+
+# ─── Écritures ───────────────────────────────────────────────────────────────
+
+def noter_modification(maj=None):
+    """
+    À appeler dans la transaction de toute écriture qui touche aux
+    recettes ou à leurs matières, avant le commit.
+    `maj(index)` : mise à jour incrémentale appliquée à l'index du process
+    après le commit ; None → l'index sera reconstruit au prochain usage.
+    """
+    invalider(VERSION_COMPOSITIONS)
+    # la ligne du compteur est verrouillée par l'UPDATE : valeur exacte
+    nouvelle = lire_version(VERSION_COMPOSITIONS)
+    db.session.info.setdefault("maj_index", []).append((nouvelle, maj))
+
+
+@event.listens_for(db.session, "after_commit")
+def _apres_commit(session):
+    global _index
+    majs = session.info.pop("maj_index", None)
+    if not majs:
+        return
+    with _verrou:
+        # les lecteurs parcourent l'index sans verrou : on met à jour une
+        # copie, puis on remplace la référence du module
+        index = _index
+        for nouvelle, maj in majs:
+            if index is not None and maj is not None and index.version == nouvelle - 1:
+                if index is _index:
+                    index = index.copie()
+                maj(index)
+                index.version = nouvelle
+            else:
+                index = None
+        _index = index
+
+
+@event.listens_for(db.session, "after_rollback")
+def _apres_rollback(session):
+    session.info.pop("maj_index", None)
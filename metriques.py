@@ -0,0 +1,183 @@
+"""
+Instrumentation des requêtes HTTP et SQL.
+
+- Chaque requête SQL est chronométrée (événements du moteur SQLAlchemy) et
+  comptée dans flask.g pour la requête HTTP en cours.
+- À la fin de chaque requête HTTP : histogrammes de latence et de nombre
+  de requêtes SQL par route, temps SQL cumulé, compteur par code HTTP.
+- En-tête Server-Timing (temps SQL / total) sur chaque réponse.
+- Journal des requêtes lentes si SLOW_QUERY_MS est défini.
+- /metrics expose le tout au format texte Prometheus.
+
+Les mesures sont propres à chaque process : avec plusieurs workers
+gunicorn, chaque scrape ne voit que le worker qui a répondu.
+"""
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger("glaze_api.sql")
+
+# Bornes des histogrammes (secondes / nombre de requêtes SQL)
+BORNES_LATENCE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_SQL = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_verrou = threading.Lock()
+_latence = {}     # (méthode, route) → Histogramme
+_sql = {}         # (méthode, route) → Histogramme
+_temps_sql = {}   # (méthode, route) → secondes cumulées
+_codes = {}       # (méthode, route, code) → nombre
+_lentes = 0
+
+_seuil_lent = None   # secondes, None = journal des requêtes lentes désactivé
+_installe = False
+
+
+class Histogramme:
+    """Histogramme cumulatif à bornes fixes (format Prometheus)."""
+
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.compte = [0] * len(bornes)
+        self.nb = 0
+        self.somme = 0.0
+
+    def observer(self, valeur):
+        self.nb += 1
+        self.somme += valeur
+        for i, borne in enumerate(self.bornes):
+            if valeur <= borne:
+                self.compte[i] += 1
+
+
+# ─── Événements SQLAlchemy ───────────────────────────────────────────────────
+
+def _avant_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("debuts_sql", []).append(time.perf_counter())
+
+
+def _apres_sql(conn, cursor, statement, parameters, context, executemany):
+    global _lentes
+    debuts = conn.info.get("debuts_sql")
+    if not debuts:
+        return
+    duree = time.perf_counter() - debuts.pop()
+    route = None
+    if has_request_context() and "debut_requete" in g:
+        g.nb_sql += 1
+        g.temps_sql += duree
+        route = _route()
+    if _seuil_lent is not None and duree >= _seuil_lent:
+        with _verrou:
+            _lentes += 1
+        log.warning("requête SQL lente (%.1f ms) [%s] %s",
+                    duree * 1000, route or "hors requête", " ".join(statement.split()))
+
+
+# ─── Hooks Flask ─────────────────────────────────────────────────────────────
+
+def _route():
+    return request.url_rule.rule if request.url_rule else "<inconnue>"
+
+
+def _debut():
+    g.debut_requete = time.perf_counter()
+    g.nb_sql = 0
+    g.temps_sql = 0.0
+
+
+def _entetes(response):
+    if "debut_requete" in g:
+        total = (time.perf_counter() - g.debut_requete) * 1000
+        response.headers["Server-Timing"] = (
+            f'db;dur={g.temps_sql * 1000:.1f};desc="{g.nb_sql} req", app;dur={total:.1f}'
+        )
+        g.code_reponse = response.status_code
+        # réponse en flux (stream_with_context) : le teardown est appelé une
+        # première fois avant l'envoi du corps, on mesure au second
+        g.mesure_differee = response.is_streamed
+    return response
+
+
+def _fin(exc):
+    if "debut_requete" not in g:
+        return
+    if g.pop("mesure_differee", False):
+        return
+    duree = time.perf_counter() - g.debut_requete
+    cle = (request.method, _route())
+    code = g.get("code_reponse", 500)
+    with _verrou:
+        _latence.setdefault(cle, Histogramme(BORNES_LATENCE)).observer(duree)
+        _sql.setdefault(cle, Histogramme(BORNES_SQL)).observer(g.nb_sql)
+        _temps_sql[cle] = _temps_sql.get(cle, 0.0) + g.temps_sql
+        _codes[cle + (code,)] = _codes.get(cle + (code,), 0) + 1
+
+
+def installer(app):
+    """Branche les hooks sur `app` et les événements SQL (une fois par process)."""
+    global _installe, _seuil_lent
+    seuil = app.config.get("SLOW_QUERY_MS", os.environ.get("SLOW_QUERY_MS"))
+    _seuil_lent = float(seuil) / 1000 if seuil not in (None, "") else None
+
+    app.before_request(_debut)
+    app.after_request(_entetes)
+    app.teardown_request(_fin)
+    if not _installe:
+        event.listen(Engine, "before_cursor_execute", _avant_sql)
+        event.listen(Engine, "after_cursor_execute", _apres_sql)
+        _installe = True
+
+
+# ─── Export Prometheus ───────────────────────────────────────────────────────
+
+def _etiquettes(methode, route, **autres):
+    paires = [("methode", methode), ("route", route)] + [(k, str(v)) for k, v in autres.items()]
+    return ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in paires)
+
+
+def _histogrammes(nom, aide, histos):
+    lignes = [f"# HELP {nom} {aide}", f"# TYPE {nom} histogram"]
+    for (methode, route), h in sorted(histos.items()):
+        for borne, n in zip(h.bornes, h.compte):
+            lignes.append(f"{nom}_bucket{{{_etiquettes(methode, route, le=borne)}}} {n}")
+        lignes.append(f"{nom}_bucket{{{_etiquettes(methode, route, le='+Inf')}}} {h.nb}")
+        lignes.append(f"{nom}_sum{{{_etiquettes(methode, route)}}} {h.somme}")
+        lignes.append(f"{nom}_count{{{_etiquettes(methode, route)}}} {h.nb}")
+    return lignes
+
+
+def exposer():
+    """Toutes les mesures au format texte Prometheus (version 0.0.4)."""
+    with _verrou:
+        lignes = _histogrammes(
+            "glaze_requete_duree_secondes", "Durée des requêtes HTTP par route.", _latence)
+        lignes += _histogrammes(
+            "glaze_requete_sql_nombre", "Nombre de requêtes SQL par requête HTTP.", _sql)
+        lignes += [
+            "# HELP glaze_requete_sql_secondes_total Temps SQL cumulé par route.",
+            "# TYPE glaze_requete_sql_secondes_total counter",
+        ]
+        lignes += [
+            f"glaze_requete_sql_secondes_total{{{_etiquettes(m, r)}}} {t}"
+            for (m, r), t in sorted(_temps_sql.items())
+        ]
+        lignes += [
+            "# HELP glaze_requetes_total Requêtes HTTP par route et code de réponse.",
+            "# TYPE glaze_requetes_total counter",
+        ]
+        lignes += [
+            f"glaze_requetes_total{{{_etiquettes(m, r, code=c)}}} {n}"
+            for (m, r, c), n in sorted(_codes.items())
+        ]
+        lignes += [
+            "# HELP glaze_sql_lentes_total Requêtes SQL au-delà de SLOW_QUERY_MS.",
+            "# TYPE glaze_sql_lentes_total counter",
+            f"glaze_sql_lentes_total {_lentes}",
+        ]
+    return "\n".join(lignes) + "\n"
@@ -0,0 +1,449 @@
+"""
+Migrations de schéma, appliquées dans l'ordre par appliquer_migrations().
+
+- Base vide      : db.create_all() crée le schéma final, toutes les
+                   migrations sont marquées comme appliquées.
+- Base existante : les migrations absentes de `version_schema` sont
+                   exécutées une par une, chacune dans sa transaction.
+
+Pour faire évoluer le schéma : modifier models.py (pour les bases neuves)
+ET ajouter une fonction en fin de MIGRATIONS (pour les bases existantes).
+Cette fonction ne s'appuie que sur le schéma figé ci-dessous (complété des
+tables qu'elle touche) ou sur du SQL, jamais sur les modèles ni sur le code
+de l'application : elle doit donner le même résultat dans dix versions.
+"""
+import math
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger, Column, Date, DateTime, Float, ForeignKey, Index, Integer,
+    LargeBinary, MetaData, String, Table, func, insert, inspect, literal, select, text
+)
+
+from extensions import db
+from models import Matiere, Achat, Composition, VersionSchema
+
+
+# ─── Schéma figé des migrations ──────────────────────────────────────────────
+# Une migration publiée ne doit plus changer : elle travaille sur les tables
+# telles qu'elles étaient à sa version (unités d'alors : grammes, euros,
+# pourcentages en flottants), décrites ici, et jamais sur models.py ni sur
+# le code de l'application, qui continuent d'évoluer.
+
+_schema = MetaData()
+
+# version 1 (seules les colonnes lues ou indexées par les migrations)
+_matiere = Table(
+    "matiere", _schema,
+    Column("id", Integer, primary_key=True),
+    Column("quantite", Float),
+)
+_achat = Table(
+    "achat", _schema,
+    Column("id", Integer, primary_key=True),
+    Column("matiere_id", Integer, ForeignKey("matiere.id"), nullable=False),
+    Column("quantite", Float, nullable=False),
+    Column("prix", Float, nullable=False),
+    Column("date", Date),
+)
+_composition = Table(
+    "composition", _schema,
+    Column("id", Integer, primary_key=True),
+    Column("recette_id", Integer, nullable=False),
+    Column("matiere_id", Integer, ForeignKey("matiere.id"), nullable=False),
+    Column("type", String, nullable=False),
+)
+
+# version 2
+_compteur = Table(
+    "compteur", _schema,
+    Column("nom", String, primary_key=True),
+    Column("valeur", BigInteger, nullable=False),
+)
+_depense_mensuelle = Table(
+    "depense_mensuelle", _schema,
+    Column("matiere_id", Integer, ForeignKey("matiere.id"), primary_key=True),
+    Column("mois", Date, primary_key=True),
+    Column("quantite", Float, nullable=False),
+    Column("prix", Float, nullable=False),
+    Column("nb_achats", Integer, nullable=False),
+)
+_consommation_mensuelle = Table(
+    "consommation_mensuelle", _schema,
+    Column("matiere_id", Integer, ForeignKey("matiere.id"), primary_key=True),
+    Column("mois", Date, primary_key=True),
+    Column("quantite", Float, nullable=False),
+    Column("nb_productions", Integer, nullable=False),
+)
+
+# version 3
+_index_v3 = [
+    Index("uq_composition_recette_matiere_type",
+          _composition.c.recette_id, _composition.c.matiere_id, _composition.c.type, unique=True),
+    Index("ix_composition_matiere_id", _composition.c.matiere_id),
+    Index("ix_achat_matiere_id", _achat.c.matiere_id),
+    Index("ix_achat_date_id", _achat.c.date, _achat.c.id),
+    Index("ix_matiere_quantite", _matiere.c.quantite),
+]
+
+# version 4
+_mouvement_stock = Table(
+    "mouvement_stock", _schema,
+    Column("id", Integer, primary_key=True),
+    Column("matiere_id", Integer, nullable=False),
+    Column("date", DateTime, nullable=False),
+    Column("type", String, nullable=False),
+    Column("delta", Float, nullable=False),
+    Column("reference", String, nullable=True),
+    Index("ix_mouvement_stock_matiere_id_id", "matiere_id", "id"),
+    Index("ix_mouvement_stock_date", "date"),
+)
+_instantane_stock = Table(
+    "instantane_stock", _schema,
+    Column("id", Integer, primary_key=True),
+    Column("matiere_id", Integer, nullable=False),
+    Column("date", DateTime, nullable=False),
+    Column("mouvement_id", Integer, nullable=False),
+    Column("quantite", Float, nullable=False),
+    Index("ix_instantane_stock_matiere_id_date", "matiere_id", "date"),
+)
+
+# version 5
+_prevision_matiere = Table(
+    "prevision_matiere", _schema,
+    Column("matiere_id", Integer, ForeignKey("matiere.id"), primary_key=True),
+    Column("taux_conso", Float, nullable=False),
+    Column("date_conso", DateTime, nullable=True),
+    Column("debut_conso", DateTime, nullable=True),
+    Column("dernier_achat", Date, nullable=True),
+    Column("nb_intervalles", Integer, nullable=False),
+    Column("intervalle_moyen", Float, nullable=False),
+    Column("intervalle_m2", Float, nullable=False),
+)
+
+# version 6
+_seuils_matiere = [Column(f"seuil_{n}", Float, nullable=True) for n in ("orange", "rouge", "noir")]
+_seuil_defaut = Table(
+    "seuil_defaut", _schema,
+    Column("type", String, primary_key=True),
+    Column("orange", Float, nullable=False),
+    Column("rouge", Float, nullable=False),
+    Column("noir", Float, nullable=False),
+)
+
+# version 7
+_cle_idempotence = Table(
+    "cle_idempotence", _schema,
+    Column("cle", String(255), primary_key=True),
+    Column("route", String, nullable=False),
+    Column("empreinte", String(64), nullable=False),
+    Column("statut", String, nullable=False),
+    Column("code", Integer, nullable=True),
+    Column("corps", LargeBinary, nullable=True),
+    Column("mimetype", String, nullable=True),
+    Column("expire_le", DateTime, nullable=False),
+    Index("ix_cle_idempotence_expire_le", "expire_le"),
+)
+
+# version 9
+_cout_matiere = Table(
+    "cout_matiere", _schema,
+    Column("matiere_id", Integer, ForeignKey("matiere.id"), primary_key=True),
+    Column("quantite_mg", BigInteger, nullable=False),
+    Column("prix_centimes", BigInteger, nullable=False),
+)
+
+
+def _creer_tables(*tables):
+    bind = db.session.connection()
+    for table in tables:
+        table.create(bind, checkfirst=True)
+
+
+def _creer_index(*index):
+    bind = db.session.connection()
+    for idx in index:
+        idx.create(bind, checkfirst=True)
+
+
+def _ajouter_colonnes(table, *colonnes):
+    """ALTER TABLE ... ADD COLUMN pour les `colonnes` (Column) encore absentes de `table`."""
+    bind = db.session.connection()
+    existantes = {c["name"] for c in inspect(bind).get_columns(table)}
+    for colonne in colonnes:
+        if colonne.name not in existantes:
+            type_sql = colonne.type.compile(dialect=bind.dialect)
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {colonne.name} {type_sql}"))
+
+
+# Colonnes flottantes passées en entiers (voir unites.py) :
+# (table, ancienne colonne, nouvelle colonne, facteur, type entier, NULL gardé)
+CONVERSIONS_ENTIERS = [
+    ("matiere", "quantite", "quantite_mg", 1000, BigInteger, False),
+    ("matiere", "seuil_orange", "seuil_orange_mg", 1000, BigInteger, True),
+    ("matiere", "seuil_rouge", "seuil_rouge_mg", 1000, BigInteger, True),
+    ("matiere", "seuil_noir", "seuil_noir_mg", 1000, BigInteger, True),
+    ("achat", "quantite", "quantite_mg", 1000, BigInteger, False),
+    ("achat", "prix", "prix_centimes", 100, BigInteger, False),
+    ("composition", "pourcentage", "pourcentage_ppm", 10_000, Integer, False),
+    ("depense_mensuelle", "quantite", "quantite_mg", 1000, BigInteger, False),
+    ("depense_mensuelle", "prix", "prix_centimes", 100, BigInteger, False),
+    ("consommation_mensuelle", "quantite", "quantite_mg", 1000, BigInteger, False),
+    ("mouvement_stock", "delta", "delta_mg", 1000, BigInteger, False),
+    ("instantane_stock", "quantite", "quantite_mg", 1000, BigInteger, False),
+    ("seuil_defaut", "orange", "orange_mg", 1000, BigInteger, False),
+    ("seuil_defaut", "rouge", "rouge_mg", 1000, BigInteger, False),
+    ("seuil_defaut", "noir", "noir_mg", 1000, BigInteger, False),
+]
+
+
+def _convertir_en_entiers():
+    """
+    Remplace chaque colonne flottante de CONVERSIONS_ENTIERS par sa colonne
+    entière (valeur × facteur, arrondie ; NULL gardé pour les colonnes qui
+    l'acceptent, 0 sinon). Une colonne déjà convertie est laissée telle quelle.
+    """
+    bind = db.session.connection()
+    for table, ancienne, nouvelle, facteur, type_entier, nullable in CONVERSIONS_ENTIERS:
+        inspecteur = inspect(bind)
+        if ancienne not in {c["name"] for c in inspecteur.get_columns(table)}:
+            continue
+        type_sql = type_entier().compile(dialect=bind.dialect)
+        contrainte = "" if nullable else " NOT NULL DEFAULT 0"
+        valeur = ancienne if nullable else f"COALESCE({ancienne}, 0)"
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {nouvelle} {type_sql}{contrainte}"))
+        db.session.execute(text(
+            f"UPDATE {table} SET {nouvelle} = CAST(ROUND({valeur} * {facteur}) AS {type_sql})"
+        ))
+        # SQLite refuse de supprimer une colonne indexée
+        for idx in inspecteur.get_indexes(table):
+            if ancienne in idx["column_names"]:
+                db.session.execute(text(f"DROP INDEX {idx['name']}"))
+        db.session.execute(text(f"ALTER TABLE {table} DROP COLUMN {ancienne}"))
+
+
+def _m002_tables_cache_et_agregats():
+    _creer_tables(_compteur, _depense_mensuelle, _consommation_mensuelle)
+
+
+def _m003_index_recherche():
+    # Doublons éventuels (même matière, même type dans une recette) :
+    # on garde la première ligne pour pouvoir poser la contrainte unique.
+    db.session.execute(text(
+        "DELETE FROM composition WHERE id NOT IN ("
+        " SELECT MIN(id) FROM composition GROUP BY recette_id, matiere_id, type)"
+    ))
+    _creer_index(*_index_v3)
+
+
+def _m004_journal_stock():
+    _creer_tables(_mouvement_stock, _instantane_stock)
+    # reprise de l'existant : un mouvement 'ouverture' par matière en stock,
+    # puis une première photo
+    maintenant = datetime.utcnow()
+    db.session.execute(insert(_mouvement_stock).from_select(
+        ["matiere_id", "date", "type", "delta", "reference"],
+        select(_matiere.c.id, literal(maintenant, DateTime), literal("ouverture"),
+               _matiere.c.quantite, literal("reprise"))
+        .where(_matiere.c.quantite.isnot(None), _matiere.c.quantite != 0)
+    ))
+    db.session.execute(insert(_instantane_stock).from_select(
+        ["matiere_id", "date", "mouvement_id", "quantite"],
+        select(_mouvement_stock.c.matiere_id, literal(maintenant, DateTime),
+               func.max(_mouvement_stock.c.id), func.sum(_mouvement_stock.c.delta))
+        .group_by(_mouvement_stock.c.matiere_id)
+    ))
+
+
+def _m005_previsions():
+    """
+    Résumé des prévisions recalculé depuis l'historique (achats et sorties
+    de production du journal, en grammes), avec les règles de la version 5 :
+    moyenne de consommation à décroissance exponentielle (τ = 30 jours) et
+    intervalles entre dates d'achat par l'algorithme de Welford.
+    """
+    tau = 30.0
+    _creer_tables(_prevision_matiere)
+    lignes = {}
+
+    def ligne(mat_id):
+        return lignes.setdefault(mat_id, {
+            "matiere_id": mat_id, "taux_conso": 0.0, "date_conso": None, "debut_conso": None,
+            "dernier_achat": None, "nb_intervalles": 0, "intervalle_moyen": 0.0, "intervalle_m2": 0.0
+        })
+
+    achats = (
+        select(_achat.c.matiere_id, _achat.c.date)
+        .where(_achat.c.date.isnot(None))
+        .distinct()
+        .order_by(_achat.c.matiere_id, _achat.c.date)
+    )
+    for mat_id, date in db.session.execute(achats):
+        l = ligne(mat_id)
+        if l["dernier_achat"] is not None:
+            x = float((date - l["dernier_achat"]).days)
+            n = l["nb_intervalles"] + 1
+            ecart = x - l["intervalle_moyen"]
+            l["intervalle_moyen"] += ecart / n
+            l["intervalle_m2"] += ecart * (x - l["intervalle_moyen"])
+            l["nb_intervalles"] = n
+        l["dernier_achat"] = date
+
+    productions = (
+        select(_mouvement_stock.c.matiere_id, _mouvement_stock.c.date, _mouvement_stock.c.delta)
+        .join(_matiere, _matiere.c.id == _mouvement_stock.c.matiere_id)
+        .where(_mouvement_stock.c.type == "production")
+        .order_by(_mouvement_stock.c.date, _mouvement_stock.c.id)
+    )
+    for mat_id, instant, delta in db.session.execute(productions):
+        l = ligne(mat_id)
+        if l["date_conso"] is not None:
+            ecart = max(0.0, (instant - l["date_conso"]).total_seconds() / 86400.0)
+            l["taux_conso"] *= math.exp(-ecart / tau)
+        l["taux_conso"] += -delta / tau
+        l["date_conso"] = max(instant, l["date_conso"] or instant)
+        l["debut_conso"] = l["debut_conso"] or instant
+
+    if lignes:
+        db.session.execute(insert(_prevision_matiere), list(lignes.values()))
+
+
+def _m006_seuils():
+    _ajouter_colonnes("matiere", *_seuils_matiere)
+    _creer_tables(_seuil_defaut)
+
+
+def _m007_idempotence():
+    _creer_tables(_cle_idempotence)
+
+
+def _m008_entiers():
+    _convertir_en_entiers()
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_matiere_quantite_mg ON matiere (quantite_mg)"))
+
+
+def _m009_couts():
+    _creer_tables(_cout_matiere)
+    db.session.execute(text(
+        "INSERT INTO cout_matiere (matiere_id, quantite_mg, prix_centimes)"
+        " SELECT matiere_id, SUM(quantite_mg), SUM(prix_centimes) FROM achat GROUP BY matiere_id"
+    ))
+
+
+# (version, description, fonction) — la version 1 est le schéma d'origine
+MIGRATIONS = [
+    (1, "schéma initial", None),
+    (2, "tables compteur et agrégats mensuels", _m002_tables_cache_et_agregats),
+    (3, "index des clés étrangères, de achat(date, id) et unicité des compositions", _m003_index_recherche),
+    (4, "journal des mouvements de stock et photos", _m004_journal_stock),
+    (5, "résumé des prévisions de réapprovisionnement", _m005_previsions),
+    (6, "seuils de stock par matière et par type", _m006_seuils),
+    (7, "clés d'idempotence des routes d'écriture", _m007_idempotence),
+    (8, "quantités et seuils en mg, prix en centimes, pourcentages en ppm", _m008_entiers),
+    (9, "coût moyen pondéré des achats par matière", _m009_couts),
+]
+
+
+def _verrouiller():
+    """Empêche deux process d'appliquer les migrations en même temps (PostgreSQL)."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text("SELECT pg_advisory_xact_lock(72340510)"))
+
+
+def version_courante():
+    """Dernière migration appliquée (0 si la base n'est pas initialisée)."""
+    if not inspect(db.engine).has_table(VersionSchema.__tablename__):
+        return 0
+    return db.session.query(db.func.max(VersionSchema.version)).scalar() or 0
+
+
+def appliquer_migrations():
+    """
+    Met le schéma à jour. Retourne la liste des versions appliquées.
+    Idempotent : peut être rappelé sans effet sur une base à jour.
+    """
+    tables = set(inspect(db.engine).get_table_names())
+
+    _verrouiller()
+    if VersionSchema.__tablename__ not in tables:
+        if Matiere.__tablename__ not in tables:
+            # Base neuve : schéma final directement
+            db.create_all()
+            db.session.add_all([
+                VersionSchema(version=v, description=desc)
+                for v, desc, _ in MIGRATIONS
+            ])
+            db.session.commit()
+            return [v for v, _, _ in MIGRATIONS]
+        # Base antérieure aux migrations : on la considère en version 1
+        _creer_tables(VersionSchema.__table__)
+        db.session.add(VersionSchema(version=1, description=MIGRATIONS[0][1]))
+        db.session.commit()
+
+    appliquees = []
+    for version, description, fonction in MIGRATIONS:
+        _verrouiller()
+        deja = db.session.execute(
+            select(VersionSchema.version).where(VersionSchema.version == version)
+        ).first()
+        if deja:
+            db.session.rollback()
+            continue
+        fonction()
+        db.session.add(VersionSchema(version=version, description=description))
+        db.session.commit()
+        appliquees.append(version)
+    return appliquees
+
+
+# ─── Vérification des plans d'exécution ──────────────────────────────────────
+
+def requetes_chaudes():
+    """
+    Requêtes les plus fréquentes de l'API et index attendu pour chacune
+    (plusieurs noms possibles quand l'index est nommé par le SGBD).
+    """
+    return {
+        "matière par nom": (
+            select(Matiere.id).where(Matiere.nom == "silice"),
+            ("matiere_nom_key", "sqlite_autoindex_matiere")),
+        "compositions d'une recette": (
+            select(Composition.id).where(Composition.recette_id == 1),
+            ("uq_composition_recette_matiere_type",)),
+        "compositions d'une matière": (
+            select(Composition.id).where(Composition.matiere_id == 1),
+            ("ix_composition_matiere_id",)),
+        "achats d'une matière": (
+            select(Achat.id).where(Achat.matiere_id == 1),
+            ("ix_achat_matiere_id",)),
+        "page d'achats": (
+            select(Achat.id).order_by(Achat.date.desc(), Achat.id.desc()).limit(100),
+            ("ix_achat_date_id",)),
+        "stock trié": (
+            select(Matiere.id).order_by(Matiere.quantite_mg.desc()),
+            ("ix_matiere_quantite_mg",)),
+    }
+
+
+def expliquer_requetes():
+    """
+    Exécute EXPLAIN (EXPLAIN QUERY PLAN sous SQLite) sur chaque requête
+    chaude et indique si l'index attendu apparaît dans le plan.
+    Sur une table presque vide, PostgreSQL peut préférer un parcours
+    séquentiel : à lancer sur une base de taille réaliste.
+    """
+    bind = db.session.get_bind()
+    prefixe = "EXPLAIN QUERY PLAN " if bind.dialect.name == "sqlite" else "EXPLAIN "
+    resultat = {}
+    for nom, (requete, index_attendus) in requetes_chaudes().items():
+        sql = str(requete.compile(bind, compile_kwargs={"literal_binds": True}))
+        plan = "\n".join(
+            " ".join(str(c) for c in row)
+            for row in db.session.execute(text(prefixe + sql))
+        )
+        resultat[nom] = {
+            "index_attendu": index_attendus[0],
+            "utilise": any(i in plan for i in index_attendus),
+            "plan": plan
+        }
+    return resultat
@@ -7,17 +7,26 @@ class Matiere(db.Model):
     nom = db.Column(db.String, unique=True, nullable=False)
     type = db.Column(db.String, nullable=False)
     unite = db.Column(db.String, default="g")
-    quantite = db.Column(db.Float, default=0.0)
+    # quantités en mg, prix en centimes, pourcentages en ppm (voir unites.py)
+    quantite_mg = db.Column(db.BigInteger, nullable=False, default=0, index=True)  # tri de /stock
+    # seuils propres à la matière (mg) ; NULL = seuil du type (voir seuils.py)
+    seuil_orange_mg = db.Column(db.BigInteger, nullable=True)
+    seuil_rouge_mg = db.Column(db.BigInteger, nullable=True)
+    seuil_noir_mg = db.Column(db.BigInteger, nullable=True)
 
     achats = db.relationship("Achat", backref="matiere", lazy=True)
     compositions = db.relationship("Composition", backref="matiere", lazy=True)
 
 class Achat(db.Model):
     __tablename__ = 'achat'
+    __table_args__ = (
+        # pagination par clé de /achats et tri de /historique_achats
+        db.Index("ix_achat_date_id", "date", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), nullable=False)
-    quantite = db.Column(db.Float, nullable=False)
-    prix = db.Column(db.Float, nullable=False)
+    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), nullable=False, index=True)
+    quantite_mg = db.Column(db.BigInteger, nullable=False)
+    prix_centimes = db.Column(db.BigInteger, nullable=False)
     fournisseur = db.Column(db.String)
     date = db.Column(db.Date, default=datetime.utcnow)
 
@@ -31,8 +40,133 @@ class Recette(db.Model):
     
 class Composition(db.Model):
     __tablename__ = 'composition'
+    __table_args__ = (
+        # une matière n'apparaît qu'une fois par type dans une recette ;
+        # sert aussi d'index pour les jointures sur recette_id
+        db.Index("uq_composition_recette_matiere_type", "recette_id", "matiere_id", "type", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     recette_id = db.Column(db.Integer, db.ForeignKey("recette.id"), nullable=False)
-    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), nullable=False)
+    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), nullable=False, index=True)
     type = db.Column(db.String, nullable=False)
-    pourcentage = db.Column(db.Float, nullable=False)
+    pourcentage_ppm = db.Column(db.Integer, nullable=False)
+
+class SeuilDefaut(db.Model):
+    """Seuils (mg) par type de matière ; un type absent garde les valeurs d'origine."""
+    __tablename__ = 'seuil_defaut'
+    type = db.Column(db.String, primary_key=True)
+    orange_mg = db.Column(db.BigInteger, nullable=False)
+    rouge_mg = db.Column(db.BigInteger, nullable=False)
+    noir_mg = db.Column(db.BigInteger, nullable=False)
+
+class Compteur(db.Model):
+    """
+    Compteurs de version partagés entre tous les workers (ex. 'donnees',
+    incrémenté par chaque route d'écriture). Sert de clé aux caches en mémoire.
+    """
+    __tablename__ = 'compteur'
+    nom = db.Column(db.String, primary_key=True)
+    valeur = db.Column(db.BigInteger, nullable=False, default=0)
+
+class DepenseMensuelle(db.Model):
+    """Agrégat des achats par matière et par mois, tenu à jour à chaque achat."""
+    __tablename__ = 'depense_mensuelle'
+    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), primary_key=True)
+    mois = db.Column(db.Date, primary_key=True)  # 1er jour du mois
+    quantite_mg = db.Column(db.BigInteger, nullable=False, default=0)
+    prix_centimes = db.Column(db.BigInteger, nullable=False, default=0)
+    nb_achats = db.Column(db.Integer, nullable=False, default=0)
+
+class ConsommationMensuelle(db.Model):
+    """Agrégat des sorties de stock par production, par matière et par mois."""
+    __tablename__ = 'consommation_mensuelle'
+    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), primary_key=True)
+    mois = db.Column(db.Date, primary_key=True)  # 1er jour du mois
+    quantite_mg = db.Column(db.BigInteger, nullable=False, default=0)
+    nb_productions = db.Column(db.Integer, nullable=False, default=0)
+
+class VersionSchema(db.Model):
+    """Migrations de schéma appliquées (voir migrations.py)."""
+    __tablename__ = 'version_schema'
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String, nullable=False)
+    applique_le = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MouvementStock(db.Model):
+    """
+    Journal des mouvements de stock, en ajout seul : une ligne par entrée ou
+    sortie (achat, production, ajustement, suppression, ouverture).
+    matiere_id n'est pas une clé étrangère : le journal survit à la
+    suppression de la matière.
+    """
+    __tablename__ = 'mouvement_stock'
+    __table_args__ = (
+        db.Index("ix_mouvement_stock_matiere_id_id", "matiere_id", "id"),
+        db.Index("ix_mouvement_stock_date", "date"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    matiere_id = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    type = db.Column(db.String, nullable=False)
+    delta_mg = db.Column(db.BigInteger, nullable=False)
+    reference = db.Column(db.String, nullable=True)
+
+class InstantaneStock(db.Model):
+    """
+    Photo du stock d'une matière : quantité après application de tous les
+    mouvements d'id ≤ mouvement_id. Le stock à une date se reconstruit à
+    partir de la dernière photo + les quelques mouvements suivants.
+    """
+    __tablename__ = 'instantane_stock'
+    __table_args__ = (
+        db.Index("ix_instantane_stock_matiere_id_date", "matiere_id", "date"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    matiere_id = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    mouvement_id = db.Column(db.Integer, nullable=False)
+    quantite_mg = db.Column(db.BigInteger, nullable=False)
+
+class PrevisionMatiere(db.Model):
+    """
+    Résumé par matière pour la prévision de réapprovisionnement, tenu à
+    jour à chaque achat et à chaque production (voir previsions.py).
+    """
+    __tablename__ = 'prevision_matiere'
+    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), primary_key=True)
+    # consommation (g/jour) : moyenne à décroissance exponentielle, valeur à date_conso
+    taux_conso = db.Column(db.Float, nullable=False, default=0.0)
+    date_conso = db.Column(db.DateTime, nullable=True)
+    debut_conso = db.Column(db.DateTime, nullable=True)
+    # intervalles entre deux dates d'achat (jours) : moyenne et M2 de Welford
+    dernier_achat = db.Column(db.Date, nullable=True)
+    nb_intervalles = db.Column(db.Integer, nullable=False, default=0)
+    intervalle_moyen = db.Column(db.Float, nullable=False, default=0.0)
+    intervalle_m2 = db.Column(db.Float, nullable=False, default=0.0)
+
+class CoutMatiere(db.Model):
+    """
+    Cumul des achats par matière (quantité et montant, entiers), tenu à
+    jour à chaque achat : coût moyen pondéré = prix_centimes / quantite_mg
+    (voir couts.py).
+    """
+    __tablename__ = 'cout_matiere'
+    matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), primary_key=True)
+    quantite_mg = db.Column(db.BigInteger, nullable=False, default=0)
+    prix_centimes = db.Column(db.BigInteger, nullable=False, default=0)
+
+class CleIdempotence(db.Model):
+    """
+    Clés Idempotency-Key des routes d'écriture : la première requête
+    réserve la clé (statut 'en_cours'), sa réponse est gardée jusqu'à
+    expire_le et renvoyée telle quelle aux répétitions (voir idempotence.py).
+    """
+    __tablename__ = 'cle_idempotence'
+    cle = db.Column(db.String(255), primary_key=True)
+    route = db.Column(db.String, nullable=False)        # ex. "POST /achat"
+    empreinte = db.Column(db.String(64), nullable=False)  # sha256 de la requête
+    statut = db.Column(db.String, nullable=False, default="en_cours")
+    code = db.Column(db.Integer, nullable=True)
+    corps = db.Column(db.LargeBinary, nullable=True)
+    mimetype = db.Column(db.String, nullable=True)
+    expire_le = db.Column(db.DateTime, nullable=False, index=True)  # purge
@@ -0,0 +1,180 @@
+"""
+Planification de production multi-recettes par programmation linéaire.
+
+Chaque recette r est produite en masse x_r (g). Chaque matière m impose
+    Σ_r  pct[m][r] / 100 · x_r  ≤  stock[m]
+et l'on maximise la masse totale (pondérée par les priorités), avec des
+masses min / max par recette ou des proportions imposées entre recettes.
+Le solveur est un simplexe en tableau (règle de Bland), suffisant pour les
+tailles en jeu ici (quelques dizaines de recettes × matières).
+La matrice des besoins vient de l'index des compositions
+(IndexCompositions.matrice).
+"""
+
+EPS = 1e-9
+
+
+class PlanImpossible(ValueError):
+    """Contraintes incompatibles (minimums au-delà du stock, min > max...)."""
+
+
+def simplexe(c, A, b):
+    """
+    Maximise c·y sous A y ≤ b, y ≥ 0, avec b ≥ 0 (l'origine est réalisable).
+    Retourne (y, valeur, duales) ; duales[i] est la valeur marginale de la
+    contrainte i (gain d'objectif par unité de b_i supplémentaire).
+    Lève ValueError si le problème est non borné.
+    """
+    m, n = len(A), len(c)
+    T = [list(A[i]) + [1.0 if k == i else 0.0 for k in range(m)] + [b[i]] for i in range(m)]
+    z = [-cj for cj in c] + [0.0] * m + [0.0]
+    base = [n + i for i in range(m)]
+
+    while True:
+        # variable entrante : plus petit indice à coût réduit négatif (Bland)
+        e = next((j for j in range(n + m) if z[j] < -EPS), None)
+        if e is None:
+            break
+        # variable sortante : plus petit rapport, puis plus petit indice
+        sortie = None
+        for i in range(m):
+            if T[i][e] > EPS:
+                r = T[i][-1] / T[i][e]
+                if (sortie is None or r < sortie[0] - EPS
+                        or (abs(r - sortie[0]) <= EPS and base[i] < base[sortie[1]])):
+                    sortie = (r, i)
+        if sortie is None:
+            raise ValueError("Problème non borné.")
+
+        p = sortie[1]
+        piv = T[p][e]
+        T[p] = [v / piv for v in T[p]]
+        for i in range(m):
+            if i != p and T[i][e] != 0.0:
+                f = T[i][e]
+                T[i] = [vi - f * vp for vi, vp in zip(T[i], T[p])]
+        f = z[e]
+        z = [vz - f * vp for vz, vp in zip(z, T[p])]
+        base[p] = e
+
+    y = [0.0] * n
+    for i, j in enumerate(base):
+        if j < n:
+            y[j] = T[i][-1]
+    return y, z[-1], z[n:n + m]
+
+
+def planifier(noms_recettes, specs, noms_matieres, besoins, stock):
+    """
+    Résout le plan de production.
+    `specs[nom]` : dict optionnel { min, max, poids, ratio }.
+      - sans 'ratio' : chaque recette est une variable ; on maximise
+        Σ poids_r · x_r (poids 1 par défaut = masse totale) ;
+      - avec 'ratio' (toutes les recettes) : x_r = ratio_r · t et l'on
+        maximise la masse totale en gardant ces proportions.
+    Retourne un dict { masses, total, matieres, matieres_limitantes }.
+    Lève PlanImpossible si les contraintes sont incompatibles.
+    """
+    nb_r = len(noms_recettes)
+    avec_ratio = any("ratio" in specs.get(n, {}) for n in noms_recettes)
+
+    # ─── 1. Variables : direction (recettes touchées), bornes, objectif ──────
+    # x = Σ_j direction_j · z_j   avec   bas_j ≤ z_j ≤ haut_j
+    directions, bas, haut, objectif = [], [], [], []
+    if avec_ratio:
+        ratios = []
+        for nom in noms_recettes:
+            ratio = specs.get(nom, {}).get("ratio")
+            if ratio is None or ratio < 0:
+                raise PlanImpossible("Avec des proportions, chaque recette doit avoir un 'ratio' ≥ 0.")
+            ratios.append(float(ratio))
+        if not any(ratios):
+            raise PlanImpossible("Au moins un 'ratio' doit être positif.")
+        t_bas, t_haut = 0.0, None
+        for nom, w in zip(noms_recettes, ratios):
+            s = specs.get(nom, {})
+            if w > 0:
+                if s.get("min") is not None:
+                    t_bas = max(t_bas, s["min"] / w)
+                if s.get("max") is not None:
+                    t_haut = s["max"] / w if t_haut is None else min(t_haut, s["max"] / w)
+        directions.append(ratios)
+        bas.append(t_bas)
+        haut.append(t_haut)
+        objectif.append(sum(ratios))
+    else:
+        for j, nom in enumerate(noms_recettes):
+            s = specs.get(nom, {})
+            d = [0.0] * nb_r
+            d[j] = 1.0
+            directions.append(d)
+            bas.append(float(s.get("min") or 0.0))
+            haut.append(float(s["max"]) if s.get("max") is not None else None)
+            objectif.append(float(s.get("poids", 1.0)))
+
+    for j, (lo, hi) in enumerate(zip(bas, haut)):
+        if hi is not None and hi < lo - EPS:
+            nom_j = "proportions" if avec_ratio else noms_recettes[j]
+            raise PlanImpossible(f"Bornes incompatibles pour '{nom_j}' : min > max.")
+
+    # ─── 2. Contraintes de stock sur les variables décalées y = z - bas ──────
+    # besoin par unité de z_j pour la matière m
+    coeffs = [
+        [sum(besoins[m][r] * d[r] for r in range(nb_r)) for d in directions]
+        for m in range(len(noms_matieres))
+    ]
+    reste = [
+        stock[m] - sum(coeffs[m][j] * bas[j] for j in range(len(directions)))
+        for m in range(len(noms_matieres))
+    ]
+    manquants = [
+        {"matiere": noms_matieres[m], "manquant": round(-reste[m], 2)}
+        for m in range(len(noms_matieres)) if reste[m] < -1e-6
+    ]
+    if manquants:
+        err = PlanImpossible("Stock insuffisant pour les masses minimales demandées.")
+        err.details = manquants
+        raise err
+
+    A = [list(row) for row in coeffs]
+    b = [max(0.0, r) for r in reste]
+    for j, hi in enumerate(haut):
+        if hi is not None:
+            ligne = [0.0] * len(directions)
+            ligne[j] = 1.0
+            A.append(ligne)
+            b.append(hi - bas[j])
+
+    # une recette sans composition et sans maximum rend le plan infini
+    for j in range(len(directions)):
+        if objectif[j] > 0 and all(A[i][j] <= EPS for i in range(len(A))):
+            raise PlanImpossible("Recette sans composition ni 'max' : production non bornée.")
+
+    # ─── 3. Résolution ───────────────────────────────────────────────────────
+    y, _, duales = simplexe(objectif, A, b)
+    z = [lo + yj for lo, yj in zip(bas, y)]
+    masses = [sum(d[r] * zj for d, zj in zip(directions, z)) for r in range(nb_r)]
+
+    # ─── 4. Utilisation des matières et contraintes saturées ─────────────────
+    matieres = {}
+    limitantes = []
+    for m, nom_mat in enumerate(noms_matieres):
+        utilise = sum(besoins[m][r] * masses[r] for r in range(nb_r))
+        liant = stock[m] - utilise <= max(1e-6, 1e-9 * stock[m])
+        if liant:
+            limitantes.append(nom_mat)
+        matieres[nom_mat] = {
+            "stock": round(stock[m], 2),
+            "utilise": round(utilise, 2),
+            "reste": round(stock[m] - utilise, 2),
+            "limitante": liant,
+            # gain d'objectif (g) par gramme de stock supplémentaire
+            "valeur_marginale": round(duales[m], 4)
+        }
+
+    return {
+        "masses": {nom: round(x, 2) for nom, x in zip(noms_recettes, masses)},
+        "total": round(sum(masses), 2),
+        "matieres": matieres,
+        "matieres_limitantes": limitantes
+    }
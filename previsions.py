@@ -0,0 +1,229 @@
+"""
+Prévision de réapprovisionnement par matière.
+
+- Consommation : taux en g/jour, moyenne à décroissance exponentielle
+  (constante de temps TAU_JOURS) mise à jour en O(1) à chaque production :
+      taux ← taux · e^(−Δ/τ) + q / τ
+  À la lecture, le taux est ramené à la date du jour ; il est corrigé du
+  biais de démarrage quand l'historique est plus court que τ.
+- Délai fournisseur : sans date de commande, l'intervalle entre deux dates
+  d'achat d'une matière sert d'estimation (moyenne et écart-type par
+  l'algorithme de Welford) ; DELAI_DEFAUT_JOURS tant qu'il n'y a qu'un achat.
+- Point de commande = taux · délai + stock de sécurité, avec
+  stock de sécurité = Z · taux · écart-type du délai.
+
+Le résumé (table prevision_matiere) est mis à jour dans la transaction de
+chaque achat / production : /reappro ne lit qu'une ligne par matière.
+"""
+import math
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+from extensions import db
+from models import Matiere, Achat, MouvementStock, PrevisionMatiere
+from unites import grammes
+
+_prevision = PrevisionMatiere.__table__
+
+TAU_JOURS = 30.0          # mémoire de la moyenne de consommation
+DELAI_DEFAUT_JOURS = 14.0
+Z_SERVICE = 1.65          # ~95 % de cycles sans rupture
+HORIZON_DEFAUT = 30       # jours, pour /reappro
+
+
+def _jours(delta):
+    return delta.total_seconds() / 86400.0
+
+
+def _vide(mat_id):
+    return {
+        "matiere_id": mat_id, "taux_conso": 0.0, "date_conso": None, "debut_conso": None,
+        "dernier_achat": None, "nb_intervalles": 0, "intervalle_moyen": 0.0, "intervalle_m2": 0.0
+    }
+
+
+def _lire(ids):
+    """Lignes de prevision_matiere des matières `ids` (verrouillées), en dicts."""
+    if not ids:
+        return {}
+    requete = _prevision.select().where(_prevision.c.matiere_id.in_(list(ids)))
+    if db.session.get_bind().dialect.name != "sqlite":
+        requete = requete.with_for_update()
+    return {row.matiere_id: dict(row._mapping) for row in db.session.execute(requete)}
+
+
+_COLONNES = [c.name for c in _prevision.columns if c.name != "matiere_id"]
+
+
+def _ecrire(lignes, existantes):
+    """INSERT en lot des nouvelles lignes, UPDATE en executemany des autres."""
+    nouvelles = [l for mat_id, l in lignes.items() if mat_id not in existantes]
+    modifiees = [
+        {"b_" + c: v for c, v in l.items()}
+        for mat_id, l in lignes.items() if mat_id in existantes
+    ]
+    if nouvelles:
+        db.session.execute(_prevision.insert(), nouvelles)
+    if modifiees:
+        db.session.execute(
+            _prevision.update()
+            .where(_prevision.c.matiere_id == bindparam("b_matiere_id"))
+            .values({c: bindparam("b_" + c) for c in _COLONNES}),
+            modifiees
+        )
+
+
+def _consommer(ligne, quantite, instant):
+    if ligne["date_conso"] is not None:
+        ecart = max(0.0, _jours(instant - ligne["date_conso"]))
+        ligne["taux_conso"] = ligne["taux_conso"] * math.exp(-ecart / TAU_JOURS)
+    ligne["taux_conso"] += quantite / TAU_JOURS
+    ligne["date_conso"] = max(instant, ligne["date_conso"] or instant)
+    ligne["debut_conso"] = ligne["debut_conso"] or instant
+
+
+def _acheter(ligne, date):
+    dernier = ligne["dernier_achat"]
+    if dernier is not None and date > dernier:
+        x = float((date - dernier).days)
+        n = ligne["nb_intervalles"] + 1
+        ecart = x - ligne["intervalle_moyen"]
+        ligne["intervalle_moyen"] += ecart / n
+        ligne["intervalle_m2"] += ecart * (x - ligne["intervalle_moyen"])
+        ligne["nb_intervalles"] = n
+    if dernier is None or date > dernier:
+        ligne["dernier_achat"] = date
+    # achat antérieur au dernier connu (import d'historique) : ignoré ici,
+    # reconstruire_previsions() recalcule les intervalles exacts
+
+
+def noter_consommations(consommations, instant=None):
+    """Production : `consommations` = { matiere_id: mg consommés }."""
+    instant = instant or datetime.utcnow()
+    existantes = _lire(consommations)
+    lignes = {}
+    for mat_id, q in consommations.items():
+        ligne = existantes.get(mat_id) or _vide(mat_id)
+        _consommer(ligne, grammes(q), instant)
+        lignes[mat_id] = ligne
+    _ecrire(lignes, existantes)
+
+
+def noter_achats(achats):
+    """Achats : itérable de dicts { matiere_id, date } (dates dans n'importe quel ordre)."""
+    dates = {}
+    for a in achats:
+        dates.setdefault(a["matiere_id"], set()).add(a["date"])
+    existantes = _lire(dates)
+    lignes = {}
+    for mat_id, jours in dates.items():
+        ligne = existantes.get(mat_id) or _vide(mat_id)
+        for date in sorted(jours):
+            _acheter(ligne, date)
+        lignes[mat_id] = ligne
+    _ecrire(lignes, existantes)
+
+
+def reconstruire_previsions():
+    """
+    Recalcule prevision_matiere depuis l'historique : dates d'achat
+    distinctes et sorties de production du journal. Retourne le nombre
+    de matières résumées.
+    """
+    db.session.execute(_prevision.delete())
+    lignes = {}
+    achats = (
+        db.session.query(Achat.matiere_id, Achat.date)
+        .filter(Achat.date.isnot(None))
+        .distinct()
+        .order_by(Achat.matiere_id, Achat.date)
+    )
+    for mat_id, date in achats:
+        _acheter(lignes.setdefault(mat_id, _vide(mat_id)), date)
+
+    productions = (
+        db.session.query(MouvementStock.matiere_id, MouvementStock.date, MouvementStock.delta_mg)
+        .join(Matiere, Matiere.id == MouvementStock.matiere_id)
+        .filter(MouvementStock.type == "production")
+        .order_by(MouvementStock.date, MouvementStock.id)
+    )
+    for mat_id, instant, delta in productions:
+        _consommer(lignes.setdefault(mat_id, _vide(mat_id)), grammes(-delta), instant)
+
+    # seules les matières encore présentes (clé étrangère)
+    existantes = {mat_id for (mat_id,) in db.session.query(Matiere.id)}
+    lignes = [l for mat_id, l in lignes.items() if mat_id in existantes]
+    if lignes:
+        db.session.execute(_prevision.insert(), lignes)
+    return len(lignes)
+
+
+# ─── Lecture ─────────────────────────────────────────────────────────────────
+
+def estimer(ligne, stock, maintenant):
+    """Prévision d'une matière à partir de sa ligne de résumé et de son stock."""
+    taux = 0.0
+    if ligne["date_conso"] is not None:
+        taux = ligne["taux_conso"] * math.exp(-max(0.0, _jours(maintenant - ligne["date_conso"])) / TAU_JOURS)
+        # biais de démarrage : la moyenne part de 0 au début de l'historique
+        anciennete = _jours(maintenant - ligne["debut_conso"])
+        correction = 1.0 - math.exp(-max(anciennete, 1.0) / TAU_JOURS)
+        taux /= correction
+
+    if ligne["nb_intervalles"]:
+        delai = ligne["intervalle_moyen"]
+        ecart_type = math.sqrt(ligne["intervalle_m2"] / (ligne["nb_intervalles"] - 1)) if ligne["nb_intervalles"] > 1 else 0.0
+    else:
+        delai, ecart_type = DELAI_DEFAUT_JOURS, 0.0
+
+    securite = Z_SERVICE * taux * ecart_type
+    point = taux * delai + securite
+    jours_rupture = stock / taux if taux > 1e-9 else None
+    jours_commande = (stock - point) / taux if taux > 1e-9 else None
+    return {
+        "stock": round(stock, 2),
+        "taux_journalier": round(taux, 2),
+        "delai_jours": round(delai, 1),
+        "stock_securite": round(securite, 2),
+        "point_de_commande": round(point, 2),
+        "jours_avant_rupture": round(jours_rupture, 1) if jours_rupture is not None else None,
+        "jours_avant_commande": round(jours_commande, 1) if jours_commande is not None else None,
+        "a_commander": taux > 1e-9 and stock <= point,
+        # de quoi revenir au point de commande et couvrir un cycle d'achat
+        "quantite_suggeree": round(max(0.0, point + taux * delai - stock), 2)
+    }
+
+
+def liste_reappro(horizon=HORIZON_DEFAUT, tous=False, type_matiere=None):
+    """
+    Matières classées par urgence (jours avant le point de commande).
+    Sans `tous` : seulement celles à commander ou en rupture sous `horizon` jours.
+    Une requête : matière LEFT JOIN prevision_matiere.
+    """
+    maintenant = datetime.utcnow()
+    query = (
+        db.session.query(Matiere.nom, Matiere.type, Matiere.quantite_mg, PrevisionMatiere)
+        .outerjoin(PrevisionMatiere, PrevisionMatiere.matiere_id == Matiere.id)
+    )
+    if type_matiere:
+        query = query.filter(Matiere.type == type_matiere)
+
+    resultat = []
+    for nom, m_type, quantite, prev in query:
+        ligne = _vide(None)
+        if prev is not None:
+            ligne.update({c: getattr(prev, c) for c in ligne if c != "matiere_id"})
+        entree = {"nom": nom, "type": m_type, **estimer(ligne, grammes(quantite), maintenant)}
+        urgent = entree["a_commander"] or (
+            entree["jours_avant_rupture"] is not None and entree["jours_avant_rupture"] <= horizon)
+        if tous or urgent:
+            resultat.append(entree)
+
+    inf = float("inf")
+    resultat.sort(key=lambda e: (
+        e["jours_avant_commande"] if e["jours_avant_commande"] is not None else inf,
+        e["jours_avant_rupture"] if e["jours_avant_rupture"] is not None else inf,
+        e["nom"]
+    ))
+    return resultat
@@ -0,0 +1,58 @@
+from sqlalchemy import bindparam
+
+from extensions import db
+from models import Matiere
+
+_matiere = Matiere.__table__
+
+
+def verrouiller_matieres(ids):
+    """
+    SELECT ... FOR UPDATE sur les lignes `matiere` concernées, toujours dans
+    l'ordre des id pour éviter les interblocages entre productions parallèles.
+    Retourne { matiere_id: quantite_mg } lu sous verrou.
+    Les verrous sont relâchés au commit / rollback de la transaction.
+    """
+    if not ids:
+        return {}
+    if db.session.get_bind().dialect.name == "sqlite":
+        # SQLite ignore FOR UPDATE : une écriture neutre prend le verrou
+        # d'écriture de la base jusqu'à la fin de la transaction.
+        db.session.execute(
+            _matiere.update()
+            .where(_matiere.c.id.in_(ids))
+            .values(quantite_mg=_matiere.c.quantite_mg)
+        )
+    rows = (
+        db.session.query(Matiere.id, Matiere.quantite_mg)
+        .filter(Matiere.id.in_(ids))
+        .order_by(Matiere.id)
+        .with_for_update()
+        .all()
+    )
+    return {mat_id: quantite or 0 for mat_id, quantite in rows}
+
+
+def ajuster_stock(deltas):
+    """
+    Ajuste le stock en une seule instruction UPDATE exécutée en lot
+    (executemany) : quantite_mg = quantite_mg + :delta, calculé côté SQL en
+    entiers (exact).
+    `deltas` : { matiere_id: mg (positif = entrée, négatif = sortie) }.
+    """
+    if not deltas:
+        return
+    stmt = (
+        _matiere.update()
+        .where(_matiere.c.id == bindparam("b_id"))
+        .values(quantite_mg=_matiere.c.quantite_mg + bindparam("b_delta"))
+    )
+    db.session.execute(stmt, [
+        {"b_id": mat_id, "b_delta": delta}
+        for mat_id, delta in sorted(deltas.items())
+    ])
+
+
+def decrementer_stock(consommations):
+    """Sortie de stock : `consommations` = { matiere_id: mg consommés }."""
+    ajuster_stock({mat_id: -q for mat_id, q in consommations.items()})
@@ -0,0 +1,182 @@
+from extensions import db
+from models import Recette, Composition, Matiere
+from index_compositions import noter_modification
+from unites import PPM_TOTAL, ppm, pourcent
+
+_matiere = Matiere.__table__
+_recette = Recette.__table__
+_composition = Composition.__table__
+
+# Nombre de recettes traitées par lot lors d'un import
+TAILLE_LOT = 500
+
+
+def _url(data, cle):
+    valeur = data.get(cle) or ""
+    if not isinstance(valeur, str):
+        raise ValueError(f"Le champ '{cle}' doit être une chaîne.")
+    return valeur.strip() or None
+
+
+def _pourcentages(valeurs, cle):
+    """{ matière: pourcentage } de l'API → { matière en minuscules: ppm }."""
+    try:
+        return {nom.strip().lower(): ppm(pct) for nom, pct in valeurs.items()}
+    except (ValueError, AttributeError):
+        raise ValueError(f"Les pourcentages de '{cle}' doivent être des nombres.")
+
+
+def valider_recette(data):
+    """
+    Vérifie une recette en mémoire (sans requête) et la normalise.
+    Règles : nom requis, 'base' dict non vide totalisant 100 %,
+    'oxydes' dict (peut être vide). Lève ValueError avec le message d'erreur.
+    Retourne { nom, base, oxydes, description_url, production_doc_url } ;
+    les noms de matières sont mis en minuscules, les pourcentages en ppm
+    (la somme de la base est comparée exactement, en entiers).
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Chaque recette doit être un objet.")
+    nom = data.get("nom") or ""
+    if not isinstance(nom, str) or not nom.strip():
+        raise ValueError("Le champ 'nom' est requis.")
+    nom = nom.strip()
+
+    base = data.get("base", {})
+    oxydes = data.get("oxydes", {})
+    if not isinstance(base, dict) or not base:
+        raise ValueError("Le champ 'base' doit être un dictionnaire non vide.")
+    if not isinstance(oxydes, dict):
+        raise ValueError("Le champ 'oxydes' doit être un dictionnaire (peut être vide).")
+    base = _pourcentages(base, "base")
+    oxydes = _pourcentages(oxydes, "oxydes")
+
+    total_base = sum(base.values())
+    if total_base != PPM_TOTAL:
+        raise ValueError(
+            f"La somme des pourcentages de base doit être 100 %, obtenu : {pourcent(total_base)} %."
+        )
+
+    return {
+        "nom": nom,
+        "base": base,
+        "oxydes": oxydes,
+        "description_url": _url(data, "description_url"),
+        "production_doc_url": _url(data, "production_doc_url")
+    }
+
+
+def _ids_matieres(noms):
+    return dict(
+        (nom, mat_id) for mat_id, nom in
+        db.session.query(Matiere.id, Matiere.nom).filter(Matiere.nom.in_(noms))
+    )
+
+
+def importer_recettes(lignes):
+    """
+    Importe un flux de recettes (numéro, dict) par lots de TAILLE_LOT :
+      - validation en mémoire (valider_recette) ;
+      - une requête IN pour les noms de recettes déjà pris ;
+      - une requête IN pour les matières + un INSERT en lot des manquantes
+        (stock 0, type = 'base' ou 'oxyde' selon leur première apparition) ;
+      - INSERT en lot des recettes puis de toutes leurs compositions ;
+      - l'index des compositions est marqué à reconstruire.
+    Une recette invalide est signalée sans interrompre les autres.
+    Ne fait PAS le commit : l'appelant garde la main sur la transaction.
+    """
+    vus = set()       # noms de recettes déjà rencontrés dans le flux
+    creees = []
+    erreurs = []
+    nb = 0
+    importees = []
+
+    def traiter(lot):
+        # 1) Noms de recettes déjà en base
+        existants = {
+            nom for (nom,) in
+            db.session.query(Recette.nom).filter(Recette.nom.in_([r["nom"] for _, r in lot]))
+        }
+        valides = []
+        for num, r in lot:
+            if r["nom"] in existants:
+                erreurs.append({"ligne": num, "nom": r["nom"], "message": f"Recette '{r['nom']}' existe déjà."})
+            else:
+                valides.append(r)
+        if not valides:
+            return
+
+        # 2) Matières : une requête IN, puis création en lot des manquantes
+        types = {}
+        for r in valides:
+            for nom_mat in r["base"]:
+                types.setdefault(nom_mat, "base")
+            for nom_mat in r["oxydes"]:
+                types.setdefault(nom_mat, "oxyde")
+        ids = _ids_matieres(list(types))
+        manquantes = [n for n in types if n not in ids]
+        if manquantes:
+            db.session.execute(_matiere.insert(), [
+                {"nom": n, "type": types[n], "unite": "g", "quantite_mg": 0}
+                for n in manquantes
+            ])
+            ids.update(_ids_matieres(manquantes))
+            creees.extend(manquantes)
+
+        # 3) Recettes puis compositions, en lot
+        db.session.execute(_recette.insert(), [
+            {
+                "nom": r["nom"],
+                "description_url": r["description_url"],
+                "production_doc_url": r["production_doc_url"]
+            }
+            for r in valides
+        ])
+        ids_recettes = dict(
+            (nom, rec_id) for rec_id, nom in
+            db.session.query(Recette.id, Recette.nom).filter(Recette.nom.in_([r["nom"] for r in valides]))
+        )
+        compositions = []
+        for r in valides:
+            for type_comp in ("base", "oxydes"):
+                for nom_mat, pct in r[type_comp].items():
+                    compositions.append({
+                        "recette_id": ids_recettes[r["nom"]],
+                        "matiere_id": ids[nom_mat],
+                        "type": "base" if type_comp == "base" else "oxyde",
+                        "pourcentage_ppm": pct
+                    })
+        if compositions:
+            db.session.execute(_composition.insert(), compositions)
+        importees.extend(r["nom"] for r in valides)
+
+    lot = []
+    for num, brute in lignes:
+        nb += 1
+        try:
+            if isinstance(brute, Exception):
+                raise brute
+            recette = valider_recette(brute)
+            if recette["nom"] in vus:
+                raise ValueError(f"Recette '{recette['nom']}' présente plusieurs fois dans l'import.")
+        except ValueError as e:
+            nom = brute.get("nom") if isinstance(brute, dict) else None
+            erreurs.append({"ligne": num, "nom": nom, "message": str(e)})
+            continue
+        vus.add(recette["nom"])
+        lot.append((num, recette))
+        if len(lot) >= TAILLE_LOT:
+            traiter(lot)
+            lot = []
+    if lot:
+        traiter(lot)
+    if importees:
+        noter_modification()
+
+    erreurs.sort(key=lambda e: e["ligne"])
+    return {
+        "recettes": nb,
+        "importees": importees,
+        "matieres_creees": creees,
+        "erreurs": erreurs
+    }
@@ -0,0 +1,201 @@
+"""
+Journal des mouvements de stock (mouvement_stock) et photos périodiques
+(instantane_stock).
+
+Matiere.quantite_mg reste la valeur courante, tenue à jour dans la même
+transaction que chaque mouvement ; le journal permet de reconstruire le
+stock à une date passée et de contrôler les écarts. Tout est en mg
+entiers : stock et journal doivent coïncider exactement.
+"""
+from datetime import datetime, time
+
+from sqlalchemy import func, text
+
+from extensions import db
+from models import Matiere, MouvementStock, InstantaneStock
+from unites import grammes
+
+_mouvement = MouvementStock.__table__
+_instantane = InstantaneStock.__table__
+
+TYPES_MOUVEMENT = ("achat", "production", "ajustement", "suppression", "ouverture")
+
+
+def enregistrer_mouvements(type_mouvement, deltas, reference=None, date=None):
+    """
+    Ajoute des mouvements au journal, en lot, dans la transaction en cours.
+    `deltas` : itérable de couples (matiere_id, delta_mg) ou de triplets
+    (matiere_id, delta_mg, date du mouvement), ou dict { matiere_id: delta_mg }.
+    `date` : date des mouvements sans date propre (défaut : maintenant).
+    """
+    if type_mouvement not in TYPES_MOUVEMENT:
+        raise ValueError(f"Type de mouvement inconnu : {type_mouvement}")
+    if isinstance(deltas, dict):
+        deltas = deltas.items()
+    date = date or datetime.utcnow()
+    lignes = [
+        {"matiere_id": mvt[0], "date": mvt[2] if len(mvt) > 2 else date, "type": type_mouvement,
+         "delta_mg": mvt[1], "reference": reference}
+        for mvt in deltas if mvt[1]
+    ]
+    if lignes:
+        db.session.execute(_mouvement.insert(), lignes)
+
+
+def instant_achat(jour):
+    """
+    Date du mouvement d'un achat daté `jour` : maintenant pour un achat du
+    jour, sinon le début de cette journée (achat antidaté, import
+    d'historique), pour que /stock?at= le compte à sa date.
+    """
+    maintenant = datetime.utcnow()
+    if jour is None or jour == maintenant.date():
+        return maintenant
+    return datetime.combine(jour, time.min)
+
+
+def lire_instant(valeur):
+    """
+    ?at= de /stock : AAAA-MM-JJ (fin de cette journée) ou date-heure ISO.
+    Lève ValueError si le format est invalide.
+    """
+    try:
+        if len(valeur) == 10:
+            return datetime.strptime(valeur, "%Y-%m-%d").replace(hour=23, minute=59, second=59, microsecond=999999)
+        return datetime.fromisoformat(valeur)
+    except ValueError:
+        raise ValueError("'at' invalide, format attendu : AAAA-MM-JJ ou AAAA-MM-JJTHH:MM:SS.")
+
+
+def _derniers_instantanes(at=None):
+    """Sous-requête : dernière photo de chaque matière (prise au plus tard à `at`)."""
+    derniers = db.session.query(
+        InstantaneStock.matiere_id,
+        func.max(InstantaneStock.id).label("id")
+    )
+    if at is not None:
+        derniers = derniers.filter(InstantaneStock.date <= at)
+    derniers = derniers.group_by(InstantaneStock.matiere_id).subquery()
+    return (
+        db.session.query(
+            InstantaneStock.matiere_id,
+            InstantaneStock.mouvement_id,
+            InstantaneStock.quantite_mg
+        )
+        .join(derniers, InstantaneStock.id == derniers.c.id)
+        .subquery()
+    )
+
+
+def stock_journal(at=None):
+    """
+    Stock par matière d'après le journal : dernière photo (≤ at) + somme des
+    mouvements postérieurs à cette photo (≤ at). Deux requêtes groupées,
+    qui ne parcourent que les mouvements récents grâce aux index.
+    Retourne { matiere_id: (quantite_mg, dernier_mouvement_id) }.
+    """
+    snap = _derniers_instantanes(at)
+
+    stock = {
+        mat_id: (quantite, mvt_id)
+        for mat_id, mvt_id, quantite in db.session.query(snap.c.matiere_id, snap.c.mouvement_id, snap.c.quantite_mg)
+    }
+
+    deltas = (
+        db.session.query(
+            MouvementStock.matiere_id,
+            func.sum(MouvementStock.delta_mg),
+            func.max(MouvementStock.id)
+        )
+        .outerjoin(snap, snap.c.matiere_id == MouvementStock.matiere_id)
+        .filter(MouvementStock.id > func.coalesce(snap.c.mouvement_id, 0))
+    )
+    if at is not None:
+        deltas = deltas.filter(MouvementStock.date <= at)
+    for mat_id, somme, dernier in deltas.group_by(MouvementStock.matiere_id):
+        base, _ = stock.get(mat_id, (0, 0))
+        stock[mat_id] = (base + (somme or 0), dernier)
+    return stock
+
+
+def stock_a_la_date(at):
+    """
+    Stock des matières existantes à la date `at`, au format de /stock.
+    Les matières sans aucun mouvement avant `at` n'apparaissent pas.
+    """
+    stock = stock_journal(at)
+    bases, oxydes = [], []
+    matieres = (
+        Matiere.query
+        .filter(Matiere.id.in_(list(stock)))
+        .all()
+    ) if stock else []
+    for m in sorted(matieres, key=lambda m: stock[m.id][0], reverse=True):
+        entry = {
+            "nom": m.nom,
+            "type": m.type,
+            "quantite": grammes(stock[m.id][0]),
+            "unite": m.unite
+        }
+        (bases if m.type == "base" else oxydes).append(entry)
+    return {"date": at.isoformat(), "bases": bases, "oxydes": oxydes}
+
+
+def _verrouiller_journal():
+    """
+    Bloque les nouveaux mouvements le temps de la photo et attend la fin des
+    transactions qui en écrivent : un mouvement d'id inférieur, validé après
+    la photo, serait sinon oublié.
+    """
+    dialecte = db.session.get_bind().dialect.name
+    if dialecte == "postgresql":
+        db.session.execute(text("LOCK TABLE mouvement_stock IN SHARE MODE"))
+    elif dialecte == "sqlite":
+        # écriture neutre : prend le verrou d'écriture de la base
+        db.session.execute(_instantane.delete().where(_instantane.c.id < 0))
+
+
+def prendre_instantanes():
+    """
+    Photographie le stock de chaque matière ayant bougé depuis sa dernière
+    photo. Retourne (nombre de photos, écarts) où écarts liste les matières
+    dont Matiere.quantite_mg diffère du journal.
+    """
+    _verrouiller_journal()
+    date = datetime.utcnow()
+    stock = stock_journal()
+    snap = _derniers_instantanes()
+    deja = {
+        mat_id: mvt_id
+        for mat_id, mvt_id in db.session.query(snap.c.matiere_id, snap.c.mouvement_id)
+    }
+    photos = [
+        {"matiere_id": mat_id, "date": date, "mouvement_id": mvt_id, "quantite_mg": quantite}
+        for mat_id, (quantite, mvt_id) in stock.items()
+        if deja.get(mat_id) != mvt_id
+    ]
+    if photos:
+        db.session.execute(_instantane.insert(), photos)
+
+    ecarts = []
+    for mat_id, nom, quantite in db.session.query(Matiere.id, Matiere.nom, Matiere.quantite_mg):
+        journal = stock.get(mat_id, (0, 0))[0]
+        if (quantite or 0) != journal:
+            ecarts.append({
+                "matiere": nom,
+                "quantite": grammes(quantite),
+                "journal": grammes(journal)
+            })
+    return len(photos), ecarts
+
+
+def ouvrir_journal():
+    """
+    Reprise de l'existant : un mouvement 'ouverture' par matière (stock
+    actuel), puis une première photo. Utilisé par la migration du journal.
+    """
+    enregistrer_mouvements("ouverture", [
+        (mat_id, quantite) for mat_id, quantite in
+        db.session.query(Matiere.id, Matiere.quantite_mg)
+    ], reference="reprise")
+    prendre_instantanes()
@@ -0,0 +1,19 @@
+"""
+Routes de l'API, un blueprint par sous-système :
+  stock       matières, stock, journal, réapprovisionnement
+  achats      achats, imports, historique, rapports mensuels
+  recettes    création, import, catalogue, suppression
+  production  simulations, production, faisabilité, planification, compromis
+  couts       coût moyen pondéré des matières, coût de revient des recettes
+  admin       seuils, métriques, santé / disponibilité, schéma
+  changements flux des changements (Server-Sent Events)
+Les commandes CLI sont déclarées sur les mêmes blueprints
+(cli_group=None : elles restent au premier niveau, ex. `flask migrer`).
+"""
+
+
+def enregistrer(app):
+    """Importe les blueprints (et avec eux les modèles) et les enregistre."""
+    from routes import stock, achats, recettes, production, couts, admin, changements
+    for module in (stock, achats, recettes, production, couts, admin, changements):
+        app.register_blueprint(module.bp)
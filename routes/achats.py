@@ -0,0 +1,354 @@
+"""
+Achats : saisie, import en masse, historique, pagination, totaux et
+rapports mensuels.
+"""
+import logging
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+
+from extensions import db
+from models import Matiere, Achat, DepenseMensuelle, ConsommationMensuelle
+from cache import en_cache, invalider
+from idempotence import idempotent
+from flux_json import mode_flux, reponse_flux, TAILLE_PAQUET
+from agregats import (
+    enregistrer_depenses, reconstruire_depenses, rapport,
+    CHAMPS_DEPENSES, CHAMPS_CONSOMMATION
+)
+from registre import enregistrer_mouvements, instant_achat
+from production import verrouiller_matieres, ajuster_stock
+from previsions import noter_achats, reconstruire_previsions
+from couts import enregistrer_achats as enregistrer_couts, reconstruire_couts
+from achats import (
+    importer_achats, lignes_csv, lignes_jsonl, flux_texte,
+    lire_filtres, page_achats, totaux_achats, LIMITE_DEFAUT, LIMITE_MAX
+)
+from unites import mg, centimes, grammes, euros
+import changements
+
+log = logging.getLogger("glaze_api")
+
+bp = Blueprint("achats", __name__, cli_group=None)
+
+
+# ==========================================
+#              ROUTE ACHATS
+# ==========================================
+
+@bp.route("/achat", methods=["POST"])
+@idempotent
+def enregistrer_achat():
+    data = request.get_json()
+    log.debug("/achat payload : %s", data)  # pour voir le JSON reçu
+    try:
+        nom = data.get("nom", "").strip().lower()
+        quantite = data.get("quantite")
+        prix = data.get("prix")
+        fournisseur = data.get("fournisseur", "").strip()
+        date_str = data.get("date")
+        type_matiere = data.get("type")  # facultatif si matière existante
+
+        # Champs obligatoires
+        if not nom or quantite is None or prix is None:
+            return jsonify({"message": "Champs requis : nom, quantite, prix"}), 400
+        try:
+            quantite_mg = mg(quantite)
+            prix_centimes = centimes(prix)
+        except ValueError:
+            return jsonify({"message": "'quantite' et 'prix' doivent être des nombres."}), 400
+
+        # Recherche ou création de la Matière
+        matiere = Matiere.query.filter_by(nom=nom).first()
+        if not matiere:
+            # new: type obligatoire pour création
+            if not type_matiere or type_matiere.strip().lower() not in ["base", "oxyde"]:
+                return jsonify({
+                    "message": "Matière inconnue. Précisez 'type' = 'base' ou 'oxyde'."
+                }), 400
+            tm = type_matiere.strip().lower()
+            matiere = Matiere(
+                nom=nom,
+                type=tm,
+                unite=data.get("unite", "g").strip(),
+                quantite_mg=0
+            )
+            db.session.add(matiere)
+            db.session.flush()
+            changements.publier({"type": "matiere", "action": "ajout", "nom": nom, "type_matiere": tm,
+                                 "unite": matiere.unite, "quantite": 0.0})
+
+        # Date
+        if date_str:
+            date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        else:
+            date = datetime.utcnow().date()
+
+        # Création de l'achat
+        achat = Achat(
+            matiere_id = matiere.id,
+            quantite_mg   = quantite_mg,
+            prix_centimes = prix_centimes,
+            fournisseur   = fournisseur,
+            date          = date
+        )
+        db.session.add(achat)
+
+        # Mise à jour stock sous verrou, calculée côté SQL (entiers : pas de dérive)
+        actuel = verrouiller_matieres([matiere.id])[matiere.id]
+        ajuster_stock({matiere.id: quantite_mg})
+
+        # Agrégat mensuel des dépenses (même transaction)
+        db.session.flush()
+        enregistrer_depenses([{
+            "matiere_id": matiere.id,
+            "date": date,
+            "quantite_mg": quantite_mg,
+            "prix_centimes": prix_centimes
+        }])
+        enregistrer_mouvements("achat", {matiere.id: quantite_mg}, reference=f"achat:{achat.id}",
+                               date=instant_achat(date))
+        noter_achats([{"matiere_id": matiere.id, "date": date}])
+        enregistrer_couts([{"matiere_id": matiere.id, "quantite_mg": quantite_mg, "prix_centimes": prix_centimes}])
+
+        # Flux des changements (diffusé au commit)
+        changements.publier({"type": "achat", "nom": matiere.nom, "type_matiere": matiere.type,
+                             "quantite": grammes(quantite_mg), "prix": euros(prix_centimes), "fournisseur": fournisseur,
+                             "date": date.isoformat()})
+        changements.publier({"type": "stock", "matieres": [
+            {"nom": matiere.nom, "type": matiere.type, "quantite": grammes(actuel + quantite_mg),
+             "delta": grammes(quantite_mg)}
+        ]})
+
+        invalider()
+        db.session.commit()
+
+        return jsonify({
+            "message": f"Achat de {quantite}g pour '{matiere.nom}' enregistré.",
+            "stock_restant": grammes(actuel + quantite_mg)
+        }), 201
+
+    except Exception as e:
+        # Log l'erreur (avec la trace) dans les logs Railway
+        db.session.rollback()
+        log.exception("Erreur /achat")
+        return jsonify({"error": str(e)}), 500
+
+
+# ==========================================
+#   IMPORT D'ACHATS EN MASSE (CSV / JSONL)
+# ==========================================
+@bp.route("/achats/import", methods=["POST"])
+@idempotent
+def importer_achats_route():
+    """
+    Importe un lot d'achats envoyé en flux (facturier fournisseur, etc.).
+    Format selon Content-Type (ou ?format=csv|jsonl) :
+      - text/csv             : en-tête nom,quantite,prix[,fournisseur,date,type,unite]
+      - application/x-ndjson : un objet JSON par ligne, mêmes champs que /achat
+    Le corps est lu ligne à ligne, sans être chargé en entier en mémoire.
+    Réponse :
+      { "lignes", "importees", "matieres_creees": [...],
+        "nb_erreurs", "erreurs": [ {"ligne": n, "message": "..."} ] }
+    Les lignes en erreur sont ignorées, les autres sont importées.
+    """
+    fmt = request.args.get("format")
+    if not fmt:
+        fmt = "csv" if request.mimetype == "text/csv" else "jsonl"
+    if fmt not in ("csv", "jsonl"):
+        return jsonify({"message": "Format invalide. Utilisez 'csv' ou 'jsonl'."}), 400
+
+    flux = flux_texte(request.stream)
+    lignes = lignes_csv(flux) if fmt == "csv" else lignes_jsonl(flux)
+
+    try:
+        rapport = importer_achats(lignes)
+        if rapport["importees"]:
+            # trop de lignes pour des deltas : les clients rechargent
+            changements.publier({"type": "resynchroniser", "cible": "stock"})
+            invalider()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Erreur /achats/import")
+        return jsonify({"error": str(e)}), 500
+
+    status = 201 if rapport["importees"] else 400
+    return jsonify(rapport), status
+
+
+# ==========================================
+#   ROUTE HISTORIQUE ACHATS
+# ==========================================
+@bp.route("/historique_achats", methods=["GET"])
+@en_cache
+def historique_achats():
+    """
+    Tous les achats, groupés par type, avec les totaux par matière.
+    En flux (Accept: application/x-ndjson ou ?stream=1) : seulement la liste
+    des achats, { "bases": [...], "oxydes": [...] } (une ligne par achat en
+    NDJSON) ; les totaux restent disponibles sur /achats/totaux.
+    """
+    mode = mode_flux()
+    if mode:
+        return reponse_flux(mode, sections=[
+            ("bases", _achats_par_type("base")),
+            ("oxydes", _achats_par_type("oxyde"))
+        ])
+
+    # 1. On récupère toutes les lignes Achat + Matiere
+    rows = (
+        db.session.query(
+            Achat.quantite_mg,
+            Achat.prix_centimes,
+            Achat.fournisseur,
+            Achat.date,
+            Matiere.nom,
+            Matiere.type
+        )
+        .join(Matiere, Achat.matiere_id == Matiere.id)
+        .order_by(Achat.date.desc())
+        .all()
+    )
+
+    # 2. Totaux par matière et par type, calculés en SQL (GROUP BY)
+    result = totaux_achats()
+    result["bases"]["achats"] = []
+    result["oxydes"]["achats"] = []
+
+    # 3. Détail des achats
+    for quantite, prix, fournisseur, date, nom_mat, m_type in rows:
+        cat = "bases" if m_type == "base" else "oxydes"
+        result[cat]["achats"].append({
+            "nom": nom_mat,
+            "quantite": grammes(quantite),
+            "prix": euros(prix),
+            "fournisseur": fournisseur,
+            "date": date.isoformat()
+        })
+
+    return jsonify(result), 200
+
+
+def _achats_par_type(type_matiere):
+    """Achats d'un type, du plus récent au plus ancien, lus par paquets."""
+    rows = (
+        db.session.query(
+            Achat.quantite_mg,
+            Achat.prix_centimes,
+            Achat.fournisseur,
+            Achat.date,
+            Matiere.nom,
+            Matiere.type
+        )
+        .join(Matiere, Achat.matiere_id == Matiere.id)
+        .filter(Matiere.type == type_matiere)
+        .order_by(Achat.date.desc(), Achat.id.desc())
+        .yield_per(TAILLE_PAQUET)
+    )
+    for quantite, prix, fournisseur, date, nom_mat, m_type in rows:
+        yield {
+            "nom": nom_mat,
+            "type": m_type,
+            "quantite": grammes(quantite),
+            "prix": euros(prix),
+            "fournisseur": fournisseur,
+            "date": date.isoformat()
+        }
+
+
+# ==========================================
+#   ACHATS PAGINÉS + TOTAUX
+# ==========================================
+@bp.route("/achats", methods=["GET"])
+@en_cache
+def lister_achats():
+    """
+    Achats paginés par clé, du plus récent au plus ancien.
+    Query string :
+      - limite      : taille de page (défaut 100, max 500)
+      - curseur     : valeur 'curseur_suivant' de la page précédente
+      - debut, fin  : bornes de date incluses (AAAA-MM-JJ)
+      - fournisseur, matiere, type : filtres exacts
+    Réponse :
+      { "achats": [ {id, nom, type, quantite, prix, fournisseur, date}, ... ],
+        "curseur_suivant": str | null }
+    """
+    try:
+        filtres = lire_filtres(request.args)
+        limite = int(request.args.get("limite", LIMITE_DEFAUT))
+        if limite < 1:
+            raise ValueError("'limite' doit être un entier positif.")
+        limite = min(limite, LIMITE_MAX)
+        achats, suivant = page_achats(filtres, limite, request.args.get("curseur"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify({"achats": achats, "curseur_suivant": suivant}), 200
+
+
+@bp.route("/achats/totaux", methods=["GET"])
+@en_cache
+def totaux_achats_route():
+    """
+    Totaux de dépenses par type et par matière (mêmes filtres que /achats) :
+      { "bases":  { "prix_par_matiere": {...}, "total_prix": float },
+        "oxydes": { ... } }
+    """
+    try:
+        filtres = lire_filtres(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    return jsonify(totaux_achats(filtres)), 200
+
+
+# ==========================================
+#   RAPPORTS MENSUELS (AGRÉGATS)
+# ==========================================
+@bp.route("/rapports/depenses", methods=["GET"])
+@en_cache
+def rapport_depenses():
+    """
+    Dépenses par matière et par mois, lues dans l'agrégat depense_mensuelle
+    (coût proportionnel au nombre de matières × mois, pas au nombre d'achats).
+    Filtres : debut, fin (AAAA-MM), type, matiere.
+    Champs par mois : quantite, prix, nb_achats.
+    """
+    try:
+        return jsonify(rapport(DepenseMensuelle, CHAMPS_DEPENSES, request.args)), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+
+@bp.route("/rapports/consommation", methods=["GET"])
+@en_cache
+def rapport_consommation():
+    """
+    Consommation de stock par les productions, par matière et par mois
+    (agrégat consommation_mensuelle). Mêmes filtres que /rapports/depenses.
+    Champs par mois : quantite, nb_productions.
+    """
+    try:
+        return jsonify(rapport(ConsommationMensuelle, CHAMPS_CONSOMMATION, request.args)), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+
+@bp.route("/rapports/reconstruire", methods=["POST"])
+@idempotent
+def reconstruire_rapports():
+    """
+    Recalcule l'agrégat des dépenses et les coûts moyens depuis la table
+    achat (reprise des achats antérieurs à l'agrégat) et le résumé des
+    prévisions depuis les achats et le journal. La consommation mensuelle
+    n'a pas d'historique brut et n'est donc pas recalculable.
+    """
+    nb = reconstruire_depenses()
+    nb_prev = reconstruire_previsions()
+    nb_couts = reconstruire_couts()
+    invalider()
+    db.session.commit()
+    return jsonify({
+        "message": (f"Dépenses mensuelles recalculées ({nb} ligne(s)), prévisions de {nb_prev} matière(s), "
+                    f"coûts de {nb_couts} matière(s).")
+    }), 200
@@ -0,0 +1,259 @@
+"""
+Administration : seuils de stock, métriques, santé / disponibilité du
+worker, schéma (initialisation, migrations, plans d'exécution, purge).
+"""
+import logging
+import os
+import time
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models import Matiere, SeuilDefaut
+from cache import invalider
+from idempotence import idempotent, purger_cles
+from migrations import appliquer_migrations, version_courante, expliquer_requetes, MIGRATIONS
+from unites import grammes
+import changements
+import couts
+import index_compositions
+import metriques
+import seuils
+
+log = logging.getLogger("glaze_api")
+
+bp = Blueprint("admin", __name__, cli_group=None)
+
+
+# ==========================================
+#   SEUILS DE STOCK (ADMINISTRATION)
+# ==========================================
+def _en_grammes(valeurs):
+    """Seuils (mg, None = seuil du type) → { niveau: grammes | None } pour l'API."""
+    return {n: None if v is None else grammes(v) for n, v in zip(seuils.NIVEAUX, valeurs)}
+
+
+@bp.route("/seuils", methods=["GET"])
+def lister_seuils():
+    """
+    Seuils effectifs par type et seuils propres à certaines matières.
+    Réponse :
+      { "types": { "base": {orange, rouge, noir}, "oxyde": {...} },
+        "matieres": { "<nom>": {orange, rouge, noir} } }   # null = seuil du type
+    """
+    table_seuils = seuils.table()
+    types = set(seuils.DEFAUTS) | set(table_seuils.par_type)
+    noms = dict(
+        db.session.query(Matiere.id, Matiere.nom)
+        .filter(Matiere.id.in_(list(table_seuils.par_matiere)))
+    ) if table_seuils.par_matiere else {}
+    return jsonify({
+        "types": {
+            t: _en_grammes(table_seuils.du_type(t)) for t in sorted(types)
+        },
+        "matieres": {
+            noms[mat_id]: _en_grammes(valeurs)
+            for mat_id, valeurs in table_seuils.par_matiere.items() if mat_id in noms
+        }
+    }), 200
+
+
+@bp.route("/seuils/types/<string:type_matiere>", methods=["PUT"])
+@idempotent
+def definir_seuils_type(type_matiere):
+    """JSON attendu : { "orange": 300, "rouge": 200, "noir": 0 } (grammes)."""
+    type_matiere = type_matiere.strip().lower()
+    if type_matiere not in ("base", "oxyde"):
+        return jsonify({"message": "Type invalide. Utilisez 'base' ou 'oxyde'."}), 400
+    try:
+        valeurs = seuils.lire_seuils(request.get_json(silent=True))
+        seuils.verifier_ordre([valeurs[n] for n in seuils.NIVEAUX])
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    ligne = db.session.get(SeuilDefaut, type_matiere) or SeuilDefaut(type=type_matiere)
+    ligne.orange_mg, ligne.rouge_mg, ligne.noir_mg = (valeurs[n] for n in seuils.NIVEAUX)
+    db.session.add(ligne)
+    invalider(seuils.VERSION_SEUILS)
+    invalider()
+    db.session.commit()
+    return jsonify({
+        "message": f"Seuils du type '{type_matiere}' enregistrés.",
+        "seuils": _en_grammes(valeurs[n] for n in seuils.NIVEAUX)
+    }), 200
+
+
+@bp.route("/seuils/matieres/<string:nom>", methods=["PUT", "DELETE"])
+@idempotent
+def definir_seuils_matiere(nom):
+    """
+    PUT : { "orange"?, "rouge"?, "noir"? } — seuils propres à la matière ;
+          un niveau absent est inchangé, null le ramène au seuil du type.
+    DELETE : revient aux seuils du type pour les trois niveaux.
+    """
+    key = nom.strip().lower()
+    matiere = Matiere.query.filter_by(nom=key).first()
+    if not matiere:
+        return jsonify({"message": f"Matière '{key}' introuvable."}), 404
+
+    # seuils du type lus avant toute modification de la session
+    defaut = seuils.table().du_type(matiere.type)
+
+    if request.method == "DELETE":
+        valeurs = dict.fromkeys(seuils.NIVEAUX)
+    else:
+        try:
+            valeurs = seuils.lire_seuils(request.get_json(silent=True), partiel=True)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+    for niveau, v in valeurs.items():
+        setattr(matiere, f"seuil_{niveau}_mg", v)
+
+    # contrôle sur les seuils effectifs (valeurs propres + type)
+    effectifs = [
+        getattr(matiere, f"seuil_{n}_mg") if getattr(matiere, f"seuil_{n}_mg") is not None else d
+        for n, d in zip(seuils.NIVEAUX, defaut)
+    ]
+    try:
+        seuils.verifier_ordre(effectifs)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"message": str(e)}), 400
+
+    invalider(seuils.VERSION_SEUILS)
+    invalider()
+    db.session.commit()
+    return jsonify({
+        "message": f"Seuils de '{key}' enregistrés.",
+        "seuils": _en_grammes(effectifs)
+    }), 200
+
+
+# ==========================================
+#   SANTÉ ET DISPONIBILITÉ DU WORKER
+# ==========================================
+_demarrage = time.time()
+_connexions = 0   # connexions ouvertes par ce process depuis le démarrage
+
+
+@event.listens_for(Engine, "connect")
+def _compter_connexion(dbapi_connection, connection_record):
+    global _connexions
+    _connexions += 1
+
+
+def _etat_chaud():
+    """Ce qui est déjà prêt dans ce worker (rien n'est chargé au démarrage)."""
+    return {
+        "base_connectee": _connexions > 0,
+        "index_compositions": index_compositions.en_memoire(),
+        "seuils": seuils.en_memoire(),
+        "couts": couts.en_memoire(),
+        "abonnes_changements": changements.nb_abonnes()
+    }
+
+
+@bp.route("/sante", methods=["GET"])
+def sante():
+    """
+    Sonde de vivacité : répond sans toucher à la base.
+    Réponse : { "statut": "ok", "pid", "depuis_s", "chaud": {...} }
+    """
+    return jsonify({
+        "statut": "ok",
+        "pid": os.getpid(),
+        "depuis_s": round(time.time() - _demarrage, 1),
+        "chaud": _etat_chaud()
+    }), 200
+
+
+@bp.route("/pret", methods=["GET"])
+def pret():
+    """
+    Sonde de disponibilité : base joignable et schéma à jour, puis
+    préchauffage du worker (index des compositions, seuils, coûts) pour
+    que la première vraie requête ne paie pas ces constructions.
+    503 tant que la base est injoignable ou le schéma en retard
+    (`flask --app app migrer`).
+    """
+    attendue = MIGRATIONS[-1][0]
+    try:
+        version = version_courante()
+        if version >= attendue:
+            index_compositions.charger([])
+            seuils.table()
+            couts.table()
+    except SQLAlchemyError:
+        db.session.rollback()
+        log.exception("Erreur /pret")
+        return jsonify({"pret": False, "message": "Base de données injoignable."}), 503
+
+    if version < attendue:
+        return jsonify({
+            "pret": False,
+            "message": "Schéma en retard : lancer `flask --app app migrer`.",
+            "version_schema": version,
+            "version_attendue": attendue
+        }), 503
+    return jsonify({"pret": True, "version_schema": version, "chaud": _etat_chaud()}), 200
+
+
+# ==========================================
+#   MÉTRIQUES (PROMETHEUS)
+# ==========================================
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Latence et nombre de requêtes SQL par route, temps SQL cumulé, codes
+    de réponse, requêtes lentes — format texte Prometheus (voir metriques.py).
+    """
+    return metriques.exposer(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+# ==========================================
+#   def init_db
+# ==========================================
+# def init_db
+
+@bp.route("/init_db", methods=["POST"])
+def init_db():
+    """Crée ou met à jour le schéma (voir migrations.py)."""
+    appliquees = appliquer_migrations()
+    invalider()
+    db.session.commit()
+    return jsonify({
+        "message": "Base initialisée.",
+        "migrations_appliquees": appliquees,
+        "version_schema": version_courante()
+    }), 201
+
+
+@bp.cli.command("migrer")
+def migrer_commande():
+    """flask --app app migrer : applique les migrations en attente."""
+    appliquees = appliquer_migrations()
+    print(f"Migrations appliquées : {appliquees or 'aucune'} (version {version_courante()})")
+
+
+@bp.cli.command("expliquer")
+def expliquer_commande():
+    """flask --app app expliquer : vérifie que les requêtes chaudes utilisent leurs index."""
+    ok = True
+    for nom, res in expliquer_requetes().items():
+        etat = "OK " if res["utilise"] else "NON"
+        ok = ok and res["utilise"]
+        print(f"[{etat}] {nom} → {res['index_attendu']}")
+        print("      " + res["plan"].replace("\n", "\n      "))
+    if not ok:
+        raise SystemExit(1)
+
+
+@bp.cli.command("purger-cles")
+def purger_cles_commande():
+    """flask --app app purger-cles : supprime les clés d'idempotence expirées (tâche planifiée)."""
+    nb = purger_cles()
+    db.session.commit()
+    print(f"{nb} clé(s) d'idempotence expirée(s) supprimée(s).")
@@ -0,0 +1,34 @@
+"""
+Flux des changements en Server-Sent Events (voir changements.py).
+"""
+from flask import Blueprint, Response, request, jsonify
+
+import changements
+
+bp = Blueprint("changements", __name__, cli_group=None)
+
+
+# ==========================================
+#   FLUX DES CHANGEMENTS (SSE)
+# ==========================================
+@bp.route("/changements", methods=["GET"])
+def flux_changements():
+    """
+    text/event-stream : un événement par changement commité (stock, achat,
+    matiere, recette, resynchroniser), à appliquer par le client sur les
+    données déjà affichées. Reprise après coupure : en-tête Last-Event-ID
+    (envoyé automatiquement par EventSource).
+    503 (Retry-After) si le worker a déjà FLUX_ABONNES_MAX connexions.
+    Ni transaction ni connexion à la base ne restent ouvertes pendant le flux.
+    """
+    try:
+        abonne = changements.abonner(request.headers.get("Last-Event-ID"))
+    except changements.FluxSature:
+        rv = jsonify({"message": "Trop de connexions au flux des changements, réessayez plus tard."})
+        rv.status_code = 503
+        rv.headers["Retry-After"] = "10"
+        return rv
+    return Response(changements.flux_sse(abonne), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"     # pas de mise en tampon par un proxy nginx
+    })
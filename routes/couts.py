@@ -0,0 +1,77 @@
+"""
+Coûts : coût moyen pondéré des achats par matière et coût de revient des
+recettes.
+"""
+from flask import Blueprint, request, jsonify
+
+from extensions import db
+from models import Matiere, CoutMatiere
+from cache import en_cache
+from unites import MG_PAR_KG, mg, grammes, euros
+import couts
+import index_compositions
+
+bp = Blueprint("couts", __name__, cli_group=None)
+
+
+# ==========================================
+#   COÛT MOYEN PONDÉRÉ PAR MATIÈRE
+# ==========================================
+@bp.route("/couts/matieres", methods=["GET"])
+@en_cache
+def couts_matieres():
+    """
+    Coût moyen pondéré de chaque matière achetée (montant total / quantité
+    totale achetée), lu dans le cumul cout_matiere.
+    Réponse :
+      { "matieres": [ { nom, type, quantite_achetee (g), montant (€),
+                        cout_kg (€/kg) } ] }
+    """
+    rows = (
+        db.session.query(Matiere.nom, Matiere.type, CoutMatiere.quantite_mg, CoutMatiere.prix_centimes)
+        .join(Matiere, CoutMatiere.matiere_id == Matiere.id)
+        .order_by(Matiere.nom)
+    )
+    return jsonify({"matieres": [
+        {
+            "nom": nom,
+            "type": m_type,
+            "quantite_achetee": grammes(q),
+            "montant": euros(p),
+            "cout_kg": euros(round(p * MG_PAR_KG / q)) if q > 0 else None
+        }
+        for nom, m_type, q, p in rows
+    ]}), 200
+
+
+# ==========================================
+#   COÛT DE REVIENT DES RECETTES
+# ==========================================
+@bp.route("/couts/recettes", methods=["GET"])
+@en_cache
+def couts_recettes_route():
+    """
+    Coût au kg de chaque recette, au coût moyen pondéré de ses matières.
+    Query string :
+      - masse : masse d'un lot (g) ; ajoute cout_lot pour cette masse
+    Réponse :
+      { "masse": m | null, "recettes": [ { recette, cout_kg,
+          matieres_sans_prix, cout_lot? } ] }   (triées par nom)
+    Un passage sur l'index des compositions, sans lecture du stock.
+    """
+    masse = request.args.get("masse")
+    try:
+        masse_mg = mg(masse) if masse not in (None, "") else None
+    except ValueError:
+        return jsonify({"message": "'masse' doit être un nombre."}), 400
+    if masse_mg is not None and masse_mg <= 0:
+        return jsonify({"message": "'masse' doit être positive."}), 400
+
+    # index à jour ; la version des coûts est lue dans la même requête
+    index, _ = index_compositions.charger([])
+    lignes = couts.couts_recettes(index, couts.table(), masse_mg)
+    lignes.sort(key=lambda l: l["recette"])
+    return jsonify({
+        "masse": grammes(masse_mg) if masse_mg is not None else None,
+        "recettes": lignes
+    }), 200
@@ -0,0 +1,506 @@
+"""
+Production : simulation (unitaire, en lot, groupée), production réelle,
+faisabilité du catalogue, planification multi-recettes et compromis entre
+recettes.
+"""
+import math
+
+from flask import Blueprint, request, jsonify
+
+from extensions import db
+from cache import en_cache, invalider
+from idempotence import idempotent
+from simulation import simuler, besoins_cumules, faisabilite, classer, TRIS
+from production import verrouiller_matieres, decrementer_stock
+from agregats import enregistrer_consommations
+from registre import enregistrer_mouvements
+from previsions import noter_consommations
+from planification import planifier, PlanImpossible
+from compromis import frontiere_exacte, frontiere_echantillonnee, besoins_melange, FrontiereImpossible
+from unites import PPM_TOTAL, mg, grammes, part, pourcent
+import changements
+import couts
+import index_compositions
+import seuils
+
+bp = Blueprint("production", __name__, cli_group=None)
+
+
+# ==========================================
+#   ROUTE SIMULE + PRODUIRE
+# ==========================================
+
+# ─── 1) SIMULATION ───────────────────────────────────────────────────────────
+@bp.route("/simuler_production", methods=["POST"])
+def simuler_production():
+    data = request.get_json() or {}
+    nom_recette = data.get("recette")
+    masse_totale = data.get("masse")
+
+    # validation
+    if not nom_recette or masse_totale is None:
+        return jsonify({"message": "Champs requis : 'recette' et 'masse'"}), 400
+
+    try:
+        masse_mg = mg(masse_totale)
+    except ValueError:
+        return jsonify({"message": "Le champ 'masse' doit être un nombre."}), 400
+
+    # compositions lues dans l'index, stock en une requête
+    index, stock = index_compositions.charger([nom_recette])
+    recette = index.recettes([nom_recette], stock).get(nom_recette)
+    if not recette:
+        return jsonify({"message": f"Recette '{nom_recette}' introuvable."}), 404
+
+    return jsonify(simuler(recette, masse_mg, seuils.table(), couts.table())), 200
+
+
+@bp.route("/simuler_production/lot", methods=["POST"])
+def simuler_production_lot():
+    """
+    Simule plusieurs productions en un seul appel (préparation d'une cuisson).
+    JSON attendu :
+      { "productions": [ {"recette": "Nom A", "masse": 1000}, ... ] }
+    Réponse :
+      {
+        "resultats": [ <réponse de /simuler_production> | {"recette", "message"} ],
+        "besoins_cumules": {
+          "<matiere>": { "quantite_necessaire", "disponible", "manquant" }, ...
+        }
+      }
+    Chaque simulation est indépendante (même stock de départ) ; le cumul
+    indique si l'ensemble du lot tient dans le stock actuel.
+    """
+    data = request.get_json() or {}
+    productions = data.get("productions")
+    if not isinstance(productions, list) or not productions:
+        return jsonify({"message": "Le champ 'productions' doit être une liste non vide."}), 400
+
+    # une seule requête (stock) pour toutes les recettes du lot
+    noms = [p.get("recette") for p in productions if isinstance(p, dict) and p.get("recette")]
+    index, stock = index_compositions.charger(noms)
+    recettes = index.recettes(noms, stock)
+    table_seuils = seuils.table()
+    table_couts = couts.table()
+
+    resultats = []
+    for p in productions:
+        nom_recette = p.get("recette") if isinstance(p, dict) else None
+        masse = p.get("masse") if isinstance(p, dict) else None
+        if not nom_recette or masse is None:
+            resultats.append({"recette": nom_recette, "message": "Champs requis : 'recette' et 'masse'"})
+            continue
+        try:
+            masse_mg = mg(masse)
+        except ValueError:
+            resultats.append({"recette": nom_recette, "message": "Le champ 'masse' doit être un nombre."})
+            continue
+        recette = recettes.get(nom_recette)
+        if not recette:
+            resultats.append({"recette": nom_recette, "message": f"Recette '{nom_recette}' introuvable."})
+            continue
+        resultats.append(simuler(recette, masse_mg, table_seuils, table_couts))
+
+    return jsonify({
+        "resultats": resultats,
+        "besoins_cumules": besoins_cumules([r for r in resultats if "details" in r])
+    }), 200
+
+
+# ─── 2) PRODUCTION RÉELLE ────────────────────────────────────────────────────
+@bp.route("/produire", methods=["POST"])
+@idempotent
+def produire():
+    """
+    Applique une production réelle, en une seule transaction :
+    - Verrouille les matières de la recette (SELECT ... FOR UPDATE)
+    - Simule la production sur le stock lu sous verrou
+    - Bloque si seuil noir atteint
+    - Avertit si seuil orange/rouge (override requis)
+    - Décrémente le stock par un UPDATE ensembliste si confirmé
+    - Renvoie le stock après production et son coût (cout_total, cout_kg)
+    Deux productions concurrentes ne peuvent donc pas passer toutes les
+    deux la vérification et rendre le stock négatif.
+    """
+    data = request.get_json() or {}
+    nom_recette = data.get("recette")
+    masse_totale = data.get("masse")
+    override = data.get("override", False)
+
+    # 1) Validation
+    if not nom_recette or masse_totale is None:
+        return jsonify({"message": "Champs requis : 'recette' et 'masse'"}), 400
+    try:
+        masse_mg = mg(masse_totale)
+    except ValueError:
+        return jsonify({"message": "Le champ 'masse' doit être un nombre."}), 400
+
+    index, _ = index_compositions.charger([nom_recette])
+    recette = index.recettes([nom_recette], {}).get(nom_recette)
+    if not recette:
+        return jsonify({"message": f"Recette '{nom_recette}' introuvable."}), 404
+
+    # 2) Verrou sur les matières puis simulation sur le stock verrouillé
+    ids = {c["matiere_id"] for c in recette["compositions"] if c["matiere_id"] is not None}
+    stock = verrouiller_matieres(ids)
+    for c in recette["compositions"]:
+        if c["matiere_id"] is not None:
+            c["stock_mg"] = stock.get(c["matiere_id"], 0)
+
+    simulation = simuler(recette, masse_mg, seuils.table(), couts.table())
+    details = simulation["details"]
+
+    # 3) Vérification seuil noir
+    black = [d for d in details if d["couleur"] == "noir"]
+    if black:
+        db.session.rollback()
+        return jsonify({
+            "message": "Production impossible : stock trop bas pour certaines matières (seuil noir).",
+            "details": black
+        }), 400
+
+    # 4) Alerte orange/rouge
+    low = [d for d in details if d["couleur"] in ("rouge", "orange")]
+    if low and not override:
+        db.session.rollback()
+        return jsonify({
+            "message": "Attention : stock bas pour certaines matières. Passez 'override': true pour confirmer.",
+            "details": low
+        }), 200
+
+    # 5) Application de la production (décrémentation ensembliste, en mg) :
+    #    parts calculées en entiers depuis les ppm, comme dans simuler()
+    ids_par_nom = {c["matiere"]: c["matiere_id"] for c in recette["compositions"]}
+    consommations = {
+        c["matiere_id"]: part(masse_mg, c["ppm"])
+        for c in recette["compositions"] if c["matiere_id"] is not None
+    }
+    decrementer_stock(consommations)
+    enregistrer_consommations(consommations)
+    noter_consommations(consommations)
+    enregistrer_mouvements("production", {m: -q for m, q in consommations.items()},
+                           reference=f"production:{nom_recette}")
+    changements.publier({"type": "stock", "matieres": [
+        {"nom": c["matiere"], "type": c["type_matiere"],
+         "quantite": grammes(stock[c["matiere_id"]] - consommations[c["matiere_id"]]),
+         "delta": -grammes(consommations[c["matiere_id"]])}
+        for c in recette["compositions"] if c["matiere_id"] in consommations
+    ]})
+
+    invalider()
+    db.session.commit()
+
+    # 6) Stock après prod : calculé depuis les valeurs lues sous verrou
+    stock_post = [
+        {
+            "matiere": d["matiere"],
+            "nouveau_stock": grammes(stock[ids_par_nom[d["matiere"]]] - consommations[ids_par_nom[d["matiere"]]])
+        }
+        for d in details
+    ]
+
+    return jsonify({
+        "message": f"Production de {masse_totale}g de '{nom_recette}' réalisée avec succès.",
+        "stock_apres": stock_post,
+        # coût au coût moyen pondéré des achats
+        "cout_total": simulation["cout_total"],
+        "cout_kg": simulation["cout_kg"],
+        "matieres_sans_prix": simulation["matieres_sans_prix"]
+    }), 200
+
+
+# ==========================================
+#   FAISABILITÉ DE TOUT LE CATALOGUE
+# ==========================================
+@bp.route("/faisabilite", methods=["GET"])
+@en_cache
+def faisabilite_catalogue():
+    """
+    Ce que chaque recette permet de produire avec le stock actuel, en une
+    réponse (au lieu d'une simulation par recette).
+    Query string :
+      - masse  : masse visée (g) ; ajoute couleur / production_possible
+                 pour cette masse, comme /simuler_production
+      - tri    : 'masse' (défaut, décroissant), 'nom' ou 'couleur'
+                 (vert d'abord, puis masse maximale décroissante)
+      - ordre  : 'asc' ou 'desc' (inverse le sens par défaut du tri)
+      - limite : ne renvoie que les n premières recettes
+    Réponse :
+      { "masse": m | null, "total": n, "recettes": [ { recette,
+          production_maximale_possible, matiere_limitante, couleur?,
+          production_possible? } ] }
+    Un passage sur l'index des compositions, stock lu en une requête.
+    """
+    masse = request.args.get("masse")
+    tri = request.args.get("tri", "masse")
+    ordre = request.args.get("ordre")
+    limite = request.args.get("limite")
+    try:
+        masse_mg = mg(masse) if masse not in (None, "") else None
+        limite = int(limite) if limite not in (None, "") else None
+    except ValueError:
+        return jsonify({"message": "'masse' doit être un nombre et 'limite' un entier."}), 400
+    if masse_mg is not None and masse_mg <= 0:
+        return jsonify({"message": "'masse' doit être positive."}), 400
+    if limite is not None and limite < 1:
+        return jsonify({"message": "'limite' doit être au moins 1."}), 400
+    if tri not in TRIS:
+        return jsonify({"message": f"Tri invalide. Utilisez {', '.join(repr(t) for t in TRIS)}."}), 400
+    if ordre not in (None, "asc", "desc"):
+        return jsonify({"message": "Ordre invalide. Utilisez 'asc' ou 'desc'."}), 400
+
+    index, stock = index_compositions.charger(None)
+    lignes = faisabilite(index, stock, seuils.table(), masse_mg)
+    return jsonify({
+        "masse": grammes(masse_mg) if masse_mg is not None else None,
+        "total": len(lignes),
+        "recettes": classer(lignes, tri, None if ordre is None else ordre == "desc", limite)
+    }), 200
+
+
+# ==========================================
+#   SIMULATION DE PRODUCTION GROUPEE
+# ==========================================
+@bp.route("/simuler_production_groupe", methods=["POST"])
+def simuler_production_groupe():
+    """
+    Pour un ensemble de recettes, calcule la quantité maximale
+    identique qu'on peut produire de chacune selon le stock actuel.
+    JSON attendu en entrée :
+      { "recettes": ["Recette A", "Recette B", ...] }
+    Réponse :
+      {
+        "recettes": [...],
+        "quantite_max_commune": float,
+        "details": {
+          "<matiere>": {
+            "pct_total": float,         # somme des % sur toutes les recettes
+            "stock": float,             # stock actuel de la matière
+            "max_q_pour_matiere": float # stock * 100 / pct_total
+          }, ...
+        }
+      }
+    """
+    data      = request.get_json() or {}
+    noms      = data.get("recettes", [])
+
+    # Compositions lues dans l'index, stock en une seule requête
+    index, stock_ids = index_compositions.charger(noms)
+    for nom in index.absentes(noms):
+        return jsonify({"message": f"Recette '{nom}' introuvable."}), 404
+
+    # Somme des pourcentages (ppm) de chaque matière sur toutes les recettes
+    compo_tot = {}
+    for nom in noms:
+        for col, pct in index.compositions(nom):
+            compo_tot[col] = compo_tot.get(col, 0) + pct
+
+    # détails par matière : stock (mg) et masse maximale commune qu'il permet
+    details = {}
+    max_list = []
+    for col, pct in compo_tot.items():
+        if pct <= 0:
+            continue
+        stock = stock_ids.get(index.id_matieres[col]) or 0
+        max_q = stock * PPM_TOTAL // pct
+        max_list.append(max_q)
+        details[index.noms_matieres[col]] = {
+            "pct_total": pourcent(pct),
+            "stock":     grammes(stock),
+            "max_q_pour_matiere": grammes(max_q)
+        }
+
+    return jsonify({
+        "recettes": noms,
+        "quantite_max_commune": grammes(min(max_list)) if max_list else 0,
+        "details": details
+    }), 200
+
+
+# ==========================================
+#   PLANIFICATION OPTIMALE MULTI-RECETTES
+# ==========================================
+@bp.route("/planifier_production", methods=["POST"])
+def planifier_production():
+    """
+    Calcule la masse de chaque recette qui maximise la production totale
+    sur le stock partagé (programme linéaire).
+    JSON attendu :
+      { "recettes": [
+          "Nom A",                                  # forme courte
+          { "nom": "Nom B",
+            "min": 500, "max": 3000,                # bornes en g (optionnelles)
+            "poids": 2,                             # priorité (défaut 1)
+            "ratio": 1 },                           # proportion imposée
+          ...
+      ] }
+    Si 'ratio' est donné, il doit l'être pour toutes les recettes : les
+    masses gardent alors ces proportions (les poids sont ignorés).
+    Réponse :
+      {
+        "masses": { "<recette>": float, ... },
+        "total": float,
+        "matieres_limitantes": [ "<matiere>", ... ],
+        "matieres": {
+          "<matiere>": { "stock", "utilise", "reste", "limitante",
+                         "valeur_marginale" }, ...
+        }
+      }
+    """
+    data = request.get_json() or {}
+    entrees = data.get("recettes")
+    if not isinstance(entrees, list) or not entrees:
+        return jsonify({"message": "Le champ 'recettes' doit être une liste non vide."}), 400
+
+    # Normalisation des entrées
+    noms, specs = [], {}
+    for e in entrees:
+        spec = {"nom": e} if isinstance(e, str) else e
+        if not isinstance(spec, dict) or not spec.get("nom"):
+            return jsonify({"message": "Chaque recette doit avoir un 'nom'."}), 400
+        nom = spec["nom"]
+        if nom in specs:
+            return jsonify({"message": f"Recette '{nom}' présente plusieurs fois."}), 400
+        try:
+            specs[nom] = {
+                k: float(spec[k]) for k in ("min", "max", "poids", "ratio")
+                if spec.get(k) is not None
+            }
+        except (TypeError, ValueError):
+            return jsonify({"message": f"Valeurs numériques invalides pour '{nom}'."}), 400
+        if not all(math.isfinite(v) for v in specs[nom].values()):
+            return jsonify({"message": f"Valeurs numériques invalides pour '{nom}'."}), 400
+        if any(v < 0 for v in specs[nom].values()):
+            return jsonify({"message": f"'min', 'max', 'poids' et 'ratio' doivent être positifs ou nuls pour '{nom}'."}), 400
+        if "min" in specs[nom] and "max" in specs[nom] and specs[nom]["min"] > specs[nom]["max"]:
+            return jsonify({"message": f"Bornes incompatibles pour '{nom}' : min > max."}), 400
+        noms.append(nom)
+
+    # Matrice recette × matière lue dans l'index, stock en une requête
+    index, stock_ids = index_compositions.charger(noms)
+    absentes = index.absentes(noms)
+    if absentes:
+        return jsonify({"message": f"Recette(s) introuvable(s) : {', '.join(absentes)}"}), 404
+    noms_mat, besoins, stock = index.matrice(noms, stock_ids)
+
+    try:
+        plan = planifier(noms, specs, noms_mat, besoins, stock)
+    except PlanImpossible as e:
+        return jsonify({"message": str(e), "details": getattr(e, "details", [])}), 400
+
+    return jsonify(plan), 200
+
+
+# ==========================================
+#   DONNÉES POUR GRAPHE DE COMPROMIS
+# ==========================================
+@bp.route("/compromis_recettes", methods=["POST"])
+def compromis_recettes():
+    """
+    Fournit pour deux recettes les données nécessaires au tracé
+    d'un graphe de compromis (Spearmint vs White Liner, etc.).
+    JSON attendu :
+      { "recetteA": "Nom A", "recetteB": "Nom B" }
+    Réponse :
+      {
+        "recetteA": "Nom A",
+        "recetteB": "Nom B",
+        "data": [
+          {
+            "matiere": "<matiere>",
+            "pctA": float,     # pourcentage dans A
+            "pctB": float,     # pourcentage dans B
+            "stock": float     # stock actuel
+          },
+          ...
+        ]
+      }
+
+    Mode frontière (calcul côté serveur, prêt à tracer) :
+      { "recetteA": "Nom A", "recetteB": "Nom B", "mode": "frontiere" }
+      ou, pour k recettes :
+      { "recettes": ["A", "B", "C"], "parts": [1, 1],   # B et C à parts égales
+        "mode": "frontiere", "points": 50 }              # points : optionnel
+    En abscisse la première recette, en ordonnée la masse maximale du
+    mélange des suivantes (dans les proportions 'parts', égales par défaut).
+    Sans 'points', la frontière est donnée par ses ruptures exactes.
+    Réponse ajoutée :
+      "frontiere": {
+        "axe": "A", "groupe": { "B": 0.5, "C": 0.5 },   # parts normalisées
+        "segments": [ {x0, y0, x1, y1, limitante} ]      # mode exact
+        | "points": [ {x, y, limitante} ]                # mode échantillonné
+      }
+    """
+    data    = request.get_json() or {}
+    noms    = data.get("recettes") or [data.get("recetteA"), data.get("recetteB")]
+    mode    = data.get("mode")
+    if not isinstance(noms, list) or len(noms) < 2 or not all(isinstance(n, str) and n for n in noms):
+        return jsonify({"message": "Au moins deux recettes sont requises."}), 400
+    if len(set(noms)) != len(noms):
+        return jsonify({"message": "Une recette est présente plusieurs fois."}), 400
+
+    # validation : compositions lues dans l'index, stock en une requête
+    index, stock_ids = index_compositions.charger(noms)
+    missing = index.absentes(noms)
+    if missing:
+        return jsonify({"message": f"Recette(s) introuvable(s) : {', '.join(missing)}"}), 404
+
+    noms_mat, besoins, stock = index.matrice(noms, stock_ids)
+
+    # construire la liste data (toutes les matières des recettes, en %)
+    result = []
+    for mat, ligne, s_mat in zip(noms_mat, besoins, stock):
+        pcts = [round(v * 100, 2) for v in ligne]
+        # On n'inclut que les matières réellement utilisées
+        if not any(pcts):
+            continue
+        entry = {"matiere": mat, "stock": round(s_mat, 2)}
+        if len(noms) == 2:
+            entry["pctA"], entry["pctB"] = pcts
+        else:
+            entry["pct"] = dict(zip(noms, pcts))
+        result.append(entry)
+
+    reponse = {"recettes": noms, "data": result}
+    if len(noms) == 2:
+        reponse["recetteA"], reponse["recetteB"] = noms
+
+    if mode == "frontiere":
+        parts = data.get("parts") or [1.0] * (len(noms) - 1)
+        try:
+            parts = [float(p) for p in parts]
+            points = int(data["points"]) if data.get("points") is not None else None
+        except (TypeError, ValueError):
+            return jsonify({"message": "'parts' et 'points' doivent être numériques."}), 400
+        if len(parts) != len(noms) - 1 or any(p < 0 for p in parts) or not sum(parts):
+            return jsonify({"message": "'parts' : une valeur ≥ 0 par recette en ordonnée, non toutes nulles."}), 400
+        if points is not None and not 2 <= points <= 1000:
+            return jsonify({"message": "'points' doit être compris entre 2 et 1000."}), 400
+
+        besoins_axe = [ligne[0] for ligne in besoins]
+        besoins_groupe = besoins_melange(besoins, range(1, len(noms)), parts)
+        total_parts = sum(parts)
+        front = {
+            "axe": noms[0],
+            "groupe": {n: round(p / total_parts, 4) for n, p in zip(noms[1:], parts)}
+        }
+        try:
+            if points:
+                front["points"] = [
+                    {"x": round(p["x"], 2), "y": round(p["y"], 2), "limitante": noms_mat[p["limitante"]]}
+                    for p in frontiere_echantillonnee(besoins_axe, besoins_groupe, stock, points)
+                ]
+            else:
+                front["segments"] = [
+                    {
+                        "x0": round(sg["x0"], 2), "y0": round(sg["y0"], 2),
+                        "x1": round(sg["x1"], 2), "y1": round(sg["y1"], 2),
+                        "limitante": noms_mat[sg["limitante"]]
+                    }
+                    for sg in frontiere_exacte(besoins_axe, besoins_groupe, stock)
+                ]
+        except FrontiereImpossible as e:
+            return jsonify({"message": str(e)}), 400
+        reponse["frontiere"] = front
+
+    return jsonify(reponse), 200
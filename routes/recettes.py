@@ -0,0 +1,249 @@
+"""
+Recettes : création, import en masse (route et commande), catalogue,
+suppression.
+"""
+import io
+import json
+import logging
+
+import click
+from flask import Blueprint, request, jsonify
+
+from extensions import db
+from models import Recette, Composition, Matiere
+from cache import en_cache, invalider
+from idempotence import idempotent
+from recettes import valider_recette, importer_recettes
+from catalogue import charger_catalogue, requete_catalogue, iterer_catalogue
+from achats import lignes_jsonl, flux_texte
+from flux_json import mode_flux, reponse_flux, TAILLE_PAQUET
+from unites import pourcent
+import changements
+import index_compositions
+
+log = logging.getLogger("glaze_api")
+
+bp = Blueprint("recettes", __name__, cli_group=None)
+
+
+# ==========================================
+#   ROUTE AJOUTER RECETTES
+# ==========================================
+
+@bp.route("/ajouter_recette", methods=["POST"])
+@idempotent
+def ajouter_recette():
+    """
+    Crée une nouvelle recette avec ses compositions.
+    Si une matière (base ou oxyde) n'existe pas, elle est créée automatiquement
+    avec un stock à 0.
+    Accepte en plus deux liens optionnels :
+      - description_url       : URL vers la description web de la recette
+      - production_doc_url    : URL Google Doc journalisant la production
+    """
+    # ─── 1. Lecture et validation du payload JSON (voir recettes.py) ─────────
+    data = request.get_json() or {}
+    try:
+        rec = valider_recette(data)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    nom                 = rec["nom"]
+    base                = rec["base"]
+    oxydes              = rec["oxydes"]
+    description_url     = rec["description_url"]
+    production_doc_url  = rec["production_doc_url"]
+
+    # ─── 2. Nom unique ────────────────────────────────────────────────────────
+    if Recette.query.filter_by(nom=nom).first():
+        return jsonify({"message": f"Recette '{nom}' existe déjà."}), 400
+
+    # ─── 3. Création de l'objet Recette ────────────────────────────────────────
+    recette = Recette(
+        nom=nom,
+        description_url=description_url,
+        production_doc_url=production_doc_url
+    )
+    db.session.add(recette)
+    db.session.flush()  # pour obtenir recette.id immédiatement
+
+    # ─── 4. Utilitaire : récupérer ou créer une Matiere ──────────────────────
+    def get_or_create_matiere(nom_mat, type_matiere):
+        key = nom_mat.strip().lower()
+        mat = Matiere.query.filter_by(nom=key).first()
+        if not mat:
+            mat = Matiere(nom=key, type=type_matiere, unite="g", quantite_mg=0)
+            db.session.add(mat)
+            db.session.flush()  # pour obtenir mat.id
+            inserees.append(mat)
+        return mat
+
+    created = []  # liste des matières créées automatiquement
+    inserees = []  # matières réellement insérées par cette requête (flux des changements)
+    lignes_index = []  # (matiere_id, nom, type, ppm) pour l'index des compositions
+    catalogue = {"base": {}, "oxydes": {}}  # compositions au format de GET /recettes
+
+    # ─── 5. Ajout des compositions de base ────────────────────────────────────
+    for nom_mat, pct in base.items():
+        mat = get_or_create_matiere(nom_mat, "base")
+        if mat.quantite_mg == 0 and mat.nom not in created:
+            created.append(mat.nom)
+        comp = Composition(
+            recette_id      = recette.id,
+            matiere_id      = mat.id,
+            type            = "base",
+            pourcentage_ppm = pct
+        )
+        db.session.add(comp)
+        lignes_index.append((mat.id, mat.nom, mat.type, pct))
+        catalogue["base"][mat.nom] = pourcent(pct)
+
+    # ─── 6. Ajout des compositions d'oxydes ─────────────────────────────────
+    for nom_mat, pct in oxydes.items():
+        mat = get_or_create_matiere(nom_mat, "oxyde")
+        if mat.quantite_mg == 0 and mat.nom not in created:
+            created.append(mat.nom)
+        comp = Composition(
+            recette_id      = recette.id,
+            matiere_id      = mat.id,
+            type            = "oxyde",
+            pourcentage_ppm = pct
+        )
+        db.session.add(comp)
+        lignes_index.append((mat.id, mat.nom, mat.type, pct))
+        catalogue["oxydes"][mat.nom] = pourcent(pct)
+
+    # ─── 7. Enregistrement final en base ─────────────────────────────────────
+    rec_id = recette.id
+    index_compositions.noter_modification(
+        lambda index: index.ajouter_recette(rec_id, nom, lignes_index))
+    for mat in inserees:
+        changements.publier({"type": "matiere", "action": "ajout", "nom": mat.nom, "unite": mat.unite,
+                             "quantite": 0.0, "type_matiere": mat.type})
+    changements.publier({"type": "recette", "action": "ajout", "recette": {
+        "nom": nom, **catalogue,
+        "description_url": description_url, "production_doc_url": production_doc_url
+    }})
+    invalider()
+    db.session.commit()
+
+    # ─── 8. Construction de la réponse ───────────────────────────────────────
+    return jsonify({
+        "message":               f"Recette '{nom}' créée avec {len(base)} base(s) et {len(oxydes)} oxyde(s).",
+        "matières_créées":       created,
+        "description_url":       description_url,
+        "production_doc_url":    production_doc_url
+    }), 201
+
+
+# ==========================================
+#   IMPORT DE RECETTES EN MASSE
+# ==========================================
+@bp.route("/recettes/import", methods=["POST"])
+@idempotent
+def importer_recettes_route():
+    """
+    Importe un carnet de recettes en une transaction.
+    Corps : tableau JSON de recettes (même format que /ajouter_recette)
+    ou flux JSONL (Content-Type application/x-ndjson), une recette par ligne.
+    Réponse :
+      { "recettes": n, "importees": [noms], "matieres_creees": [noms],
+        "erreurs": [ {"ligne", "nom", "message"} ] }
+    Les recettes en erreur (validation, nom déjà pris) sont ignorées,
+    les autres sont importées.
+    """
+    if request.mimetype == "application/x-ndjson":
+        lignes = lignes_jsonl(flux_texte(request.stream))
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({"message": "Le corps doit être un tableau JSON de recettes ou un flux JSONL."}), 400
+        lignes = enumerate(data, start=1)
+
+    try:
+        rapport = importer_recettes(lignes)
+        if rapport["importees"]:
+            changements.publier({"type": "resynchroniser", "cible": "tout"})
+            invalider()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Erreur /recettes/import")
+        return jsonify({"error": str(e)}), 500
+
+    status = 201 if rapport["importees"] else 400
+    return jsonify(rapport), status
+
+
+@bp.cli.command("importer-recettes")
+@click.argument("fichier", default="recettes.json")
+def importer_recettes_commande(fichier):
+    """flask --app app importer-recettes [recettes.json] : tableau JSON ou JSONL."""
+    with open(fichier, encoding="utf-8") as f:
+        contenu = f.read()
+    if contenu.lstrip().startswith("["):
+        lignes = enumerate(json.loads(contenu), start=1)
+    else:
+        lignes = lignes_jsonl(io.StringIO(contenu))
+    rapport = importer_recettes(lignes)
+    if rapport["importees"]:
+        invalider()
+    db.session.commit()
+    print(f"{len(rapport['importees'])}/{rapport['recettes']} recette(s) importée(s), "
+          f"{len(rapport['matieres_creees'])} matière(s) créée(s).")
+    for e in rapport["erreurs"]:
+        print(f"  ligne {e['ligne']} ({e['nom']}) : {e['message']}")
+
+
+# ==========================================
+#              AFFICHE LES RECETTES
+# ==========================================
+
+@bp.route("/recettes", methods=["GET"])
+@en_cache
+def get_recettes():
+    """
+    Retourne la liste de toutes les recettes,
+    avec leurs compositions (bases / oxydes) et les URLs optionnelles.
+    Envoi en flux possible (Accept: application/x-ndjson ou ?stream=1).
+    """
+    mode = mode_flux()
+    if mode:
+        # même requête, lue par paquets et regroupée au fil de l'eau
+        return reponse_flux(mode, iterer_catalogue(requete_catalogue().yield_per(TAILLE_PAQUET)))
+
+    # Une seule requête jointe : le nombre d'allers-retours SQL reste
+    # constant quel que soit le nombre de recettes (pas de chargement
+    # paresseux de r.compositions ni de comp.matiere).
+    result = charger_catalogue()
+
+    return jsonify(result), 200
+
+
+# ==========================================
+#   DELETE RECETTE
+# ==========================================
+
+@bp.route("/recettes/<string:nom>", methods=["DELETE"])
+@idempotent
+def delete_recette(nom):
+    """
+    Supprime la recette identifiée par son nom et toutes ses compositions associées.
+    Retourne une erreur 404 si la recette n'existe pas.
+    """
+    # 1) Recherche de la recette
+    recette = Recette.query.filter_by(nom=nom).first()
+    if not recette:
+        return jsonify({"message": f"Recette '{nom}' introuvable."}), 404
+
+    # 2) Suppression des compositions liées (sécurité si pas de cascade SQLAlchemy)
+    Composition.query.filter_by(recette_id=recette.id).delete()
+
+    # 3) Suppression de la recette elle-même
+    db.session.delete(recette)
+    index_compositions.noter_modification(lambda index: index.supprimer_recette(nom))
+    changements.publier({"type": "recette", "action": "suppression", "nom": nom})
+    invalider()
+    db.session.commit()
+
+    # 4) Réponse
+    return jsonify({"message": f"Recette '{nom}' supprimée avec succès."}), 200
@@ -0,0 +1,268 @@
+"""
+Matières et stock : création et suppression de matières, stock courant ou
+passé, ajustements et photos du journal, réapprovisionnement.
+"""
+from flask import Blueprint, request, jsonify
+
+from extensions import db
+from models import (
+    Matiere, Composition, DepenseMensuelle, ConsommationMensuelle, PrevisionMatiere, CoutMatiere
+)
+from cache import en_cache, invalider
+from idempotence import idempotent
+from flux_json import mode_flux, reponse_flux, TAILLE_PAQUET
+from production import verrouiller_matieres, ajuster_stock
+from registre import enregistrer_mouvements, stock_a_la_date, prendre_instantanes, lire_instant
+from previsions import liste_reappro, HORIZON_DEFAUT
+from couts import VERSION_COUTS
+from unites import mg, grammes
+import changements
+import index_compositions
+import seuils
+
+bp = Blueprint("stock", __name__, cli_group=None)
+
+
+# ==========================================
+#   ROUTE AJOUTER MATIERES
+# ==========================================
+@bp.route("/ajouter_matiere", methods=["POST"])
+@idempotent
+def ajouter_matiere():
+    data = request.get_json()
+    # on normalise nom et type
+    nom = data.get("nom", "").strip().lower()
+    mat_type = data.get("type", "base").strip().lower()
+    unite = data.get("unite", "g").strip()
+    # validation
+    if not nom:
+        return jsonify({"message": "Le nom est requis."}), 400
+    if mat_type not in ["base", "oxyde"]:
+        return jsonify({"message": "Type invalide. Utilisez 'base' ou 'oxyde'."}), 400
+    # détection d'existence en minuscules
+    existante = Matiere.query.filter_by(nom=nom).first()
+    if existante:
+        return jsonify({"message": "La matière existe déjà."}), 400
+    # création
+    nouvelle = Matiere(nom=nom, type=mat_type, unite=unite, quantite_mg=0)
+    db.session.add(nouvelle)
+    changements.publier({"type": "matiere", "action": "ajout", "nom": nom, "type_matiere": mat_type,
+                         "unite": unite, "quantite": 0.0})
+    invalider()
+    db.session.commit()
+    return jsonify({"message": f"Matière '{nom}' ajoutée avec succès."}), 201
+
+
+# ==========================================
+#              AFFICHE LE STOCK
+# ==========================================
+
+@bp.route("/stock", methods=["GET"])
+@en_cache
+def consulter_stock():
+    """
+    Stock courant, ou stock à une date passée avec ?at=AAAA-MM-JJ (fin de
+    journée) ou ?at=AAAA-MM-JJTHH:MM:SS, reconstruit depuis le journal.
+    Le stock courant peut être envoyé en flux (Accept: application/x-ndjson
+    ou ?stream=1), voir flux_json.py.
+    """
+    if request.args.get("at"):
+        try:
+            at = lire_instant(request.args["at"])
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        return jsonify(stock_a_la_date(at)), 200
+
+    mode = mode_flux()
+    if mode:
+        table_seuils = seuils.table()
+        return reponse_flux(mode, sections=[
+            ("bases", _stock_par_type("base", table_seuils)),
+            ("oxydes", _stock_par_type("oxyde", table_seuils))
+        ])
+
+    # 1. Requête : toutes les matières triées par quantité décroissante
+    matieres = Matiere.query.order_by(Matiere.quantite_mg.desc()).all()
+    table_seuils = seuils.table()
+
+    # 2. Séparation et formatage (couleur selon les seuils de la matière)
+    bases = []
+    oxydes = []
+    for m in matieres:
+        quantite = grammes(m.quantite_mg)
+        entry = {
+            "nom": m.nom,
+            "type": m.type,
+            "quantite": quantite,
+            "unite": m.unite,  # ← On ajoute l’unité (par défaut "g")
+            "couleur": seuils.couleur(m.quantite_mg, table_seuils.pour(m.id, m.type))
+        }
+        if m.type == "base":
+            bases.append(entry)
+        else:
+            oxydes.append(entry)
+
+
+    # 3. Retour JSON
+    return jsonify({
+        "bases": bases,
+        "oxydes": oxydes
+    }), 200
+
+
+def _stock_par_type(type_matiere, table_seuils):
+    """Matières d'un type, lues par paquets (mode flux de /stock)."""
+    rows = (
+        db.session.query(Matiere.id, Matiere.nom, Matiere.type, Matiere.quantite_mg, Matiere.unite)
+        .filter(Matiere.type == type_matiere)
+        .order_by(Matiere.quantite_mg.desc())
+        .yield_per(TAILLE_PAQUET)
+    )
+    for mat_id, nom, m_type, quantite, unite in rows:
+        yield {
+            "nom": nom, "type": m_type, "quantite": grammes(quantite), "unite": unite,
+            "couleur": seuils.couleur(quantite, table_seuils.pour(mat_id, m_type))
+        }
+
+
+# ==========================================
+#   JOURNAL DE STOCK : AJUSTEMENTS ET PHOTOS
+# ==========================================
+@bp.route("/stock/ajustement", methods=["POST"])
+@idempotent
+def ajuster_stock_route():
+    """
+    Corrige le stock d'une matière (inventaire, casse...).
+    JSON attendu :
+      { "nom": "silice", "quantite": 1234.5, "motif": "inventaire" }   # stock constaté
+      ou { "nom": "silice", "delta": -50, "motif": "casse" }           # variation
+    Le mouvement est inscrit au journal (type 'ajustement').
+    """
+    data = request.get_json() or {}
+    key = (data.get("nom") or "").strip().lower()
+    motif = (data.get("motif") or "").strip() or None
+    if not key or (data.get("quantite") is None) == (data.get("delta") is None):
+        return jsonify({"message": "Champs requis : 'nom' et soit 'quantite', soit 'delta'."}), 400
+    try:
+        valeur = mg(data["quantite"] if data.get("quantite") is not None else data["delta"])
+    except ValueError:
+        return jsonify({"message": "La valeur doit être un nombre."}), 400
+
+    matiere = Matiere.query.filter_by(nom=key).first()
+    if not matiere:
+        return jsonify({"message": f"Matière '{key}' introuvable."}), 404
+
+    # lecture sous verrou pour calculer l'écart exact
+    actuel = verrouiller_matieres([matiere.id])[matiere.id]
+    delta = valeur - actuel if data.get("quantite") is not None else valeur
+    ajuster_stock({matiere.id: delta})
+    enregistrer_mouvements("ajustement", {matiere.id: delta}, reference=motif)
+    changements.publier({"type": "stock", "matieres": [
+        {"nom": key, "type": matiere.type, "quantite": grammes(actuel + delta), "delta": grammes(delta)}
+    ]})
+    invalider()
+    db.session.commit()
+
+    return jsonify({
+        "message": f"Stock de '{key}' ajusté de {grammes(delta)}g.",
+        "stock_restant": grammes(actuel + delta)
+    }), 200
+
+
+@bp.route("/stock/instantanes", methods=["POST"])
+@idempotent
+def prendre_instantanes_route():
+    """
+    Photographie le stock de chaque matière ayant bougé (à planifier
+    régulièrement, ex. chaque nuit, pour borner le coût de /stock?at=).
+    Réponse : { "instantanes": n, "ecarts": [ {matiere, quantite, journal} ] }
+    """
+    nb, ecarts = prendre_instantanes()
+    db.session.commit()
+    return jsonify({"instantanes": nb, "ecarts": ecarts}), 201
+
+
+@bp.cli.command("instantanes")
+def instantanes_commande():
+    """flask --app app instantanes : photo du stock (tâche planifiée)."""
+    nb, ecarts = prendre_instantanes()
+    db.session.commit()
+    print(f"{nb} photo(s) de stock prise(s).")
+    for e in ecarts:
+        print(f"  écart {e['matiere']} : stock {e['quantite']} / journal {e['journal']}")
+
+
+# ==========================================
+#   RÉAPPROVISIONNEMENT
+# ==========================================
+@bp.route("/reappro", methods=["GET"])
+def reappro():
+    """
+    Liste d'achats classée par urgence (voir previsions.py).
+    Query string :
+      - horizon : jours (défaut 30) — matières en rupture avant cet horizon
+      - tous=1  : toutes les matières, même sans besoin
+      - type    : 'base' ou 'oxyde'
+    Réponse :
+      { "horizon": n, "matieres": [ { nom, type, stock, taux_journalier,
+          delai_jours, stock_securite, point_de_commande, jours_avant_rupture,
+          jours_avant_commande, a_commander, quantite_suggeree } ] }
+    Pas de cache de réponse : les prévisions évoluent avec le temps.
+    """
+    try:
+        horizon = float(request.args.get("horizon", HORIZON_DEFAUT))
+    except ValueError:
+        return jsonify({"message": "'horizon' doit être un nombre de jours."}), 400
+    type_matiere = (request.args.get("type") or "").strip().lower() or None
+    if type_matiere not in (None, "base", "oxyde"):
+        return jsonify({"message": "Type invalide. Utilisez 'base' ou 'oxyde'."}), 400
+    tous = request.args.get("tous") in ("1", "true", "oui")
+    return jsonify({
+        "horizon": horizon,
+        "matieres": liste_reappro(horizon, tous, type_matiere)
+    }), 200
+
+
+# ==========================================
+#   DELETE MATIERE
+# ==========================================
+
+@bp.route("/matieres/<string:nom>", methods=["DELETE"])
+@idempotent
+def delete_matiere(nom):
+    """
+    Supprime la matière nommée <nom> si elle n'est
+    plus utilisée dans aucune recette.
+    Retourne 404 si non trouvée, 400 si encore référencée.
+    """
+    # Normalisation du nom
+    key = nom.strip().lower()
+    # Recherche de la matière
+    matiere = Matiere.query.filter_by(nom=key).first()
+    if not matiere:
+        return jsonify({"message": f"Matière '{key}' introuvable."}), 404
+
+    # Vérification des références en Composition
+    count = Composition.query.filter_by(matiere_id=matiere.id).count()
+    if count > 0:
+        return jsonify({
+            "message": (
+                f"Matière '{key}' utilisée dans {count} recette(s), "
+                "impossible de supprimer."
+            )
+        }), 400
+
+    # Suppression (avec ses agrégats mensuels et son coût) ; le journal garde la sortie du stock restant
+    enregistrer_mouvements("suppression", {matiere.id: -(matiere.quantite_mg or 0)}, reference=f"matiere:{key}")
+    DepenseMensuelle.query.filter_by(matiere_id=matiere.id).delete()
+    ConsommationMensuelle.query.filter_by(matiere_id=matiere.id).delete()
+    PrevisionMatiere.query.filter_by(matiere_id=matiere.id).delete()
+    CoutMatiere.query.filter_by(matiere_id=matiere.id).delete()
+    invalider(VERSION_COUTS)
+    mat_id = matiere.id
+    db.session.delete(matiere)
+    index_compositions.noter_modification(lambda index: index.supprimer_matiere(mat_id))
+    changements.publier({"type": "matiere", "action": "suppression", "nom": key, "type_matiere": matiere.type})
+    invalider()
+    db.session.commit()
+    return jsonify({"message": f"Matière '{key}' supprimée avec succès."}), 200
@@ -0,0 +1,142 @@
+"""
+Seuils de stock (orange, rouge, noir) en mg, comparés au stock en mg
+(l'API les reçoit et les renvoie en grammes, voir unites.py).
+
+- Par type de matière : table seuil_defaut ; un type absent garde les
+  valeurs d'origine (DEFAUTS).
+- Par matière : colonnes seuil_orange_mg / seuil_rouge_mg / seuil_noir_mg
+  de matiere, NULL = valeur du type.
+
+Les deux sont gardés en mémoire (TableSeuils) et rechargés quand le
+compteur "seuils" change : chaque écriture des seuils l'incrémente.
+"""
+import threading
+
+from flask import g, has_request_context
+
+from extensions import db
+from models import Matiere, SeuilDefaut
+from cache import lire_version
+from unites import mg
+
+VERSION_SEUILS = "seuils"
+
+# Valeurs d'origine (avant seuils configurables) : 300 / 200 / 0 g et 30 / 20 / 0 g
+DEFAUTS = {
+    "base": (300_000, 200_000, 0),
+    "oxyde": (30_000, 20_000, 0),
+}
+NIVEAUX = ("orange", "rouge", "noir")
+
+_table = None
+_verrou = threading.Lock()
+
+
+class TableSeuils:
+    """Seuils par type et par matière, à une version donnée."""
+
+    def __init__(self, version, par_type, par_matiere):
+        self.version = version
+        self.par_type = par_type        # type → (orange, rouge, noir)
+        self.par_matiere = par_matiere  # matiere_id → (orange|None, rouge|None, noir|None)
+
+    def du_type(self, type_matiere):
+        return self.par_type.get(type_matiere) or DEFAUTS.get(type_matiere) or DEFAUTS["oxyde"]
+
+    def pour(self, matiere_id, type_matiere):
+        """(orange, rouge, noir) effectifs d'une matière."""
+        defaut = self.du_type(type_matiere)
+        propres = self.par_matiere.get(matiere_id)
+        if not propres:
+            return defaut
+        return tuple(p if p is not None else d for p, d in zip(propres, defaut))
+
+
+def couleur(reste, seuils):
+    """Couleur du stock restant `reste` (mg) pour des seuils (orange, rouge, noir) en mg."""
+    seuil_orange, seuil_rouge, seuil_noir = seuils
+    if reste < seuil_noir:
+        return "noir"
+    if reste < seuil_rouge:
+        return "rouge"
+    if reste < seuil_orange:
+        return "orange"
+    return "vert"
+
+
+def _charger(version):
+    par_type = {
+        s.type: (s.orange_mg, s.rouge_mg, s.noir_mg)
+        for s in SeuilDefaut.query.all()
+    }
+    par_matiere = {
+        mat_id: (o, r, n)
+        for mat_id, o, r, n in db.session.query(
+            Matiere.id, Matiere.seuil_orange_mg, Matiere.seuil_rouge_mg, Matiere.seuil_noir_mg
+        ).filter(db.or_(
+            Matiere.seuil_orange_mg.isnot(None),
+            Matiere.seuil_rouge_mg.isnot(None),
+            Matiere.seuil_noir_mg.isnot(None)
+        ))
+    }
+    return TableSeuils(version, par_type, par_matiere)
+
+
+def table(version=None):
+    """
+    Seuils à jour. La version du compteur est relue sauf si elle vient
+    d'être lue dans la même requête (index_compositions.charger la place
+    dans flask.g avec le stock, sans requête supplémentaire).
+    """
+    global _table
+    if version is None and has_request_context():
+        version = g.pop("version_seuils", None)
+    if version is None:
+        version = lire_version(VERSION_SEUILS)
+    courante = _table
+    if courante is not None and courante.version == version:
+        return courante
+    nouvelle = _charger(version)
+    with _verrou:
+        _table = nouvelle
+    return nouvelle
+
+
+def en_memoire():
+    """Vrai si les seuils ont déjà été chargés dans ce process."""
+    return _table is not None
+
+
+def lire_seuils(data, partiel=False):
+    """
+    Valide { orange, rouge, noir } (grammes ≥ 0). Avec `partiel`, les
+    niveaux absents sont ignorés et null efface une valeur propre.
+    Retourne { niveau: mg | None } ; lève ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Corps JSON attendu : { orange, rouge, noir }.")
+    valeurs = {}
+    for niveau in NIVEAUX:
+        if niveau not in data:
+            if not partiel:
+                raise ValueError("Champs requis : orange, rouge, noir.")
+            continue
+        v = data[niveau]
+        if v is None and partiel:
+            valeurs[niveau] = None
+            continue
+        try:
+            v = mg(v)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{niveau}' doit être un nombre.")
+        if v < 0:
+            raise ValueError(f"'{niveau}' doit être positif ou nul.")
+        valeurs[niveau] = v
+    return valeurs
+
+
+def verifier_ordre(seuils):
+    """orange ≥ rouge ≥ noir, sinon ValueError."""
+    orange, rouge, noir = seuils
+    if not orange >= rouge >= noir:
+        raise ValueError("Les seuils doivent vérifier orange ≥ rouge ≥ noir.")
@@ -0,0 +1,196 @@
+import heapq
+
+from seuils import couleur
+from unites import MG_PAR_KG, PPM_TOTAL, euros, grammes, mg, part
+
+# gravité des couleurs, de la meilleure à la pire
+RANGS_COULEUR = {"vert": 0, "orange": 1, "rouge": 2, "noir": 3}
+COULEURS = list(RANGS_COULEUR)
+
+
+def simuler(recette, masse_mg, seuils, couts=None):
+    """
+    Simulation en mémoire d'une production de `masse_mg` milligrammes de
+    `recette` (telle que renvoyée par IndexCompositions.recettes), avec les
+    seuils de `seuils` (seuils.TableSeuils).
+    Avec `couts` (couts.TableCouts) : coût de chaque matière ("cout") et
+    de la production (cout_total, cout_kg, matieres_sans_prix), en euros.
+    Calcul en mg entiers ; retourne le même dict que la route
+    /simuler_production (masses en grammes).
+    """
+    # une matière présente plusieurs fois : la dernière ligne l'emporte
+    comps = {}
+    for c in recette["compositions"]:
+        comps[c["matiere"]] = c
+
+    details = []
+    prod_max = None
+    any_black = False
+
+    for nom_mat, c in comps.items():
+        requis = part(masse_mg, c["ppm"])
+
+        if c["matiere_id"] is None:
+            # matière absente → noir
+            details.append({
+                "matiere": nom_mat,
+                "quantite_necessaire": grammes(requis),
+                "disponible": 0,
+                "reste_apres_production": 0,
+                "statut": "**INSUFFISANT** (absente)",
+                "couleur": "noir",
+                "manquant": grammes(requis)
+            })
+            any_black = True
+            continue
+
+        dispo = c["stock_mg"] or 0
+        reste = dispo - requis
+        # déterminer statut
+        coul = couleur(reste, seuils.pour(c["matiere_id"], c["type_matiere"]))
+        if coul == "noir":
+            statut = "**INSUFFISANT**"
+            any_black = True
+        else:
+            statut = "**OK**"
+
+        # masse maximale que permet cette matière
+        if requis > 0:
+            maximum = max(dispo, 0) * PPM_TOTAL // c["ppm"]
+            prod_max = maximum if prod_max is None else min(prod_max, maximum)
+
+        details.append({
+            "matiere": nom_mat,
+            "quantite_necessaire": grammes(requis),
+            "disponible": grammes(dispo),
+            "reste_apres_production": grammes(reste),
+            "statut": statut,
+            "couleur": coul,
+            "manquant": grammes(max(0, requis - dispo))
+        })
+
+    resultat = {
+        "recette": recette["nom"],
+        "demande": grammes(masse_mg),
+        "production_possible": not any_black,
+        "production_maximale_possible": grammes(prod_max),
+        "details": details
+    }
+    if couts is not None:
+        # une ligne de details par matière, dans l'ordre de comps
+        total, sans_prix = 0.0, []
+        for d, c in zip(details, comps.values()):
+            cout = None
+            if c["matiere_id"] is not None:
+                cout = couts.cout(c["matiere_id"], part(masse_mg, c["ppm"]))
+            if cout is None:
+                sans_prix.append(d["matiere"])
+                d["cout"] = None
+            else:
+                total += cout
+                d["cout"] = euros(round(cout))
+        # centimes non arrondis cumulés, arrondis une seule fois
+        resultat["cout_total"] = euros(round(total))
+        resultat["cout_kg"] = euros(round(total * MG_PAR_KG / masse_mg)) if masse_mg > 0 else None
+        resultat["matieres_sans_prix"] = sans_prix
+    return resultat
+
+
+def besoins_cumules(resultats):
+    """
+    Additionne les besoins de plusieurs simulations par matière et les
+    compare au stock disponible (les simulations restent indépendantes).
+    Les cumuls sont faits en mg entiers.
+    """
+    cumul = {}
+    for res in resultats:
+        for d in res["details"]:
+            entry = cumul.setdefault(d["matiere"], [0, mg(d["disponible"])])
+            entry[0] += mg(d["quantite_necessaire"])
+
+    return {
+        mat: {
+            "quantite_necessaire": grammes(requis),
+            "disponible": grammes(dispo),
+            "manquant": grammes(max(0, requis - dispo))
+        }
+        for mat, (requis, dispo) in cumul.items()
+    }
+
+
+def faisabilite(index, stock, seuils, masse_mg=None):
+    """
+    Pour chaque recette de l'index (index_compositions.IndexCompositions),
+    en un seul passage sur ses compositions (coût proportionnel au nombre
+    de compositions, aucune requête) :
+      - production_maximale_possible : masse maximale produisible avec
+        `stock` ({ matiere_id: quantite_mg }, toutes les matières) ;
+      - matiere_limitante : la matière qui fixe ce maximum ;
+      - avec `masse_mg` : couleur (la pire des matières) et
+        production_possible pour cette production, comme /simuler_production.
+    Une matière absente de la table matiere limite la recette à 0 (noir).
+    Arithmétique entière (mg, ppm) : mêmes résultats que simuler().
+    """
+    # par colonne (matière) : stock et seuils, calculés une seule fois
+    dispo = [None if mat_id is None else (stock.get(mat_id) or 0) for mat_id in index.id_matieres]
+    if masse_mg is not None:
+        seuils_col = [
+            None if mat_id is None else seuils.pour(mat_id, type_mat)
+            for mat_id, type_mat in zip(index.id_matieres, index.types)
+        ]
+
+    colonnes, pourcentages, debut = index.colonnes, index.pourcentages, index.debut
+    resultats = []
+    for nom, r in index.lignes.items():
+        maximum, limitante, rang = None, None, 0
+        for k in range(debut[r], debut[r + 1]):
+            col, pct = colonnes[k], pourcentages[k]
+            d = dispo[col]
+            if d is None:
+                maximum, limitante, rang = 0, col, 3
+                continue
+            if pct > 0:
+                m = max(d, 0) * PPM_TOTAL // pct
+                if maximum is None or m < maximum:
+                    maximum, limitante = m, col
+            if masse_mg is not None and rang < 3:
+                # couleur() en ligne : rang 3 noir, 2 rouge, 1 orange, 0 vert
+                orange, rouge, noir = seuils_col[col]
+                reste = d - (masse_mg * pct + PPM_TOTAL // 2) // PPM_TOTAL
+                if reste < noir:
+                    rang = 3
+                elif reste < rouge:
+                    rang = max(rang, 2)
+                elif reste < orange:
+                    rang = max(rang, 1)
+
+        ligne = {
+            "recette": nom,
+            "production_maximale_possible": grammes(maximum),
+            "matiere_limitante": index.noms_matieres[limitante] if limitante is not None else None
+        }
+        if masse_mg is not None:
+            ligne["couleur"] = COULEURS[rang]
+            ligne["production_possible"] = rang < 3
+        resultats.append(ligne)
+    return resultats
+
+
+# clés de tri de faisabilite() et sens par défaut (True = décroissant)
+TRIS = {
+    "masse": (lambda l: l["production_maximale_possible"], True),
+    "nom": (lambda l: l["recette"], False),
+    "couleur": (lambda l: (RANGS_COULEUR[l.get("couleur", "vert")], -l["production_maximale_possible"]), False),
+}
+
+
+def classer(lignes, tri="masse", decroissant=None, limite=None):
+    """
+    Trie les lignes de faisabilite() ; avec `limite`, ne garde que les
+    `limite` premières (sélection partielle, sans trier toute la liste).
+    """
+    cle, defaut = TRIS[tri]
+    decroissant = defaut if decroissant is None else decroissant
+    if limite is not None and limite < len(lignes):
+        return (heapq.nlargest if decroissant else heapq.nsmallest)(limite, lignes, key=cle)
+    return sorted(lignes, key=cle, reverse=decroissant)
@@ -0,0 +1,106 @@
+"""
+Fixtures communes : une application par test (create_app) sur une base
+SQLite jetable, migrée comme en production, et quelques raccourcis pour
+peupler la base par l'API.
+"""
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+from migrations import appliquer_migrations
+import cache
+import couts
+import index_compositions
+import seuils
+
+
+@pytest.fixture
+def creer_app(tmp_path, monkeypatch):
+    """
+    creer_app(nom="glaze.db") : application sur la base SQLite tmp_path/nom
+    (créée si besoin), migrée par appliquer_migrations().
+    """
+    # les caches du process sont indexés sur des compteurs en base, qui
+    # repartent de 0 avec chaque nouvelle base : on repart à vide
+    monkeypatch.setattr(index_compositions, "_index", None)
+    monkeypatch.setattr(seuils, "_table", None)
+    monkeypatch.setattr(couts, "_table", None)
+    cache.vider_cache()
+    creees = []
+
+    def creer(nom="glaze.db"):
+        application = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / nom}",
+            "TESTING": True,
+            "FLUX_BACKEND": "memoire",
+        })
+        with application.app_context():
+            appliquer_migrations()
+            db.session.remove()
+        creees.append(application)
+        return application
+
+    yield creer
+    for application in creees:
+        with application.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(creer_app):
+    return creer_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def compter_sql(app):
+    """
+    Gestionnaire de contexte : `with compter_sql() as requetes:` liste les
+    instructions SQL exécutées dans le bloc.
+    """
+    @contextlib.contextmanager
+    def compter():
+        requetes = []
+
+        def avant(conn, cursor, statement, parameters, context, executemany):
+            requetes.append(statement)
+
+        with app.app_context():
+            moteur = db.engine
+        event.listen(moteur, "before_cursor_execute", avant)
+        try:
+            yield requetes
+        finally:
+            event.remove(moteur, "before_cursor_execute", avant)
+    return compter
+
+
+@pytest.fixture
+def acheter(client):
+    """acheter(nom, quantite, prix, type_matiere="base", date=None) → réponse JSON de /achat."""
+    def achat(nom, quantite, prix, type_matiere="base", date=None, **entetes):
+        corps = {"nom": nom, "quantite": quantite, "prix": prix, "type": type_matiere}
+        if date:
+            corps["date"] = date
+        rv = client.post("/achat", json=corps, headers=entetes)
+        assert rv.status_code == 201, rv.get_json()
+        return rv.get_json()
+    return achat
+
+
+@pytest.fixture
+def ajouter_recette(client):
+    """ajouter_recette(nom, base, oxydes=None) : base et oxydes en { matière: % }."""
+    def ajouter(nom, base, oxydes=None):
+        rv = client.post("/ajouter_recette", json={"nom": nom, "base": base, "oxydes": oxydes or {}})
+        assert rv.status_code == 201, rv.get_json()
+        return rv.get_json()
+    return ajouter
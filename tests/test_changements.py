@@ -0,0 +1,75 @@
+import json
+
+import changements
+
+
+def _lire(flux, n):
+    """Les `n` prochains événements SSE du flux : [(id, type, données)]."""
+    evenements = []
+    while len(evenements) < n:
+        bloc = next(flux).decode()
+        if bloc.startswith((":", "retry:")):
+            continue
+        champs = dict(ligne.split(": ", 1) for ligne in bloc.strip().split("\n"))
+        evenements.append((champs.get("id"), champs["event"], json.loads(champs["data"])))
+    return evenements
+
+
+def test_reprise_avec_last_event_id(client, acheter):
+    acheter("silice", 100, 1)
+
+    rv = client.get("/changements", buffered=False)
+    assert rv.mimetype == "text/event-stream"
+    flux = iter(rv.response)
+    assert next(flux).decode() == "retry: 3000\n\n"
+
+    acheter("silice", 200, 2)
+    premier = _lire(flux, 2)
+    assert {t for _, t, _ in premier} == {"achat", "stock"}
+    dernier_id = premier[-1][0]
+    rv.close()
+    assert changements.nb_abonnes() == 0
+
+    # coupure : l'achat suivant est publié sans abonné
+    acheter("silice", 300, 3)
+
+    rv = client.get("/changements", buffered=False, headers={"Last-Event-ID": dernier_id})
+    flux = iter(rv.response)
+    manques = _lire(flux, 2)
+    rv.close()
+    assert {t for _, t, _ in manques} == {"achat", "stock"}
+    achat = next(d for _, t, d in manques if t == "achat")
+    assert achat["quantite"] == 300
+    stock = next(d for _, t, d in manques if t == "stock")
+    assert stock["matieres"][0]["quantite"] == 600
+    # rien de ce qui précède Last-Event-ID n'est renvoyé
+    numero = int(dernier_id.rsplit("-", 1)[1])
+    assert [int(i.rsplit("-", 1)[1]) for i, _, _ in manques] == [numero + 1, numero + 2]
+
+
+def test_reprise_impossible(client):
+    rv = client.get("/changements", buffered=False, headers={"Last-Event-ID": "inconnu-12"})
+    flux = iter(rv.response)
+    (evt_id, type_evt, donnees), = _lire(flux, 1)
+    rv.close()
+    assert evt_id is None
+    assert type_evt == "resynchroniser" and donnees["cible"] == "tout"
+    assert changements.nb_abonnes() == 0
+
+
+def test_recette_ne_publie_que_les_matieres_inserees(client, ajouter_recette):
+    # matière existante à stock nul : déjà connue des clients
+    assert client.post("/ajouter_matiere", json={"nom": "silice", "type": "base"}).status_code == 201
+
+    rv = client.get("/changements", buffered=False)
+    flux = iter(rv.response)
+    next(flux)
+    corps = client.post("/ajouter_recette", json={
+        "nom": "A", "base": {"silice": 60, "kaolin": 40}, "oxydes": {"fer": 2}}).get_json()
+    evenements = _lire(flux, 3)
+    rv.close()
+
+    # « matières_créées » garde son sens : toutes les matières à stock nul
+    assert sorted(corps["matières_créées"]) == ["fer", "kaolin", "silice"]
+    assert [(t, d.get("nom"), d.get("type_matiere")) for _, t, d in evenements] == [
+        ("matiere", "kaolin", "base"), ("matiere", "fer", "oxyde"), ("recette", None, None)]
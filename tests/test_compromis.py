@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from compromis import frontiere_exacte, frontiere_echantillonnee
+
+
+def _y(segments, x):
+    """Ordonnée de la frontière exacte en x (segments non verticaux)."""
+    for sg in segments:
+        if sg["x1"] > sg["x0"] and sg["x0"] - 1e-9 <= x <= sg["x1"] + 1e-9:
+            return sg["y0"] + (sg["y1"] - sg["y0"]) * (x - sg["x0"]) / (sg["x1"] - sg["x0"])
+    return None
+
+
+CAS = [
+    # trois droites qui se coupent en x = 2 : la frontière suit la plus pentue
+    ([1, 4, 9], [1, 2, 3], [10, 24, 42]),
+    # axe limité par une matière que le groupe ne consomme pas
+    ([0.5, 0.5, 0.1], [0.2, 0.8, 0.0], [100, 160, 5]),
+] + [
+    ([random.Random(g).uniform(0, 1) for _ in range(6)],
+     [random.Random(g + 100).uniform(0, 1) for _ in range(6)],
+     [random.Random(g + 200).uniform(10, 1000) for _ in range(6)])
+    for g in range(20)
+]
+
+
+@pytest.mark.parametrize("axe, groupe, stock", CAS)
+def test_frontiere_exacte_comme_echantillonnee(axe, groupe, stock):
+    segments = frontiere_exacte(axe, groupe, stock)
+    for p in frontiere_echantillonnee(axe, groupe, stock, 101):
+        assert _y(segments, p["x"]) == pytest.approx(p["y"], abs=1e-6), p
+    # la frontière est continue et décroissante, de x = 0 à x_max
+    assert segments[0]["x0"] == 0.0
+    for avant, apres in zip(segments, segments[1:]):
+        assert apres["x0"] == pytest.approx(avant["x1"]) and apres["y0"] == pytest.approx(avant["y1"])
+    assert all(sg["y1"] <= sg["y0"] + 1e-9 for sg in segments)
+
+
+def test_trois_droites_concourantes():
+    segments = frontiere_exacte([1, 4, 9], [1, 2, 3], [10, 24, 42])
+    assert [(sg["x0"], sg["limitante"]) for sg in segments] == [(0.0, 0), (2.0, 2)]
+    assert segments[-1]["x1"] == pytest.approx(14 / 3) and segments[-1]["y1"] == pytest.approx(0.0)
+
+
+def test_compromis_mode_frontiere(client, acheter, ajouter_recette):
+    acheter("silice", 100, 1)
+    acheter("kaolin", 160, 1)
+    ajouter_recette("A", {"silice": 50, "kaolin": 50})
+    ajouter_recette("B", {"silice": 20, "kaolin": 80})
+
+    rv = client.post("/compromis_recettes", json={"recetteA": "A", "recetteB": "B", "mode": "frontiere"})
+    assert rv.status_code == 200
+    front = rv.get_json()["frontiere"]
+    assert front["axe"] == "A" and front["groupe"] == {"B": 1.0}
+    # kaolin : y = 200 - 0,625 x ; silice : y = 500 - 2,5 x ; croisement en x = 160
+    assert front["segments"] == [
+        {"x0": 0.0, "y0": 200.0, "x1": 160.0, "y1": 100.0, "limitante": "kaolin"},
+        {"x0": 160.0, "y0": 100.0, "x1": 200.0, "y1": 0.0, "limitante": "silice"},
+    ]
+
+    rv = client.post("/compromis_recettes", json={"recettes": ["A", "B"], "mode": "frontiere", "points": 3})
+    assert rv.get_json()["frontiere"]["points"] == [
+        {"x": 0.0, "y": 200.0, "limitante": "kaolin"},
+        {"x": 100.0, "y": 137.5, "limitante": "kaolin"},
+        {"x": 200.0, "y": 0.0, "limitante": "silice"},
+    ]
+
+    rv = client.post("/compromis_recettes", json={"recettes": ["A", "B"], "mode": "frontiere", "points": 1})
+    assert rv.status_code == 400
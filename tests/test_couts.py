@@ -0,0 +1,35 @@
+def test_cout_moyen_pondere(client, acheter, ajouter_recette):
+    acheter("silice", 1000, 10)
+    acheter("silice", 3000, 18)       # 28 € pour 4 kg : 7 €/kg
+    acheter("kaolin", 500, 2)         # 4 €/kg
+    ajouter_recette("Céladon", {"silice": 60, "kaolin": 40})
+    ajouter_recette("Tenmoku", {"silice": 90, "kaolin": 10}, {"fer": 5})
+
+    matieres = {m["nom"]: m for m in client.get("/couts/matieres").get_json()["matieres"]}
+    assert matieres["silice"]["cout_kg"] == 7.0
+    assert matieres["silice"]["quantite_achetee"] == 4000.0
+    assert matieres["silice"]["montant"] == 28.0
+    assert matieres["kaolin"]["cout_kg"] == 4.0
+    assert "fer" not in matieres
+
+    recettes = {r["recette"]: r for r in client.get("/couts/recettes?masse=500").get_json()["recettes"]}
+    assert recettes["Céladon"]["cout_kg"] == 5.8          # 0,6 × 7 + 0,4 × 4
+    assert recettes["Céladon"]["cout_lot"] == 2.9
+    assert recettes["Céladon"]["matieres_sans_prix"] == []
+    assert recettes["Tenmoku"]["matieres_sans_prix"] == ["fer"]
+
+    sim = client.post("/simuler_production", json={"recette": "Céladon", "masse": 500}).get_json()
+    assert sim["cout_total"] == 2.9 and sim["cout_kg"] == 5.8
+    assert {d["matiere"]: d["cout"] for d in sim["details"]} == {"silice": 2.1, "kaolin": 0.8}
+
+    # la production consomme le stock sans changer le coût moyen
+    rv = client.post("/produire", json={"recette": "Céladon", "masse": 500, "override": True})
+    assert rv.status_code == 200 and rv.get_json()["cout_total"] == 2.9
+    assert {m["nom"]: m["cout_kg"] for m in client.get("/couts/matieres").get_json()["matieres"]}["silice"] == 7.0
+
+    # un nouvel achat déplace la moyenne : 30 € pour 5 kg
+    acheter("silice", 1000, 2)
+    matieres = {m["nom"]: m for m in client.get("/couts/matieres").get_json()["matieres"]}
+    assert matieres["silice"]["cout_kg"] == 6.0
+    recettes = {r["recette"]: r for r in client.get("/couts/recettes").get_json()["recettes"]}
+    assert recettes["Céladon"]["cout_kg"] == 5.2
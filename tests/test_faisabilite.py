@@ -0,0 +1,26 @@
+import pytest
+
+from simulation import RANGS_COULEUR
+
+
+@pytest.mark.parametrize("masse", [100, 333.3, 700, 2500])
+def test_faisabilite_comme_simuler_production(client, acheter, ajouter_recette, masse):
+    acheter("silice", 1000, 10)
+    acheter("kaolin", 480, 5)
+    acheter("fer", 40, 8, type_matiere="oxyde")
+    ajouter_recette("Céladon", {"silice": 60, "kaolin": 40}, {"fer": 1.5})
+    ajouter_recette("Tenmoku", {"silice": 70, "kaolin": 30}, {"fer": 10})
+    ajouter_recette("Blanc", {"silice": 100})
+    ajouter_recette("Sans stock", {"silice": 50, "feldspath": 50})
+
+    rv = client.get(f"/faisabilite?masse={masse}")
+    assert rv.status_code == 200
+    lignes = {l["recette"]: l for l in rv.get_json()["recettes"]}
+    assert len(lignes) == 4
+
+    for nom, ligne in lignes.items():
+        sim = client.post("/simuler_production", json={"recette": nom, "masse": masse}).get_json()
+        assert ligne["production_maximale_possible"] == sim["production_maximale_possible"], nom
+        assert ligne["production_possible"] == sim["production_possible"], nom
+        pire = max((d["couleur"] for d in sim["details"]), key=RANGS_COULEUR.get, default="vert")
+        assert ligne["couleur"] == pire, nom
@@ -0,0 +1,42 @@
+import json
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+def _importer(client, n):
+    lignes = ["nom,quantite,prix,fournisseur,date,type"]
+    for i in range(n):
+        lignes.append(f"mat-{i % 7},{i % 50 + 1},{i % 9 + 0.5},WBB,2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},"
+                      f"{'base' if i % 7 < 5 else 'oxyde'}")
+    rv = client.post("/achats/import", data="\n".join(lignes) + "\n", content_type="text/csv")
+    assert rv.status_code == 201, rv.get_json()
+
+
+def _achat(a):
+    return a["date"], a["nom"], a["quantite"], a["prix"], a["fournisseur"]
+
+
+def test_recettes_en_flux_identiques(client, ajouter_recette):
+    for i in range(5):
+        ajouter_recette(f"R{i}", {"silice": 50, f"kaolin {i}": 50}, {"fer": i})
+
+    attendu = client.get("/recettes").get_json()
+    assert json.loads(client.get("/recettes?stream=1").get_data()) == attendu
+    rv = client.get("/recettes", headers=NDJSON)
+    assert rv.mimetype == "application/x-ndjson"
+    assert [json.loads(l) for l in rv.get_data(as_text=True).splitlines()] == attendu
+
+
+def test_historique_en_flux_sur_plusieurs_paquets(client):
+    # plus d'achats que TAILLE_PAQUET : plusieurs allers-retours en flux
+    _importer(client, 1200)
+
+    complet = client.get("/historique_achats").get_json()
+    flux = json.loads(client.get("/historique_achats?stream=1").get_data())
+    assert set(flux) == {"bases", "oxydes"}
+    for cle in ("bases", "oxydes"):
+        assert sorted(map(_achat, flux[cle])) == sorted(map(_achat, complet[cle]["achats"]))
+    assert len(flux["bases"]) + len(flux["oxydes"]) == 1200
+
+    lignes = client.get("/historique_achats", headers=NDJSON).get_data(as_text=True).splitlines()
+    assert [json.loads(l) for l in lignes] == flux["bases"] + flux["oxydes"]
@@ -0,0 +1,46 @@
+from sqlalchemy import update
+
+from extensions import db
+from models import CleIdempotence
+import idempotence
+
+
+def _stock(client, nom):
+    return {m["nom"]: m["quantite"] for m in client.get("/stock").get_json()["bases"]}[nom]
+
+
+def test_meme_cle_une_seule_ecriture(client):
+    corps = {"nom": "silice", "quantite": 500, "prix": 4, "type": "base"}
+    entetes = {"Idempotency-Key": "achat-1"}
+
+    premiere = client.post("/achat", json=corps, headers=entetes)
+    seconde = client.post("/achat", json=corps, headers=entetes)
+    assert premiere.status_code == seconde.status_code == 201
+    assert seconde.get_data() == premiere.get_data()
+    assert seconde.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in premiere.headers
+    assert _stock(client, "silice") == 500
+    assert len(client.get("/historique_achats").get_json()["bases"]["achats"]) == 1
+
+    # même clé, autre corps : refusé, rien n'est écrit
+    rv = client.post("/achat", json={**corps, "quantite": 900}, headers=entetes)
+    assert rv.status_code == 422
+    assert _stock(client, "silice") == 500
+
+
+def test_meme_cle_encore_en_cours(app, client, monkeypatch):
+    corps = {"nom": "silice", "quantite": 500, "prix": 4, "type": "base"}
+    entetes = {"Idempotency-Key": "achat-2"}
+    assert client.post("/achat", json=corps, headers=entetes).status_code == 201
+
+    # la première requête est réputée toujours en cours
+    with app.app_context():
+        db.session.execute(update(CleIdempotence).values(statut=idempotence.EN_COURS))
+        db.session.commit()
+    monkeypatch.setattr(idempotence, "ATTENTE_MAX_S", 0.1)
+
+    rv = client.post("/achat", json=corps, headers=entetes)
+    assert rv.status_code == 409
+    assert rv.get_json()["en_cours"] is True
+    assert rv.headers["Retry-After"] == "1"
+    assert _stock(client, "silice") == 500
@@ -0,0 +1,41 @@
+import re
+
+
+def _valeur(metriques, nom, **etiquettes):
+    """Valeur d'une série de /metrics (0 si absente)."""
+    motif = re.escape(nom) + r"\{" + ",".join(
+        re.escape(f'{k}="{v}"') for k, v in etiquettes.items()
+    ) + r"\} (\S+)"
+    trouve = re.search(motif, metriques)
+    return float(trouve.group(1)) if trouve else 0.0
+
+
+def test_server_timing_et_metrics(client, acheter, compter_sql):
+    acheter("silice", 100, 1)
+    avant = client.get("/metrics").get_data(as_text=True)
+
+    with compter_sql() as requetes:
+        rv = client.get("/stock")
+    assert rv.status_code == 200
+    timing = rv.headers["Server-Timing"]
+    assert re.match(r'db;dur=[\d.]+;desc="\d+ req", app;dur=[\d.]+$', timing)
+    nb_sql = int(re.search(r'desc="(\d+) req"', timing).group(1))
+    assert nb_sql == len(requetes) > 0
+
+    apres = client.get("/metrics").get_data(as_text=True)
+    route = {"methode": "GET", "route": "/stock"}
+    assert _valeur(apres, "glaze_requetes_total", **route, code=200) == \
+        _valeur(avant, "glaze_requetes_total", **route, code=200) + 1
+    assert _valeur(apres, "glaze_requete_sql_nombre_sum", **route) == \
+        _valeur(avant, "glaze_requete_sql_nombre_sum", **route) + nb_sql
+    assert _valeur(apres, "glaze_requete_duree_secondes_count", **route) == \
+        _valeur(avant, "glaze_requete_duree_secondes_count", **route) + 1
+
+
+def test_metrics_code_erreur(client):
+    avant = client.get("/metrics").get_data(as_text=True)
+    assert client.post("/simuler_production", json={}).status_code == 400
+    apres = client.get("/metrics").get_data(as_text=True)
+    route = {"methode": "POST", "route": "/simuler_production"}
+    assert _valeur(apres, "glaze_requetes_total", **route, code=400) == \
+        _valeur(avant, "glaze_requetes_total", **route, code=400) + 1
@@ -0,0 +1,119 @@
+import re
+import sqlite3
+
+from sqlalchemy import inspect, text
+
+from bench.donnees import peupler
+from extensions import db
+from migrations import MIGRATIONS, appliquer_migrations, expliquer_requetes, version_courante
+import migrations
+
+# parcours complet d'une table (SQLite : « SCAN t » sans index) ou tri à part
+PARCOURS_COMPLET = re.compile(r"\bSCAN \w+(?! USING)(?!\w)|USE TEMP B-TREE")
+
+
+def test_requetes_chaudes_sans_parcours_complet(app):
+    with app.app_context():
+        peupler(60, 30, 2000)
+        plans = expliquer_requetes()
+        db.session.remove()
+
+    assert plans
+    for nom, resultat in plans.items():
+        assert resultat["utilise"], f"{nom} : index {resultat['index_attendu']} absent du plan\n{resultat['plan']}"
+        assert not PARCOURS_COMPLET.search(resultat["plan"]), f"{nom} : parcours complet\n{resultat['plan']}"
+
+
+# schéma d'origine (version 1), tel que créé par la première version de l'API
+SCHEMA_V1 = [
+    "CREATE TABLE matiere (id INTEGER NOT NULL, nom VARCHAR NOT NULL, type VARCHAR NOT NULL,"
+    " unite VARCHAR, quantite FLOAT, PRIMARY KEY (id), UNIQUE (nom))",
+    "CREATE TABLE achat (id INTEGER NOT NULL, matiere_id INTEGER NOT NULL, quantite FLOAT NOT NULL,"
+    " prix FLOAT NOT NULL, fournisseur VARCHAR, date DATE, PRIMARY KEY (id),"
+    " FOREIGN KEY(matiere_id) REFERENCES matiere (id))",
+    "CREATE TABLE recette (id INTEGER NOT NULL, nom VARCHAR NOT NULL, description_url VARCHAR,"
+    " production_doc_url VARCHAR, PRIMARY KEY (id), UNIQUE (nom))",
+    "CREATE TABLE composition (id INTEGER NOT NULL, recette_id INTEGER NOT NULL, matiere_id INTEGER NOT NULL,"
+    " type VARCHAR NOT NULL, pourcentage FLOAT NOT NULL, PRIMARY KEY (id),"
+    " FOREIGN KEY(recette_id) REFERENCES recette (id), FOREIGN KEY(matiere_id) REFERENCES matiere (id))",
+]
+DONNEES_V1 = [
+    "INSERT INTO matiere VALUES (1, 'silice', 'base', 'g', 1234.5678), (2, 'kaolin', 'base', 'g', 0),"
+    " (3, 'fer', 'oxyde', 'g', NULL)",
+    "INSERT INTO achat VALUES (1, 1, 1000.25, 12.34, 'Céramique SA', '2024-01-10'),"
+    " (2, 1, 500, 7.5, NULL, '2024-02-09'), (3, 3, 40, 8, NULL, '2024-03-01')",
+    "INSERT INTO recette VALUES (1, 'Céladon', NULL, NULL)",
+    # la ligne 3 double la ligne 1 (même matière, même type) : supprimée par la migration 3
+    "INSERT INTO composition VALUES (1, 1, 1, 'base', 33.3333), (2, 1, 2, 'base', 66.6667),"
+    " (3, 1, 1, 'base', 10), (4, 1, 3, 'oxyde', 1.5)",
+]
+
+
+def _schema(application):
+    with application.app_context():
+        inspecteur = inspect(db.engine)
+        return {
+            table: (
+                {(c["name"], str(c["type"])) for c in inspecteur.get_columns(table)},
+                {(i["name"], tuple(i["column_names"]), bool(i["unique"])) for i in inspecteur.get_indexes(table)},
+            )
+            for table in inspecteur.get_table_names()
+        }
+
+
+def _executer(chemin, requetes):
+    connexion = sqlite3.connect(chemin)
+    with connexion:
+        for sql in requetes:
+            connexion.execute(sql)
+    connexion.close()
+
+
+def test_migrations_depuis_la_version_1(creer_app, tmp_path, monkeypatch):
+    _executer(tmp_path / "v1.db", SCHEMA_V1 + DONNEES_V1)
+    # jusqu'à la version 7, puis des seuils en grammes comme à l'époque
+    with monkeypatch.context() as m:
+        m.setattr(migrations, "MIGRATIONS", MIGRATIONS[:7])
+        creer_app("v1.db")
+    _executer(tmp_path / "v1.db", [
+        "UPDATE matiere SET seuil_orange = 150.5 WHERE nom = 'silice'",
+        "INSERT INTO seuil_defaut VALUES ('oxyde', 40, 25.5, 1)",
+    ])
+
+    migree = creer_app("v1.db")
+    assert _schema(migree) == _schema(creer_app("neuve.db"))
+
+    with migree.app_context():
+        assert version_courante() == MIGRATIONS[-1][0]
+        assert appliquer_migrations() == []
+        lire = lambda sql: db.session.execute(text(sql)).all()
+        assert lire("SELECT nom, quantite_mg FROM matiere ORDER BY id") == [
+            ("silice", 1234568), ("kaolin", 0), ("fer", 0)]
+        assert lire("SELECT quantite_mg, prix_centimes FROM achat ORDER BY id") == [
+            (1000250, 1234), (500000, 750), (40000, 800)]
+        assert lire("SELECT id, pourcentage_ppm FROM composition ORDER BY id") == [
+            (1, 333333), (2, 666667), (4, 15000)]
+        # journal ouvert par la migration 4, en mg depuis la migration 8
+        assert lire("SELECT matiere_id, type, delta_mg, reference FROM mouvement_stock") == [
+            (1, "ouverture", 1234568, "reprise")]
+        assert lire("SELECT matiere_id, quantite_mg FROM instantane_stock") == [(1, 1234568)]
+        assert lire("SELECT matiere_id, nb_intervalles, intervalle_moyen, dernier_achat FROM prevision_matiere"
+                    " ORDER BY matiere_id") == [(1, 1, 30.0, "2024-02-09"), (3, 0, 0.0, "2024-03-01")]
+        assert lire("SELECT matiere_id, quantite_mg, prix_centimes FROM cout_matiere ORDER BY matiere_id") == [
+            (1, 1500250, 1984), (3, 40000, 800)]
+        assert lire("SELECT seuil_orange_mg, seuil_rouge_mg FROM matiere WHERE id = 1") == [(150500, None)]
+        assert lire("SELECT type, orange_mg, rouge_mg, noir_mg FROM seuil_defaut") == [
+            ("oxyde", 40000, 25500, 1000)]
+        db.session.remove()
+
+    client = migree.test_client()
+    stock = client.get("/stock").get_json()
+    assert {m["nom"]: m["quantite"] for m in stock["bases"]} == {"silice": 1234.568, "kaolin": 0.0}
+    assert client.post("/stock/instantanes").get_json()["ecarts"] == []
+    assert client.get("/seuils").get_json() == {
+        "types": {"base": {"orange": 300.0, "rouge": 200.0, "noir": 0.0},
+                  "oxyde": {"orange": 40.0, "rouge": 25.5, "noir": 1.0}},
+        "matieres": {"silice": {"orange": 150.5, "rouge": None, "noir": None}},
+    }
+    recettes = client.get("/recettes").get_json()
+    assert recettes[0]["base"] == {"silice": 33.3333, "kaolin": 66.6667}
@@ -0,0 +1,54 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Matiere
+from previsions import noter_consommations
+
+
+def test_reappro_calcule_a_la_main(app, client, acheter):
+    aujourd_hui = datetime.utcnow().date()
+    # achats de silice espacés de 10 puis 20 jours, un seul achat de kaolin
+    for jours in (30, 20, 0):
+        acheter("silice", 200, 2, date=(aujourd_hui - timedelta(days=jours)).isoformat())
+    acheter("kaolin", 500, 5)
+
+    # 300 g de silice consommés il y a 20 jours, puis il y a 10 jours
+    maintenant = datetime.utcnow()
+    with app.app_context():
+        silice = Matiere.query.filter_by(nom="silice").one().id
+        for jours in (20, 10):
+            noter_consommations({silice: 300_000}, instant=maintenant - timedelta(days=jours))
+        db.session.commit()
+        db.session.remove()
+
+    rv = client.get("/reappro?tous=1")
+    assert rv.status_code == 200
+    prev = {m["nom"]: m for m in rv.get_json()["matieres"]}
+
+    # taux : (10 · e^(−1/3) + 10) · e^(−1/3), corrigé par 1 − e^(−20/30)
+    taux = (10 * math.exp(-1 / 3) + 10) * math.exp(-1 / 3) / (1 - math.exp(-2 / 3))
+    assert taux == pytest.approx(25.2773, abs=1e-4)
+    # intervalles 10 et 20 : moyenne 15, écart-type √50 (Welford, n − 1)
+    securite = 1.65 * taux * math.sqrt(50)
+    point = taux * 15 + securite
+    assert prev["silice"] == {
+        "nom": "silice", "type": "base", "stock": 600.0,
+        "taux_journalier": 25.28,
+        "delai_jours": 15.0,
+        "stock_securite": 294.92,
+        "point_de_commande": 674.08,
+        "jours_avant_rupture": 23.7,
+        "jours_avant_commande": -2.9,
+        "a_commander": True,
+        "quantite_suggeree": 453.23
+    }
+    assert (round(securite, 2), round(point, 2), round(600 / taux, 1)) == (294.92, 674.08, 23.7)
+
+    # sans consommation : pas de taux, délai par défaut, jamais urgent
+    assert prev["kaolin"]["taux_journalier"] == 0.0
+    assert prev["kaolin"]["delai_jours"] == 14.0
+    assert prev["kaolin"]["jours_avant_rupture"] is None
+    assert [m["nom"] for m in client.get("/reappro").get_json()["matieres"]] == ["silice"]
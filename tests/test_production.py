@@ -0,0 +1,179 @@
+import threading
+
+import pytest
+
+from sqlalchemy import func
+
+from extensions import db
+from models import MouvementStock
+from planification import PlanImpossible, planifier
+
+
+def test_planification_respecte_le_stock(client, acheter, ajouter_recette):
+    acheter("silice", 1000, 10)
+    acheter("kaolin", 600, 6)
+    acheter("fer", 20, 5, type_matiere="oxyde")
+    recettes = {
+        "A": ({"silice": 50, "kaolin": 50}, {"fer": 2}),
+        "B": ({"silice": 80, "kaolin": 20}, {}),
+    }
+    for nom, (base, oxydes) in recettes.items():
+        ajouter_recette(nom, base, oxydes)
+    stock = {"silice": 1000, "kaolin": 600, "fer": 20}
+
+    rv = client.post("/planifier_production", json={"recettes": ["A", {"nom": "B", "max": 900}]})
+    assert rv.status_code == 200, rv.get_json()
+    plan = rv.get_json()
+
+    assert plan["masses"]["B"] <= 900 + 1e-6
+    for mat, dispo in stock.items():
+        utilise = sum(
+            plan["masses"][nom] * ({**base, **oxydes}.get(mat, 0)) / 100
+            for nom, (base, oxydes) in recettes.items()
+        )
+        assert utilise <= dispo + 0.01, mat
+        assert plan["matieres"][mat]["utilise"] <= dispo + 0.01
+    # au moins une matière est épuisée : le plan ne laisse rien de produisible
+    assert plan["matieres_limitantes"]
+    assert plan["total"] > 0
+
+
+def test_planifier_optimum():
+    # a : 0,5 x1 + 0,2 x2 ≤ 40 ; b : 0,5 x1 + 0,8 x2 ≤ 70 → sommet (60, 50)
+    besoins = [[0.5, 0.2], [0.5, 0.8]]
+    plan = planifier(["A", "B"], {}, ["a", "b"], besoins, [40.0, 70.0])
+    assert plan["masses"] == {"A": 60.0, "B": 50.0}
+    assert plan["total"] == 110.0
+    assert plan["matieres_limitantes"] == ["a", "b"]
+    assert plan["matieres"]["a"]["valeur_marginale"] == 1.0
+    assert plan["matieres"]["b"]["valeur_marginale"] == 1.0
+
+    # priorité double sur B : tout en B, limité par b (70 / 0,8)
+    plan = planifier(["A", "B"], {"B": {"poids": 2.0}}, ["a", "b"], besoins, [40.0, 70.0])
+    assert plan["masses"] == {"A": 0.0, "B": 87.5}
+    assert plan["matieres_limitantes"] == ["b"]
+
+    # maximum imposé sur A, proportions imposées
+    plan = planifier(["A", "B"], {"A": {"max": 20.0}}, ["a", "b"], besoins, [40.0, 70.0])
+    assert plan["masses"] == {"A": 20.0, "B": 75.0}
+    plan = planifier(["A", "B"], {"A": {"ratio": 1.0}, "B": {"ratio": 1.0}}, ["a", "b"], besoins, [40.0, 70.0])
+    assert plan["masses"] == {"A": 53.85, "B": 53.85}
+
+
+def test_planifier_bornes_impossibles(client, acheter, ajouter_recette):
+    with pytest.raises(PlanImpossible) as e:
+        planifier(["A", "B"], {"A": {"min": 100.0}}, ["a"], [[0.5, 0.2]], [40.0])
+    assert e.value.details == [{"matiere": "a", "manquant": 10.0}]
+
+    acheter("silice", 100, 1)
+    ajouter_recette("A", {"silice": 100})
+    for spec, message in [
+        ({"nom": "A", "min": 200}, "Stock insuffisant"),
+        ({"nom": "A", "min": 50, "max": 10}, "min > max"),
+        ({"nom": "A", "max": -5}, "positifs ou nuls"),
+        ({"nom": "A", "poids": -1}, "positifs ou nuls"),
+        ({"nom": "A", "min": "abc"}, "invalides"),
+    ]:
+        rv = client.post("/planifier_production", json={"recettes": [spec]})
+        assert rv.status_code == 400, spec
+        assert message in rv.get_json()["message"], spec
+
+
+def test_productions_concurrentes(app, client, acheter, ajouter_recette):
+    acheter("silice", 1000, 10)
+    acheter("kaolin", 1000, 10)
+    ajouter_recette("A", {"silice": 60, "kaolin": 40})
+    # 1000 g de silice : au plus 5 productions de 300 g (180 g de silice chacune)
+    nb_threads = 12
+    depart = threading.Barrier(nb_threads)
+    codes = []
+
+    def produire():
+        c = app.test_client()
+        depart.wait()
+        rv = c.post("/produire", json={"recette": "A", "masse": 300, "override": True})
+        codes.append((rv.status_code, rv.get_json()))
+
+    threads = [threading.Thread(target=produire) for _ in range(nb_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(code in (200, 400) for code, _ in codes), codes
+    reussies = sum(1 for code, corps in codes if code == 200 and "stock_apres" in corps)
+    assert reussies == 5
+
+    stock = {m["nom"]: m["quantite"] for m in client.get("/stock").get_json()["bases"]}
+    assert stock == {"silice": 1000 - reussies * 180, "kaolin": 1000 - reussies * 120}
+    assert min(stock.values()) >= 0
+
+    # le journal : une sortie par production réussie, et il totalise
+    # exactement le stock courant
+    with app.app_context():
+        sorties = db.session.query(func.sum(MouvementStock.delta_mg)).filter_by(type="production").scalar()
+        db.session.remove()
+    assert sorties == -reussies * 300_000
+    rv = client.post("/stock/instantanes")
+    assert rv.status_code == 201
+    assert rv.get_json()["ecarts"] == []
+
+
+def test_production_consomme_les_parts_exactes(app, client, acheter, ajouter_recette):
+    acheter("silice", 1000, 10)
+    acheter("kaolin", 1000, 10)
+    acheter("fer", 100, 5, type_matiere="oxyde")
+    ajouter_recette("Céladon", {"silice": 33.3333, "kaolin": 66.6667}, {"fer": 1.5})
+
+    sim = client.post("/simuler_production", json={"recette": "Céladon", "masse": 333.333}).get_json()
+    rv = client.post("/produire", json={"recette": "Céladon", "masse": 333.333, "override": True})
+    assert rv.status_code == 200, rv.get_json()
+
+    # part(333 333 mg, ppm) arrondie au mg : 111 111, 222 222 et 5 000 mg
+    parts = {"silice": 111_111, "kaolin": 222_222, "fer": 5_000}
+    assert {d["matiere"]: d["quantite_necessaire"] for d in sim["details"]} == {
+        m: q / 1000 for m, q in parts.items()}
+    initial = {"silice": 1_000_000, "kaolin": 1_000_000, "fer": 100_000}
+    assert {s["matiere"]: s["nouveau_stock"] for s in rv.get_json()["stock_apres"]} == {
+        m: (initial[m] - q) / 1000 for m, q in parts.items()}
+    with app.app_context():
+        total = db.session.query(func.sum(MouvementStock.delta_mg)).filter(MouvementStock.type == "production").scalar()
+        db.session.remove()
+    assert total == -sum(parts.values())
+
+
+def test_achats_concurrents(app, client, acheter, monkeypatch):
+    import routes.achats
+    appels = []
+    ajuster = routes.achats.ajuster_stock
+
+    def espion(deltas):
+        appels.append(dict(deltas))
+        ajuster(deltas)
+
+    monkeypatch.setattr(routes.achats, "ajuster_stock", espion)
+    corps = acheter("silice", 100, 10)
+    assert corps["stock_restant"] == 100
+    assert appels == [{1: 100_000}]
+
+    nb_threads = 8
+    depart = threading.Barrier(nb_threads)
+    codes = []
+
+    def achat():
+        c = app.test_client()
+        depart.wait()
+        rv = c.post("/achat", json={"nom": "silice", "quantite": 25, "prix": 1})
+        codes.append(rv.status_code)
+
+    threads = [threading.Thread(target=achat) for _ in range(nb_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # aucune entrée perdue : chaque achat passe par l'UPDATE relatif sous verrou
+    assert codes == [201] * nb_threads
+    assert appels[1:] == [{1: 25_000}] * nb_threads
+    stock = {m["nom"]: m["quantite"] for m in client.get("/stock").get_json()["bases"]}
+    assert stock == {"silice": 100 + nb_threads * 25}
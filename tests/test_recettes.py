@@ -0,0 +1,49 @@
+import index_compositions
+
+
+def test_catalogue_nombre_de_requetes_constant(client, ajouter_recette, compter_sql):
+    ajouter_recette("Céladon", {"silice": 40, "kaolin": 60}, {"fer": 1.5})
+
+    with compter_sql() as requetes:
+        rv = client.get("/recettes")
+    assert rv.status_code == 200
+    assert len(rv.get_json()) == 1
+    une_recette = len(requetes)
+
+    for i in range(20):
+        ajouter_recette(f"Recette {i}", {"silice": 30, "kaolin": 50, f"feldspath {i}": 20}, {"cobalt": 0.5})
+
+    with compter_sql() as requetes:
+        rv = client.get("/recettes")
+    assert rv.status_code == 200
+    assert len(rv.get_json()) == 21
+    assert len(requetes) == une_recette
+
+
+def test_catalogue_compositions(client, ajouter_recette):
+    ajouter_recette("Céladon", {"silice": 40, "kaolin": 60}, {"fer": 1.5})
+    ajouter_recette("Blanc", {"silice": 100})
+
+    recettes = {r["nom"]: r for r in client.get("/recettes").get_json()}
+    assert recettes["Céladon"]["base"] == {"silice": 40.0, "kaolin": 60.0}
+    assert recettes["Céladon"]["oxydes"] == {"fer": 1.5}
+    assert recettes["Blanc"]["oxydes"] == {}
+
+
+def test_index_compositions_jamais_modifie_sous_un_lecteur(app, client, ajouter_recette):
+    ajouter_recette("Céladon", {"silice": 40, "kaolin": 60}, {"fer": 1.5})
+    ajouter_recette("Blanc", {"silice": 100})
+    with app.test_request_context():
+        tenu, _ = index_compositions.charger(["Céladon"])
+    lignes, colonnes = dict(tenu.lignes), list(tenu.colonnes)
+
+    ajouter_recette("Tenmoku", {"silice": 50, "feldspath": 50}, {"fer": 10})
+    assert client.delete("/recettes/Blanc").status_code == 200
+
+    # l'index tenu par un lecteur n'a pas bougé...
+    assert tenu.lignes == lignes and tenu.colonnes == colonnes
+    # ... les mises à jour sont passées dans un nouvel index
+    courant = index_compositions._index
+    assert courant is not tenu
+    assert courant.version == tenu.version + 2
+    assert set(courant.lignes) == {"Céladon", "Tenmoku"}
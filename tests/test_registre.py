@@ -0,0 +1,50 @@
+from datetime import datetime
+
+
+def _quantites(stock):
+    return {m["nom"]: m["quantite"] for m in stock["bases"] + stock["oxydes"]}
+
+
+def test_achat_antidate_dans_le_stock_a_la_date(client, acheter):
+    acheter("silice", 500, 5, date="2020-01-05")
+    acheter("silice", 200, 2)
+
+    assert _quantites(client.get("/stock?at=2020-01-04").get_json()) == {}
+    assert _quantites(client.get("/stock?at=2020-01-10").get_json()) == {"silice": 500.0}
+    assert _quantites(client.get("/stock").get_json()) == {"silice": 700.0}
+
+
+def test_import_date_chaque_mouvement(client):
+    csv = (
+        "nom,quantite,prix,fournisseur,date,type\n"
+        "silice,100,1,WBB,2020-03-01,base\n"
+        "kaolin,200,2,WBB,2020-04-01,base\n"
+        "silice,50,1,WBB,2020-05-01,base\n"
+    )
+    rv = client.post("/achats/import", data=csv, content_type="text/csv")
+    assert rv.status_code == 201, rv.get_json()
+
+    assert _quantites(client.get("/stock?at=2020-03-15").get_json()) == {"silice": 100.0}
+    assert _quantites(client.get("/stock?at=2020-04-15").get_json()) == {"silice": 100.0, "kaolin": 200.0}
+    assert _quantites(client.get("/stock?at=2020-05-01").get_json()) == {"silice": 150.0, "kaolin": 200.0}
+
+
+def test_rejouer_le_journal_redonne_le_stock(client, acheter, ajouter_recette):
+    acheter("silice", 1000, 10, date="2020-01-05")
+    acheter("kaolin", 800, 8)
+    acheter("fer", 50, 5, type_matiere="oxyde")
+    ajouter_recette("A", {"silice": 60, "kaolin": 40}, {"fer": 2.5})
+    assert client.post("/produire", json={"recette": "A", "masse": 333.3, "override": True}).status_code == 200
+    # photo au milieu de l'historique : la relecture part de la photo
+    assert client.post("/stock/instantanes").status_code == 201
+    assert client.post("/stock/ajustement", json={"nom": "kaolin", "delta": -12.345}).status_code == 200
+    assert client.post("/produire", json={"recette": "A", "masse": 100, "override": True}).status_code == 200
+    acheter("silice", 0.001, 0.01)
+
+    courant = _quantites(client.get("/stock").get_json())
+    rejoue = _quantites(client.get(f"/stock?at={datetime.utcnow().isoformat()}").get_json())
+    assert rejoue == courant
+    assert courant["kaolin"] == round(800 - 133.32 - 12.345 - 40, 3)
+
+    rv = client.post("/stock/instantanes")
+    assert rv.get_json()["ecarts"] == []
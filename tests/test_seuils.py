@@ -0,0 +1,42 @@
+def _couleur_silice(client):
+    rv = client.post("/simuler_production", json={"recette": "Blanc", "masse": 100})
+    assert rv.status_code == 200
+    return {d["matiere"]: d["couleur"] for d in rv.get_json()["details"]}["silice"]
+
+
+def test_seuil_propre_a_la_matiere(client, acheter, ajouter_recette):
+    ajouter_recette("Blanc", {"silice": 100})
+    acheter("silice", 250, 5)
+
+    # reste 150 g : sous le rouge des bases (200 g)
+    assert _couleur_silice(client) == "rouge"
+
+    rv = client.put("/seuils/matieres/silice", json={"orange": 100, "rouge": 50})
+    assert rv.status_code == 200
+    assert _couleur_silice(client) == "vert"
+    assert client.get("/seuils").get_json()["matieres"]["silice"] == {"orange": 100, "rouge": 50, "noir": None}
+
+    # comparaison en mg entiers : 150 g restants, seuil à 150,001 g
+    assert client.put("/seuils/matieres/silice", json={"orange": 150.001}).status_code == 200
+    assert _couleur_silice(client) == "orange"
+    assert client.put("/seuils/matieres/silice", json={"orange": 150}).status_code == 200
+    assert _couleur_silice(client) == "vert"
+
+    # ordre vérifié sur les seuils effectifs (noir du type : 0)
+    assert client.put("/seuils/matieres/silice", json={"noir": 80}).status_code == 400
+
+    assert client.delete("/seuils/matieres/silice").status_code == 200
+    assert _couleur_silice(client) == "rouge"
+    assert client.get("/seuils").get_json()["matieres"] == {}
+
+
+def test_seuils_du_type(client, acheter, ajouter_recette):
+    ajouter_recette("Blanc", {"silice": 100})
+    acheter("silice", 250, 5)
+
+    rv = client.put("/seuils/types/base", json={"orange": 1000, "rouge": 500, "noir": 160})
+    assert rv.status_code == 200
+    assert _couleur_silice(client) == "noir"
+    stock = client.get("/stock").get_json()
+    assert stock["bases"][0]["couleur"] == "rouge"     # 250 g en stock
+    assert client.get("/seuils").get_json()["types"]["base"] == {"orange": 1000, "rouge": 500, "noir": 160}
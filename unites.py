@@ -0,0 +1,84 @@
+"""
+Unités de stockage en virgule fixe : toutes les quantités et tous les prix
+sont des entiers en base et dans les calculs, convertis seulement à
+l'entrée et à la sortie de l'API.
+
+- masses      : milligrammes (l'API parle en grammes) ;
+- prix        : centimes (l'API parle en euros) ;
+- pourcentages: parties par million (l'API parle en %, 100 % = 1 000 000).
+
+Les sommes, différences et comparaisons de stock sont donc exactes, en
+Python comme en SQL ; une valeur reçue est arrondie une seule fois, au
+plus proche (demi vers le haut), à la résolution de son unité.
+"""
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+MG_PAR_G = 1000
+MG_PAR_KG = 1000 * MG_PAR_G
+CENTIMES_PAR_EURO = 100
+PPM_PAR_POURCENT = 10_000
+PPM_TOTAL = 100 * PPM_PAR_POURCENT      # 100 %
+
+
+def _entier(valeur, facteur):
+    """
+    Nombre de l'API (12.5, "12.5" ou "12,5") → entier dans l'unité de
+    stockage. Passe par la représentation décimale : 0.1 g donne 100 mg,
+    pas 100.00000000000001. Lève ValueError si ce n'est pas un nombre fini.
+    """
+    if isinstance(valeur, bool):
+        raise ValueError("booléen")
+    if isinstance(valeur, int):
+        return valeur * facteur
+    if isinstance(valeur, str):
+        valeur = valeur.strip().replace(",", ".")
+    elif isinstance(valeur, float):
+        if not math.isfinite(valeur):
+            raise ValueError("nombre non fini")
+        valeur = repr(valeur)
+    try:
+        d = Decimal(valeur)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"nombre invalide : {valeur!r}")
+    if not d.is_finite():
+        raise ValueError("nombre non fini")
+    return int((d * facteur).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def mg(grammes):
+    """Grammes (API) → milligrammes."""
+    return _entier(grammes, MG_PAR_G)
+
+
+def centimes(euros):
+    """Euros (API) → centimes."""
+    return _entier(euros, CENTIMES_PAR_EURO)
+
+
+def ppm(pourcent):
+    """Pourcentage (API) → parties par million."""
+    return _entier(pourcent, PPM_PAR_POURCENT)
+
+
+def grammes(milligrammes):
+    """Milligrammes → grammes pour l'API (au plus 3 décimales)."""
+    return (milligrammes or 0) / MG_PAR_G
+
+
+def euros(cts):
+    """Centimes → euros pour l'API."""
+    return (cts or 0) / CENTIMES_PAR_EURO
+
+
+def pourcent(parties):
+    """Parties par million → pourcentage pour l'API."""
+    return (parties or 0) / PPM_PAR_POURCENT
+
+
+def part(masse_mg, parties):
+    """
+    Part `parties` (ppm) d'une masse en mg, arrondie au mg le plus proche
+    (demi vers le haut), en arithmétique entière.
+    """
+    return (masse_mg * parties + PPM_TOTAL // 2) // PPM_TOTAL
@@ -0,0 +1,5 @@
+# wsgi.py — point d'entrée WSGI pour la production :
+#   gunicorn -c gunicorn.conf.py wsgi:app
+from app import create_app
+
+app = create_app()